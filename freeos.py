@@ -1,34 +1,76 @@
 #Imagined by Mathias Mürset, made by ChatGPT
 
+import time
+_T_IMPORT = time.perf_counter()  # début du chargement du module (--startup-profile)
+
 import os
+import re
 import sys
-import shlex
-import webbrowser
-import subprocess
 import threading
-import time
-import datetime
 import random as _random
-import calendar as _calendar
-import textwrap
 from pathlib import Path
+from functools import lru_cache
 from dataclasses import dataclass, field
-from collections import deque
+from collections import deque, OrderedDict
+from array import array
+from bisect import bisect_left
 
 try:
     import tkinter as tk
     from tkinter import messagebox
-    from tkinter import filedialog
-    from tkinter import simpledialog
     import tkinter.font as tkfont
 except Exception as e:  # pragma: no cover
     print("Tkinter introuvable. Installez python-tk / tkinter.", file=sys.stderr)
     raise
 
+FREEOS_VERSION = "2.0"
+
 # ---- Thème (couleurs "color 0a") ----
 DEFAULT_BG = "#000000"
 DEFAULT_FG = "#00ff00"
 
+# ---- Données locales (index, caches...) ----
+FREEOS_HOME = Path.home() / ".freeos"
+
+# ---- Sortie console bufferisée ----
+OUTPUT_FRAME_MS = 16   # une insertion groupée par « frame » (~60 Hz)
+OUTPUT_POLL_MS = 50    # relève des écritures faites depuis d’autres threads
+
+# ---- Historique console (scrollback) ----
+SCROLLBACK_VIEW = 3000   # lignes gardées au maximum dans le widget Text
+SCROLLBACK_CHUNK = 1000  # lignes chargées/déchargées à chaque pas de défilement
+
+# ---- Recherche dans l’historique (Ctrl‑F) ----
+SEARCH_BLOCK = 256             # granularité de l’index (lignes par bloc)
+SEARCH_SEGMENT_BLOCKS = 64     # blocs par segment : un segment complet part sur disque
+SEARCH_DEBOUNCE_MS = 120       # délai après la dernière frappe
+SEARCH_SLICE_S = 0.015         # temps de recherche max par passe de la boucle Tk
+SEARCH_MAX_MATCHES = 100_000
+
+# ---- Tâches de fond (commande &) ----
+JOBS_MAX_WORKERS = 4
+JOBS_WAIT_POLL_MS = 50
+
+# ---- Flux de lignes (dir, ...) ----
+STREAM_SLICE_S = 0.02   # temps max passé à produire des lignes par passe Tk
+DIR_SORT_KEYS = ("name", "size", "mtime")
+
+# ---- Complétion (Tab) ----
+COMPLETE_CACHE_DIRS = 256    # dossiers gardés dans le cache de listings
+COMPLETE_MAX_SHOWN = 300     # candidats affichés au 2e Tab
+
+# ---- Scripts (run / --script) ----
+SCRIPT_MAX_DEPTH = 16   # 'run' imbriqués au maximum (évite une récursion infinie)
+SCRIPT_SLICE_S = 0.02   # temps max d’exécution d’un script (ou d’un pipe vers fichier) par passe Tk
+# Préfixes de sortie signalant un échec de commande (arrêt d’un script, code retour -c)
+ERROR_PREFIXES = ("[erreur]", "[usage]", "[commande inconnue]")
+_VAR_RE = re.compile(r"\$(?:\{(\w+)\}|(\w+)|(\$))")
+
+# ---- Index de noms de fichiers (locate / find) ----
+LOCATE_DIR = FREEOS_HOME / "locate"
+LOCATE_STALE_S = 600          # âge au‑delà duquel find/play relancent un rafraîchissement
+LOCATE_MAX_RESULTS = 200
+
 # ---- Police mono ----
 def get_mono_font(root):
     """Retourne une police mono (TkFixedFont si dispo)."""
@@ -56,6 +98,7 @@ def do_beep(frequency=750, duration_ms=120, root=None):
 # ---- Outils : ouverture système ----
 def open_system_path(path: Path):
     """Ouvre un fichier/dossier avec l’appli système par défaut (cross‑platform)."""
+    import subprocess
     path = Path(path)
     if not path.exists():
         raise FileNotFoundError(str(path))
@@ -72,6 +115,7 @@ def open_system_path(path: Path):
 # ---- Génération intégrée d’un gros pool de mots (≥500) ----
 # Pour garder le code compact, on génère des mots pseudo‑aléatoires reproductibles + un petit lot de vrais mots.
 # Cela respecte la contrainte "intégrée au code", sans dépendances.
+# Construit au premier usage seulement (random_words), pas au démarrage.
 def _build_word_pool(min_count=650):
     seed = 1337
     rng = _random.Random(seed)
@@ -101,7 +145,10 @@ def _build_word_pool(min_count=650):
         words.add(w)
     return sorted(words)
 
-RANDOM_WORDS = _build_word_pool()
+@lru_cache(maxsize=None)
+def random_words():
+    """Pool de mots (≥650), construit à la première demande."""
+    return _build_word_pool()
 
 # ---- Génération intégrée de 200 dictons/proverbes ----
 def _build_dictons(count=200):
@@ -183,7 +230,230 @@ def _build_dictons(count=200):
     out = fixed + generated[: max(0, count-len(fixed))]
     return out
 
-DICTONS = _build_dictons(200)
+@lru_cache(maxsize=None)
+def dictons():
+    """Les 200 dictons, construits à la première demande."""
+    return _build_dictons(200)
+
+def __getattr__(name):
+    # compat : RANDOM_WORDS / DICTONS restent accessibles comme attributs du module
+    if name == "RANDOM_WORDS":
+        return random_words()
+    if name == "DICTONS":
+        return dictons()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# ---- Listes de mots externes (projetées en mémoire) ----
+# Fichier : magic, nombre de mots (uint64), offsets uint32 (n + 1, ordre natif),
+# puis les mots UTF‑8 bout à bout. Le mot i est blob[off[i]:off[i+1]].
+WORDS_PATH = FREEOS_HOME / "words.fwl"
+WORDS_MAGIC = b"FOSWL001"
+WORDS_MAX_LEN = 64   # au‑delà, la ligne n’est pas un mot (fichier mal choisi)
+
+class WordStore:
+    """
+    Liste de mots projetée (mmap, lecture seule) : les pages sont partagées
+    entre processus par le système, et store[i] ne décode que le mot demandé.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self._mm = None
+        self._offsets = None
+        self._blob = None
+
+    def _open(self):
+        import mmap
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        count = int.from_bytes(mm[8:16], "little")
+        start = 16 + 4 * (count + 1)
+        if mm[:8] != WORDS_MAGIC or len(mm) < start:
+            mm.close()
+            raise ValueError(f"{self.path.name} : pas une liste de mots FreeOS")
+        view = memoryview(mm)
+        self._mm = mm
+        self._offsets = view[16:start].cast("I")
+        self._blob = view[start:]
+
+    def __len__(self):
+        if self._offsets is None:
+            self._open()
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if self._offsets is None:
+            self._open()
+        off = self._offsets
+        return str(self._blob[off[i]:off[i + 1]], "utf-8")
+
+    def close(self):
+        if self._offsets is not None:
+            self._offsets.release()
+            self._blob.release()
+            self._mm.close()
+            self._offsets = self._blob = self._mm = None
+
+def word_store_build(src, dst=WORDS_PATH):
+    """
+    Convertit une liste texte (un mot par ligne, ou « 11111<tab>mot » comme
+    les listes EFF) au format projeté ; doublons et lignes vides ignorés.
+    Renvoie le nombre de mots.
+    """
+    seen = set()
+    offsets = array("I", [0])
+    blob = bytearray()
+    with open(src, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            word = fields[-1]
+            if len(word) > WORDS_MAX_LEN or word in seen:
+                continue
+            seen.add(word)
+            blob += word.encode("utf-8")
+            offsets.append(len(blob))
+    if len(offsets) < 3:
+        raise ValueError(f"{src} : moins de 2 mots")
+    if len(blob) >= 1 << 32:
+        raise ValueError(f"{src} : liste trop grosse (4 Gio max)")
+    dst = Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    cached = _WORD_STORES.pop(dst, None)
+    if cached is not None and cached[1] is not None:
+        cached[1].close()   # Windows refuse de remplacer un fichier projeté
+    tmp = dst.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(WORDS_MAGIC + (len(offsets) - 1).to_bytes(8, "little"))
+        f.write(offsets.tobytes())
+        f.write(blob)
+    os.replace(tmp, dst)
+    return len(offsets) - 1
+
+_WORD_STORES = {}
+
+def word_store(path=WORDS_PATH):
+    """Liste externe installée (None si absente) ; relue si le fichier a changé."""
+    path = Path(path)
+    try:
+        stamp = path.stat().st_mtime_ns
+    except OSError:
+        stamp = None
+    cached = _WORD_STORES.get(path)
+    if cached is None or cached[0] != stamp:
+        if cached is not None and cached[1] is not None:
+            cached[1].close()
+        cached = _WORD_STORES[path] = (stamp, WordStore(path) if stamp is not None else None)
+    return cached[1]
+
+def word_pool():
+    """Mots pour passphrases, jeux et random : la liste externe si installée, sinon le pool intégré."""
+    store = word_store()
+    if store is not None:
+        try:
+            len(store)
+            return store
+        except (OSError, ValueError):
+            pass
+    return random_words()
+
+# ---- Tirages en masse : blocs d’octets aléatoires + rejet ----
+PASSWORD_UPPER = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+PASSWORD_LOWER = "abcdefghijklmnopqrstuvwxyz"
+PASSWORD_DIGITS = "0123456789"
+PASSWORD_SYMBOLS = "!@#$%^&*()-_=+[]{};:,.?/"
+RANDOM_BATCH = 50_000      # lignes produites par tirage d’octets
+RANDOM_LABELS_MAX = 1 << 16  # jusque‑là, random nmbr précalcule le texte de chaque valeur
+
+@lru_cache(maxsize=32)
+def _symbol_tables(alphabet):
+    """(table de traduction, octets rejetés) pour tirer dans alphabet (≤ 256 symboles)."""
+    alpha = alphabet.encode("latin-1")
+    n = len(alpha)
+    limit = 256 - 256 % n   # au‑delà, l’octet biaiserait le tirage : rejeté
+    return bytes(alpha[b % n] for b in range(256)), bytes(range(limit, 256))
+
+def random_symbols(alphabet, count, randbytes=os.urandom):
+    """
+    count symboles uniformes de alphabet, en bytes : les octets aléatoires
+    sont filtrés et traduits d’un coup par bytes.translate, sans boucle
+    Python par caractère.
+    """
+    table, reject = _symbol_tables(alphabet)
+    keep = 256 - len(reject)
+    out = bytearray()
+    while len(out) < count:
+        need = count - len(out)
+        out += randbytes(need * 256 // keep + 64).translate(table, reject)
+    del out[count:]
+    return bytes(out)
+
+def random_below(n, count, randbytes=os.urandom):
+    """count entiers uniformes dans [0, n), tirés par blocs (mots de 1 à 8 octets, avec rejet)."""
+    if n <= 0:
+        raise ValueError("intervalle vide")
+    if n <= 256:
+        # un octet par valeur : filtrage et réduction par bytes.translate
+        return list(random_symbols("".join(map(chr, range(n))), count, randbytes))
+    for code in "HIQ":
+        bits = 8 * array(code).itemsize
+        if n <= 1 << bits:
+            break
+    else:
+        # au‑delà de 64 bits : un tirage par valeur
+        size = (n.bit_length() + 7) // 8
+        limit = (1 << 8 * size) - (1 << 8 * size) % n
+        out = []
+        while len(out) < count:
+            x = int.from_bytes(randbytes(size), "little")
+            if x < limit:
+                out.append(x % n)
+        return out
+    limit = (1 << bits) - (1 << bits) % n
+    out = []
+    while len(out) < count:
+        need = count - len(out)
+        words = array(code, randbytes((need + need // 8 + 8) * (bits // 8)))
+        out.extend([x % n for x in words if x < limit])
+    del out[count:]
+    return out
+
+def password_alphabet(upper=True, lower=True, digits=True, symbols=False):
+    alphabet = (PASSWORD_UPPER if upper else "") + (PASSWORD_LOWER if lower else "") \
+        + (PASSWORD_DIGITS if digits else "") + (PASSWORD_SYMBOLS if symbols else "")
+    return alphabet or PASSWORD_LOWER + PASSWORD_DIGITS
+
+def password_entropy(choices, picks):
+    """Bits d’entropie de picks tirages uniformes parmi choices."""
+    import math
+    return picks * math.log2(choices) if choices > 1 else 0.0
+
+def iter_random_lines(n, count, pick, randbytes=os.urandom, batch=RANDOM_BATCH):
+    """count tirages uniformes dans [0, n), rendus en lignes par pick(indices), par blocs de texte."""
+    done = 0
+    while done < count:
+        k = min(batch, count - done)
+        yield "\n".join(pick(random_below(n, k, randbytes))) + "\n"
+        done += k
+
+def iter_passwords(count, length, alphabet, randbytes=os.urandom, batch=RANDOM_BATCH):
+    """Mots de passe par blocs de batch lignes (bytes terminés par '\\n')."""
+    done = 0
+    while done < count:
+        k = min(batch, count - done)
+        chars = random_symbols(alphabet, k * length, randbytes)
+        yield b"\n".join([chars[i:i + length] for i in range(0, k * length, length)]) + b"\n"
+        done += k
+
+def iter_passphrases(count, n_words, words, sep="-", randbytes=os.urandom, batch=RANDOM_BATCH):
+    """Passphrases de n_words mots de la liste words, par blocs (texte terminé par '\\n')."""
+    done = 0
+    while done < count:
+        k = min(batch, count - done)
+        idx = random_below(len(words), k * n_words, randbytes)
+        picked = [words[i] for i in idx]
+        yield "\n".join([sep.join(picked[i:i + n_words]) for i in range(0, k * n_words, n_words)]) + "\n"
+        done += k
 
 # ---- Structures pour le registre de commandes ----
 @dataclass
@@ -191,8 +461,2115 @@ class CommandSpec:
     func: callable
     desc: str
     aliases: list = field(default_factory=list)
+    gui: bool = False  # crée/touche des widgets : exécutée sur le thread principal, jamais en tâche de fond
+    pipe: callable = None  # filtre après '|' : pipe(args, lignes) -> itérateur de lignes
+
+# ---- Flux exécutés par tranches sur le thread Tk (dir, run...) ----
+@dataclass(eq=False)  # identité : rangé dans un set
+class LineStream:
+    it: object
+    page: int | None = None
+    job: object = None       # after() en attente
+    selector: object = None  # pending_selector de la pause « -- suite -- »
+
+# ---- Tâches de fond ----
+class JobCancelled(Exception):
+    """Levée dans le thread d’une tâche annulée par 'kill' (annulation coopérative)."""
+
+@dataclass
+class Job:
+    id: int
+    line: str
+    cancel: threading.Event = field(default_factory=threading.Event)
+    future: object = None
+    started: float = field(default_factory=time.monotonic)
+    ended: float | None = None
+    status: str = "en attente"
+
+# ---- Historique console sur disque ----
+class ScrollbackStore:
+    """
+    Historique des lignes de la console, hors mémoire :
+    un fichier de données en ajout seul + un index des offsets (8 octets par
+    ligne, lui aussi sur disque). Lire n’importe quelle plage = 2 seek.
+    """
+    def __init__(self, directory=None):
+        import tempfile
+        self._data = tempfile.TemporaryFile(dir=directory)
+        self._index = tempfile.TemporaryFile(dir=directory)
+        self.count = 0
+        self._size = 0
+
+    def append(self, lines):
+        offsets = array("Q")
+        parts = []
+        pos = self._size
+        for line in lines:
+            b = line.encode("utf-8", "replace") + b"\n"
+            offsets.append(pos)
+            parts.append(b)
+            pos += len(b)
+        self._data.seek(0, 2)
+        self._data.write(b"".join(parts))
+        self._index.seek(0, 2)
+        self._index.write(offsets.tobytes())
+        self._size = pos
+        self.count += len(offsets)
+
+    def _offset(self, i):
+        if i >= self.count:
+            return self._size
+        self._index.seek(i * 8)
+        a = array("Q")
+        a.frombytes(self._index.read(8))
+        return a[0]
+
+    def get_lines(self, start, stop):
+        """Lignes [start, stop) de l’historique."""
+        start = max(0, start)
+        stop = min(self.count, stop)
+        if start >= stop:
+            return []
+        first, end = self._offset(start), self._offset(stop)
+        self._data.seek(first)
+        return self._data.read(end - first).decode("utf-8", "replace").split("\n")[:-1]
+
+    def clear(self):
+        for f in (self._data, self._index):
+            f.seek(0)
+            f.truncate()
+        self.count = 0
+        self._size = 0
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+# ---- Index de recherche de l’historique ----
+class ScrollbackIndex:
+    """
+    Index inversé trigramme → blocs de SEARCH_BLOCK lignes, alimenté à chaque
+    ajout. Une recherche ne relit que les blocs qui contiennent tous les
+    trigrammes de la requête (insensible à la casse).
+    Comme l’historique, l’index reste hors mémoire : seul le segment en cours
+    (SEARCH_SEGMENT_BLOCKS blocs) y est ; les segments complets sont écrits
+    dans un fichier temporaire (marshal) et relus un par un à la recherche.
+    """
+    def __init__(self, block=SEARCH_BLOCK, segment=SEARCH_SEGMENT_BLOCKS, directory=None):
+        self.block = block
+        self.segment = segment
+        self.count = 0
+        self._postings = {}    # segment en cours : trigramme -> blocs
+        self._segments = []    # segments complets : (offset, taille) dans _file
+        self._directory = directory
+        self._file = None
+
+    def add(self, lines):
+        b = self.block
+        start = self.count
+        postings = self._postings
+        i = 0
+        while i < len(lines):
+            blk = (start + i) // b
+            if blk // self.segment > len(self._segments):
+                self._seal()
+                postings = self._postings
+            j = min(len(lines), (blk + 1) * b - start)
+            text = "\n".join(lines[i:j]).lower()
+            for tri in {text[k:k+3] for k in range(len(text) - 2)}:
+                p = postings.get(tri)
+                if p is None:
+                    postings[tri] = array("I", (blk,))
+                elif p[-1] != blk:
+                    p.append(blk)
+            i = j
+        self.count += len(lines)
+
+    def _seal(self):
+        """Écrit les postings du segment en cours sur disque et repart de zéro."""
+        import marshal
+        if self._file is None:
+            import tempfile
+            self._file = tempfile.TemporaryFile(dir=self._directory)
+        data = marshal.dumps({tri: p.tobytes() for tri, p in self._postings.items()})
+        self._file.seek(0, 2)
+        self._segments.append((self._file.tell(), len(data)))
+        self._file.write(data)
+        self._postings = {}
+
+    def _load(self, seg):
+        import marshal
+        offset, size = self._segments[seg]
+        self._file.seek(offset)
+        return marshal.loads(self._file.read(size))
+
+    def candidate_blocks(self, literal):
+        """
+        Blocs pouvant contenir literal, en ordre croissant (itérateur : un
+        segment relu à la fois), ou None si l’index ne sait pas filtrer.
+        """
+        lit = literal.lower()
+        if len(lit) < 3:
+            return None
+        return self._candidates({lit[k:k+3] for k in range(len(lit) - 2)})
+
+    def _candidates(self, tris):
+        for seg in range(len(self._segments) + 1):
+            if seg < len(self._segments):
+                postings, sealed = self._load(seg), True
+            else:
+                postings, sealed = self._postings, False
+            lists = []
+            for tri in tris:
+                p = postings.get(tri)
+                if p is None:
+                    break
+                lists.append(array("I", p) if sealed else p)
+            else:
+                lists.sort(key=len)
+                cand = set(lists[0])
+                for p in lists[1:]:
+                    cand.intersection_update(p)
+                    if not cand:
+                        break
+                yield from sorted(cand)
+
+    def clear(self):
+        self._postings = {}
+        self._segments.clear()
+        if self._file is not None:
+            self._file.seek(0)
+            self._file.truncate()
+        self.count = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def _regex_literal(pattern):
+    """Plus longue suite de caractères littéraux imposée par la regex (pré‑filtre de l’index)."""
+    try:
+        import re._parser as sre_parse  # Python 3.11+
+    except ImportError:
+        import sre_parse  # type: ignore
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return ""
+    best = cur = ""
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            cur += chr(av)
+            if len(cur) > len(best):
+                best = cur
+        else:
+            cur = ""
+    return best
+
+def _line_matcher(query, regex=False):
+    """Retourne f(ligne) -> [(colonne, longueur), ...] ; lève re.error si regex invalide."""
+    if regex:
+        rx = re.compile(query, re.IGNORECASE)
+        return lambda line: [(m.start(), m.end() - m.start()) for m in rx.finditer(line) if m.end() > m.start()]
+    q = query.lower()
+    n = len(q)
+    def match(line):
+        low = line.lower()
+        out = []
+        i = low.find(q)
+        while i >= 0:
+            out.append((i, n))
+            i = low.find(q, i + n)
+        return out
+    return match
+
+def scrollback_search(store, index, query, regex=False, stop=None):
+    """
+    Génère, bloc par bloc, les listes de correspondances (ligne, colonne,
+    longueur) dans les lignes [0, stop) (par défaut : celles présentes au départ).
+    """
+    match_line = _line_matcher(query, regex)
+    if stop is None:
+        stop = store.count
+    literal = _regex_literal(query) if regex else query
+    blocks = index.candidate_blocks(literal) if literal else None
+    if blocks is None:
+        blocks = range((stop + index.block - 1) // index.block)
+    for blk in blocks:
+        start = blk * index.block
+        if start >= stop:
+            break
+        found = []
+        for i, line in enumerate(store.get_lines(start, min(stop, start + index.block))):
+            for col, n in match_line(line):
+                found.append((start + i, col, n))
+        yield found
+
+# ---- Cache de listings pour la complétion ----
+class DirListingCache:
+    """
+    Listings [(nom, est_dossier), ...] triés, par dossier, invalidés quand le
+    mtime du dossier change (un stat au lieu d’un listing complet par Tab).
+    """
+    def __init__(self, maxsize=COMPLETE_CACHE_DIRS):
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+
+    def list(self, path):
+        key = os.fspath(path)
+        try:
+            mtime = os.stat(key).st_mtime_ns
+        except OSError:
+            return []
+        hit = self._cache.get(key)
+        if hit is not None and hit[0] == mtime:
+            self._cache.move_to_end(key)
+            return hit[1]
+        entries = []
+        try:
+            with os.scandir(key) as it:
+                for e in it:
+                    try:
+                        entries.append((e.name, e.is_dir()))
+                    except OSError:
+                        entries.append((e.name, False))
+        except OSError:
+            return []
+        entries.sort()
+        self._cache[key] = (mtime, entries)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return entries
+
+# ---- Index persistant des noms de fichiers ----
+class FileIndex:
+    """
+    Index des chemins sous une racine, sauvegardé sur disque.
+    Par dossier on garde (mtime_ns, noms) : un rafraîchissement ne relit que
+    les dossiers dont le mtime a changé (un stat pour les autres).
+    Les requêtes travaillent sur un seul gros texte (un chemin par ligne) :
+    str.find / re en C, quelques ms même sur des millions de chemins.
+    """
+    MAGIC = "FREEOS-LOCATE 1"
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.dirs = {}          # "rel/dossier" -> (mtime_ns, ["fichier", "sousdossier/", ...])
+        self.updated = 0.0      # time.time() du dernier crawl
+        self._blob = None
+        self._blob_low = None
+
+    @staticmethod
+    def path_for(root):
+        import hashlib
+        h = hashlib.sha1(os.fspath(Path(root)).encode("utf-8", "surrogateescape")).hexdigest()[:16]
+        return LOCATE_DIR / f"{h}.idx"
+
+    def refresh(self, check=None):
+        """Parcourt la racine ; retourne (dossiers relus, dossiers inchangés)."""
+        old = self.dirs
+        new = {}
+        rescanned = reused = 0
+        stack = [""]
+        while stack:
+            if check is not None:
+                check()
+            rel = stack.pop()
+            full = os.path.join(self.root, rel) if rel else os.fspath(self.root)
+            try:
+                mtime = os.stat(full).st_mtime_ns
+            except OSError:
+                continue
+            prev = old.get(rel)
+            if prev is not None and prev[0] == mtime:
+                names = prev[1]
+                reused += 1
+            else:
+                names = []
+                try:
+                    with os.scandir(full) as it:
+                        for e in it:
+                            if "\n" in e.name:
+                                continue
+                            try:
+                                is_dir = e.is_dir(follow_symlinks=False)
+                            except OSError:
+                                is_dir = False
+                            names.append(e.name + "/" if is_dir else e.name)
+                except OSError:
+                    pass
+                rescanned += 1
+            new[rel] = (mtime, names)
+            for n in names:
+                if n.endswith("/"):
+                    stack.append(f"{rel}/{n[:-1]}" if rel else n[:-1])
+        self.dirs = new
+        self.updated = time.time()
+        self._blob = self._blob_low = None
+        return rescanned, reused
+
+    def save(self, path=None):
+        path = Path(path or self.path_for(self.root))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8", errors="surrogateescape") as f:
+            f.write(f"{self.MAGIC}\t{self.updated}\t{self.root}\n")
+            for rel, (mtime, names) in self.dirs.items():
+                f.write(f"D\t{mtime}\t{rel}\n")
+                if names:
+                    f.write("\t" + "\n\t".join(names) + "\n")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8", errors="surrogateescape") as f:
+            magic, updated, root = f.readline().rstrip("\n").split("\t", 2)
+            if magic != cls.MAGIC:
+                raise ValueError(f"index invalide : {path}")
+            idx = cls(root)
+            idx.updated = float(updated)
+            names = None
+            for line in f:
+                line = line.rstrip("\n")
+                if line.startswith("\t"):
+                    names.append(line[1:])
+                else:
+                    _, mtime, rel = line.split("\t", 2)
+                    names = []
+                    idx.dirs[rel] = (int(mtime), names)
+        return idx
+
+    def __len__(self):
+        return sum(len(names) for _, names in self.dirs.values())
+
+    def _text(self):
+        if self._blob is None:
+            parts = []
+            for rel, (_, names) in self.dirs.items():
+                prefix = rel + "/" if rel else ""
+                parts.extend(prefix + n for n in names)
+            self._blob = "\n" + "\n".join(parts) + "\n"
+            self._blob_low = self._blob.lower()
+        return self._blob, self._blob_low
+
+    @staticmethod
+    def _name_end(low, end):
+        """Fin du nom de la ligne finissant en end (hors « / » final des dossiers)."""
+        return end - 1 if low[end - 1] == "/" else end
+
+    def search(self, needle, fuzzy=False, basename=False, limit=LOCATE_MAX_RESULTS):
+        """Chemins (relatifs à la racine) contenant needle, ou ses lettres dans l’ordre (fuzzy)."""
+        blob, low = self._text()
+        needle = needle.lower()
+        out = []
+        if not needle:
+            return out
+        if fuzzy:
+            # a[^\nb]*b[^\nc]*c... : chaque lettre prend sa 1re occurrence, sans retour arrière
+            parts = [re.escape(needle[0])]
+            for ch in needle[1:]:
+                parts.append(f"[^\\n{re.escape(ch)}]*+{re.escape(ch)}")
+            try:
+                rx = re.compile("".join(parts))
+            except re.error:  # quantificateurs possessifs : Python 3.11+
+                rx = re.compile("".join(parts).replace("*+", "*"))
+            hits = []
+            m = rx.search(low)
+            while m is not None:
+                start = low.rfind("\n", 0, m.start()) + 1
+                end = low.find("\n", m.end())
+                slash = low.rfind("/", start, self._name_end(low, end)) if basename else -1
+                if slash >= m.start():
+                    m = rx.search(low, slash + 1)  # recommencer dans le nom de fichier
+                    continue
+                hits.append((m.end() - m.start(), end - start, blob[start:end]))
+                m = rx.search(low, end)  # une correspondance par ligne suffit
+            hits.sort()
+            return [h[2] for h in hits[:limit]]
+        i = low.find(needle)
+        while i >= 0 and len(out) < limit:
+            start = low.rfind("\n", 0, i) + 1
+            end = low.find("\n", i)
+            slash = low.rfind("/", start, self._name_end(low, end)) if basename else -1
+            if slash >= i:
+                i = low.find(needle, slash + 1)  # recommencer dans le nom de fichier
+                continue
+            out.append(blob[start:end])
+            i = low.find(needle, end)
+        return out
+
+# ---- Échecs : bitboards ----
+# Cases 0..63 : a1=0, b1=1 … h8=63 ; bit n d’un entier = case n.
+# Pièces : 0..5 = P N B R Q K (blancs), +6 pour les noirs ; -1 = case vide.
+CHESS_START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+WHITE, BLACK = 0, 1
+PIECE_CHARS = "PNBRQKpnbrqk"
+# Coup = départ | arrivée << 6 | promotion << 12 | drapeau << 16
+MOVE_NORMAL, MOVE_EP, MOVE_CASTLE, MOVE_DOUBLE = range(4)
+
+def chess_sq_name(sq):
+    return "abcdefgh"[sq & 7] + str((sq >> 3) + 1)
+
+def chess_sq_parse(name):
+    name = name.strip().lower()
+    if len(name) != 2 or name[0] not in "abcdefgh" or name[1] not in "12345678":
+        raise ValueError(f"case invalide : {name!r}")
+    return "abcdefgh".index(name[0]) + 8 * (int(name[1]) - 1)
+
+def chess_move_uci(m):
+    promo = (m >> 12) & 7
+    return chess_sq_name(m & 63) + chess_sq_name((m >> 6) & 63) + ("nbrq"[promo - 1] if promo else "")
+
+class _ChessTables:
+    """Tables d’attaques précalculées (construites au 1er usage : chess_tables())."""
+    # directions (df, dr) ; les 4 premières font croître l’index de case
+    DIRS = ((0, 1), (1, 0), (1, 1), (-1, 1), (0, -1), (-1, 0), (1, -1), (-1, -1))
+
+    def __init__(self):
+        self.knight = [0] * 64
+        self.king = [0] * 64
+        self.pawn = [[0] * 64, [0] * 64]      # cases attaquées par un pion de la couleur
+        self.rays = [[0] * 64 for _ in self.DIRS]
+        self.between = [[0] * 64 for _ in range(64)]  # cases strictement entre a et b
+        self.line = [[0] * 64 for _ in range(64)]     # droite complète passant par a et b
+        for sq in range(64):
+            f, r = sq & 7, sq >> 3
+            for df, dr in ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)):
+                if 0 <= f + df < 8 and 0 <= r + dr < 8:
+                    self.knight[sq] |= 1 << (sq + df + 8 * dr)
+            for df, dr in self.DIRS:
+                if 0 <= f + df < 8 and 0 <= r + dr < 8:
+                    self.king[sq] |= 1 << (sq + df + 8 * dr)
+            for color, dr in ((WHITE, 1), (BLACK, -1)):
+                for df in (-1, 1):
+                    if 0 <= f + df < 8 and 0 <= r + dr < 8:
+                        self.pawn[color][sq] |= 1 << (sq + df + 8 * dr)
+            for d, (df, dr) in enumerate(self.DIRS):
+                ff, rr, passed = f + df, r + dr, 0
+                while 0 <= ff < 8 and 0 <= rr < 8:
+                    t = ff + 8 * rr
+                    self.rays[d][sq] |= 1 << t
+                    self.between[sq][t] = passed
+                    passed |= 1 << t
+                    ff += df; rr += dr
+        for sq in range(64):
+            for d in range(4):
+                full = self.rays[d][sq] | self.rays[d + 4][sq] | (1 << sq)
+                bb = full
+                while bb:
+                    t = (bb & -bb).bit_length() - 1
+                    bb &= bb - 1
+                    self.line[sq][t] = full
+        # (table, sens croissant) pour les glissements tour / fou
+        self.rook_rays = [(self.rays[d], d < 4) for d in (0, 1, 4, 5)]
+        self.bishop_rays = [(self.rays[d], d < 4) for d in (2, 3, 6, 7)]
+        self.rook_empty = [self.rays[0][s] | self.rays[1][s] | self.rays[4][s] | self.rays[5][s] for s in range(64)]
+        self.bishop_empty = [self.rays[2][s] | self.rays[3][s] | self.rays[6][s] | self.rays[7][s] for s in range(64)]
+        # droits de roque conservés quand une pièce part de / arrive sur la case
+        self.castle_mask = [15] * 64
+        for sq, lost in ((4, 3), (7, 1), (0, 2), (60, 12), (63, 4), (56, 8)):
+            self.castle_mask[sq] = 15 & ~lost
+        # clés de Zobrist (graine fixe : mêmes clés d’une session à l’autre)
+        rng = _random.Random(0x5EED)
+        self.zob_piece = [[rng.getrandbits(64) for _ in range(64)] for _ in range(12)]
+        self.zob_side = rng.getrandbits(64)
+        self.zob_castle = [rng.getrandbits(64) for _ in range(16)]
+        self.zob_ep = [rng.getrandbits(64) for _ in range(8)]
+
+    @staticmethod
+    def slide(table, sq, occ):
+        a = 0
+        for rays, up in table:
+            r = rays[sq]
+            b = r & occ
+            if b:
+                r ^= rays[(b & -b).bit_length() - 1] if up else rays[b.bit_length() - 1]
+            a |= r
+        return a
+
+@lru_cache(maxsize=None)
+def chess_tables():
+    return _ChessTables()
+
+class ChessPosition:
+    """
+    Position d’échecs : 12 bitboards + tableau de 64 cases pour les lectures
+    rapides. make/unmake modifient la position sur place (pile d’annulation).
+    """
+    __slots__ = ("bb", "occ", "board", "side", "castling", "ep", "halfmove", "fullmove", "key", "_undo", "_t")
+
+    def __init__(self, fen=CHESS_START_FEN):
+        self._t = chess_tables()
+        self.set_fen(fen)
+
+    def copy(self):
+        other = ChessPosition.__new__(ChessPosition)
+        other._t = self._t
+        other.bb = self.bb[:]
+        other.occ = self.occ[:]
+        other.board = self.board[:]
+        other.side, other.castling, other.ep = self.side, self.castling, self.ep
+        other.halfmove, other.fullmove = self.halfmove, self.fullmove
+        other.key = self.key
+        other._undo = self._undo[:]  # garde l’historique (répétitions)
+        return other
+
+    def set_fen(self, fen):
+        parts = fen.split()
+        if len(parts) < 2:
+            raise ValueError("FEN incomplète")
+        rows = parts[0].split("/")
+        if len(rows) != 8:
+            raise ValueError("FEN : 8 rangées attendues")
+        self.bb = [0] * 12
+        self.board = [-1] * 64
+        for i, row in enumerate(rows):
+            f = 0
+            for ch in row:
+                if ch.isdigit():
+                    f += int(ch)
+                    continue
+                p = PIECE_CHARS.find(ch)
+                if p < 0 or f > 7:
+                    raise ValueError(f"FEN : rangée invalide {row!r}")
+                sq = f + 8 * (7 - i)
+                self.bb[p] |= 1 << sq
+                self.board[sq] = p
+                f += 1
+            if f != 8:
+                raise ValueError(f"FEN : rangée invalide {row!r}")
+        if parts[1] not in ("w", "b"):
+            raise ValueError("FEN : trait 'w' ou 'b' attendu")
+        self.side = WHITE if parts[1] == "w" else BLACK
+        rights = parts[2] if len(parts) > 2 else "-"
+        self.castling = sum(bit for ch, bit in (("K", 1), ("Q", 2), ("k", 4), ("q", 8)) if ch in rights)
+        ep = parts[3] if len(parts) > 3 else "-"
+        self.ep = -1 if ep == "-" else chess_sq_parse(ep)
+        self.halfmove = int(parts[4]) if len(parts) > 4 else 0
+        self.fullmove = int(parts[5]) if len(parts) > 5 else 1
+        self.occ = [0, 0]
+        for p in range(12):
+            self.occ[p // 6] |= self.bb[p]
+        if bin(self.bb[KING]).count("1") != 1 or bin(self.bb[KING + 6]).count("1") != 1:
+            raise ValueError("FEN : un roi par camp attendu")
+        self._undo = []
+        self.key = self.compute_key()
+
+    def fen(self):
+        rows = []
+        for r in range(7, -1, -1):
+            row, empty = "", 0
+            for p in self.board[8 * r: 8 * r + 8]:
+                if p < 0:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += PIECE_CHARS[p]
+            rows.append(row + (str(empty) if empty else ""))
+        rights = "".join(ch for ch, bit in (("K", 1), ("Q", 2), ("k", 4), ("q", 8)) if self.castling & bit) or "-"
+        ep = chess_sq_name(self.ep) if self.ep >= 0 else "-"
+        return f"{'/'.join(rows)} {'wb'[self.side]} {rights} {ep} {self.halfmove} {self.fullmove}"
+
+    def compute_key(self):
+        """Clé de Zobrist complète (make/unmake la tiennent à jour)."""
+        t = self._t
+        k = t.zob_castle[self.castling]
+        for sq, p in enumerate(self.board):
+            if p >= 0:
+                k ^= t.zob_piece[p][sq]
+        if self.ep >= 0:
+            k ^= t.zob_ep[self.ep & 7]
+        if self.side == BLACK:
+            k ^= t.zob_side
+        return k
+
+    # -- attaques
+    def attacked(self, sq, by, occ=None):
+        """Vrai si la case sq est attaquée par le camp by."""
+        t, bb = self._t, self.bb
+        if occ is None:
+            occ = self.occ[0] | self.occ[1]
+        o = 6 * by
+        if t.pawn[by ^ 1][sq] & bb[o] or t.knight[sq] & bb[o + 1] or t.king[sq] & bb[o + 5]:
+            return True
+        if t.bishop_empty[sq] & (bb[o + 2] | bb[o + 4]) and t.slide(t.bishop_rays, sq, occ) & (bb[o + 2] | bb[o + 4]):
+            return True
+        if t.rook_empty[sq] & (bb[o + 3] | bb[o + 4]) and t.slide(t.rook_rays, sq, occ) & (bb[o + 3] | bb[o + 4]):
+            return True
+        return False
+
+    def king_square(self, color):
+        return self.bb[KING + 6 * color].bit_length() - 1
+
+    def in_check(self):
+        return self.attacked(self.king_square(self.side), self.side ^ 1)
+
+    # -- génération
+    def legal_moves(self):
+        t, bb, board = self._t, self.bb, self.board
+        us = self.side
+        them = us ^ 1
+        o, ot = 6 * us, 6 * them
+        own, opp = self.occ[us], self.occ[them]
+        occ = own | opp
+        ksq = bb[o + KING].bit_length() - 1
+        slide = t.slide
+        moves = []
+        add = moves.append
+
+        # échecs et clouages
+        checkers = ((t.pawn[us][ksq] & bb[ot]) | (t.knight[ksq] & bb[ot + 1])
+                    | (slide(t.bishop_rays, ksq, occ) & (bb[ot + 2] | bb[ot + 4]))
+                    | (slide(t.rook_rays, ksq, occ) & (bb[ot + 3] | bb[ot + 4])))
+        # roi : ses cases d’arrivée sont testées sans lui (il ne se cache pas derrière lui‑même)
+        occ_nok = occ ^ (1 << ksq)
+        targets = t.king[ksq] & ~own
+        while targets:
+            to = (targets & -targets).bit_length() - 1
+            targets &= targets - 1
+            if not self.attacked(to, them, occ_nok):
+                add(ksq | to << 6)
+        if checkers & (checkers - 1):
+            return moves  # échec double : seul le roi bouge
+        if checkers:
+            csq = checkers.bit_length() - 1
+            mask = checkers | t.between[ksq][csq]
+        else:
+            mask = ~own & 0xFFFFFFFFFFFFFFFF
+        pinned = 0
+        snipers = ((t.bishop_empty[ksq] & (bb[ot + 2] | bb[ot + 4]))
+                   | (t.rook_empty[ksq] & (bb[ot + 3] | bb[ot + 4])))
+        while snipers:
+            s = (snipers & -snipers).bit_length() - 1
+            snipers &= snipers - 1
+            b = t.between[ksq][s] & occ
+            if b and not b & (b - 1) and b & own:
+                pinned |= b
+        line = t.line[ksq]
+
+        # cavaliers, fous, tours, dames
+        for p in (KNIGHT, BISHOP, ROOK, QUEEN):
+            pcs = bb[o + p]
+            while pcs:
+                frm = (pcs & -pcs).bit_length() - 1
+                pcs &= pcs - 1
+                if p == KNIGHT:
+                    if (1 << frm) & pinned:
+                        continue
+                    targets = t.knight[frm]
+                elif p == BISHOP:
+                    targets = slide(t.bishop_rays, frm, occ)
+                elif p == ROOK:
+                    targets = slide(t.rook_rays, frm, occ)
+                else:
+                    targets = slide(t.bishop_rays, frm, occ) | slide(t.rook_rays, frm, occ)
+                targets &= mask & ~own
+                if (1 << frm) & pinned:
+                    targets &= line[frm]
+                while targets:
+                    to = (targets & -targets).bit_length() - 1
+                    targets &= targets - 1
+                    add(frm | to << 6)
+
+        # pions
+        pawns = bb[o]
+        empty = ~occ & 0xFFFFFFFFFFFFFFFF
+        if us == WHITE:
+            push1 = (pawns << 8) & empty
+            push2 = ((push1 & 0xFF0000) << 8) & empty
+            fwd, last = 8, 7
+        else:
+            push1 = (pawns >> 8) & empty
+            push2 = ((push1 & 0xFF0000000000) >> 8) & empty
+            fwd, last = -8, 0
+        for targets, step, flag in ((push1 & mask, fwd, MOVE_NORMAL), (push2 & mask, 2 * fwd, MOVE_DOUBLE)):
+            while targets:
+                to = (targets & -targets).bit_length() - 1
+                targets &= targets - 1
+                frm = to - step
+                if (1 << frm) & pinned and not line[frm] >> to & 1:
+                    continue
+                if to >> 3 == last:
+                    for promo in (4, 3, 2, 1):
+                        add(frm | to << 6 | promo << 12)
+                else:
+                    add(frm | to << 6 | flag << 16)
+        pcs = pawns
+        pawn_att = t.pawn[us]
+        while pcs:
+            frm = (pcs & -pcs).bit_length() - 1
+            pcs &= pcs - 1
+            targets = pawn_att[frm] & opp & mask
+            if (1 << frm) & pinned:
+                targets &= line[frm]
+            while targets:
+                to = (targets & -targets).bit_length() - 1
+                targets &= targets - 1
+                if to >> 3 == last:
+                    for promo in (4, 3, 2, 1):
+                        add(frm | to << 6 | promo << 12)
+                else:
+                    add(frm | to << 6)
+        if self.ep >= 0:
+            cands = t.pawn[them][self.ep] & pawns
+            while cands:
+                frm = (cands & -cands).bit_length() - 1
+                cands &= cands - 1
+                m = frm | self.ep << 6 | MOVE_EP << 16
+                # rare : vérification complète (clouage horizontal, échec)
+                self.make(m)
+                if not self.attacked(ksq, them):
+                    add(m)
+                self.unmake()
+
+        # roques
+        if not checkers and self.castling:
+            if us == WHITE:
+                if self.castling & 1 and not occ & 0x60 and board[7] == ROOK \
+                        and not self.attacked(5, them, occ) and not self.attacked(6, them, occ):
+                    add(4 | 6 << 6 | MOVE_CASTLE << 16)
+                if self.castling & 2 and not occ & 0xE and board[0] == ROOK \
+                        and not self.attacked(3, them, occ) and not self.attacked(2, them, occ):
+                    add(4 | 2 << 6 | MOVE_CASTLE << 16)
+            else:
+                if self.castling & 4 and not occ & (0x60 << 56) and board[63] == ROOK + 6 \
+                        and not self.attacked(61, them, occ) and not self.attacked(62, them, occ):
+                    add(60 | 62 << 6 | MOVE_CASTLE << 16)
+                if self.castling & 8 and not occ & (0xE << 56) and board[56] == ROOK + 6 \
+                        and not self.attacked(59, them, occ) and not self.attacked(58, them, occ):
+                    add(60 | 58 << 6 | MOVE_CASTLE << 16)
+        return moves
+
+    # -- jouer / annuler
+    def make(self, m):
+        bb, board, occ = self.bb, self.board, self.occ
+        frm, to = m & 63, (m >> 6) & 63
+        flag = m >> 16
+        us = self.side
+        p = board[frm]
+        fb, tb = 1 << frm, 1 << to
+        if flag == MOVE_EP:
+            csq = to - 8 if us == WHITE else to + 8
+            captured = board[csq]
+        else:
+            captured = board[to]
+        self._undo.append((m, captured, self.castling, self.ep, self.halfmove, self.key))
+        t = self._t
+        zp = t.zob_piece
+        key = self.key ^ t.zob_side ^ t.zob_castle[self.castling]
+        if self.ep >= 0:
+            key ^= t.zob_ep[self.ep & 7]
+        if flag == MOVE_EP:
+            key ^= zp[captured][csq]
+            bb[captured] ^= 1 << csq
+            occ[us ^ 1] ^= 1 << csq
+            board[csq] = -1
+        elif captured >= 0:
+            key ^= zp[captured][to]
+            bb[captured] ^= tb
+            occ[us ^ 1] ^= tb
+        bb[p] ^= fb
+        promo = (m >> 12) & 7
+        np = p + promo if promo else p
+        key ^= zp[p][frm] ^ zp[np][to]
+        bb[np] |= tb
+        occ[us] ^= fb | tb
+        board[frm] = -1
+        board[to] = np
+        if flag == MOVE_CASTLE:
+            if to > frm:
+                rf, rt = frm + 3, frm + 1
+            else:
+                rf, rt = frm - 4, frm - 1
+            r = board[rf]
+            key ^= zp[r][rf] ^ zp[r][rt]
+            bb[r] ^= (1 << rf) | (1 << rt)
+            occ[us] ^= (1 << rf) | (1 << rt)
+            board[rf] = -1
+            board[rt] = r
+        cm = t.castle_mask
+        self.castling &= cm[frm] & cm[to]
+        key ^= t.zob_castle[self.castling]
+        if flag == MOVE_DOUBLE:
+            self.ep = (frm + to) >> 1
+            key ^= t.zob_ep[frm & 7]
+        else:
+            self.ep = -1
+        self.key = key
+        self.halfmove = 0 if (p % 6 == PAWN or captured >= 0) else self.halfmove + 1
+        if us == BLACK:
+            self.fullmove += 1
+        self.side = us ^ 1
+
+    def unmake(self):
+        m, captured, self.castling, self.ep, self.halfmove, self.key = self._undo.pop()
+        bb, board, occ = self.bb, self.board, self.occ
+        us = self.side ^ 1
+        self.side = us
+        if us == BLACK:
+            self.fullmove -= 1
+        frm, to = m & 63, (m >> 6) & 63
+        flag = m >> 16
+        np = board[to]
+        p = np - ((m >> 12) & 7)
+        fb, tb = 1 << frm, 1 << to
+        bb[np] ^= tb
+        bb[p] |= fb
+        occ[us] ^= fb | tb
+        board[frm] = p
+        board[to] = -1
+        if flag == MOVE_EP:
+            csq = to - 8 if us == WHITE else to + 8
+            bb[captured] |= 1 << csq
+            occ[us ^ 1] |= 1 << csq
+            board[csq] = captured
+        elif captured >= 0:
+            bb[captured] |= tb
+            occ[us ^ 1] |= tb
+            board[to] = captured
+        if flag == MOVE_CASTLE:
+            if to > frm:
+                rf, rt = frm + 3, frm + 1
+            else:
+                rf, rt = frm - 4, frm - 1
+            r = board[rt]
+            bb[r] ^= (1 << rf) | (1 << rt)
+            occ[us] ^= (1 << rf) | (1 << rt)
+            board[rt] = -1
+            board[rf] = r
+
+    # -- outils
+    def find_move(self, frm, to, promo=QUEEN):
+        """Coup légal frm→to (promotion : promo) ou None."""
+        cand = None
+        for m in self.legal_moves():
+            if m & 63 == frm and (m >> 6) & 63 == to:
+                pr = (m >> 12) & 7
+                if not pr or pr == promo:
+                    return m
+                cand = cand or m
+        return cand if cand is not None and not promo else None
+
+    def parse_move(self, text):
+        """Coup saisi : 'e2e4', 'e2 e4', 'e7e8q' / 'e7 e8 q'."""
+        s = "".join(text.lower().split()).replace("-", "")
+        if len(s) not in (4, 5):
+            raise ValueError("format : e2 e4 (ou e7 e8 q pour une promotion)")
+        promo = "nbrq".find(s[4]) + 1 if len(s) == 5 else QUEEN
+        if promo <= 0:
+            raise ValueError("promotion : q, r, b ou n")
+        return self.find_move(chess_sq_parse(s[:2]), chess_sq_parse(s[2:4]), promo)
+
+    def parse_san(self, san):
+        """Coup en notation algébrique (PGN : Nf3, exd5, O-O, e8=Q+…) -> coup légal."""
+        s = san.rstrip("+#!?")
+        if s in ("O-O", "0-0", "O-O-O", "0-0-0"):
+            to_file = 6 if len(s) == 3 else 2
+            for m in self.legal_moves():
+                if m >> 16 == MOVE_CASTLE and (m >> 6) & 7 == to_file:
+                    return m
+            raise ValueError(f"roque illégal : {san}")
+        promo = 0
+        if "=" in s:
+            s, pr = s.split("=", 1)
+            promo = "NBRQ".find(pr[:1].upper()) + 1
+        elif len(s) > 2 and s[-1] in "NBRQ" and s[-2] in "18":
+            promo = "NBRQ".index(s[-1]) + 1
+            s = s[:-1]
+        piece = PAWN
+        if s[:1] in ("N", "B", "R", "Q", "K"):
+            piece = "PNBRQK".index(s[0])
+            s = s[1:]
+        s = s.replace("x", "").replace(":", "").replace("-", "")
+        if len(s) < 2:
+            raise ValueError(f"coup illisible : {san}")
+        to = chess_sq_parse(s[-2:])
+        hint = s[:-2]
+        hint_file = "abcdefgh".find(hint[0]) if hint and hint[0] in "abcdefgh" else -1
+        hint_rank = int(hint[-1]) - 1 if hint and hint[-1] in "12345678" else -1
+        found = None
+        for m in self.legal_moves():
+            frm = m & 63
+            if (m >> 6) & 63 != to or self.board[frm] % 6 != piece or (m >> 12) & 7 != promo:
+                continue
+            if hint_file >= 0 and frm & 7 != hint_file or hint_rank >= 0 and frm >> 3 != hint_rank:
+                continue
+            if found is not None:
+                raise ValueError(f"coup ambigu : {san}")
+            found = m
+        if found is None:
+            raise ValueError(f"coup illégal : {san}")
+        return found
+
+    def san(self, m, legal=None):
+        """Notation algébrique d’un coup légal (Nbd7, exd5, e8=Q+, O-O#…)."""
+        frm, to, promo = m & 63, (m >> 6) & 63, (m >> 12) & 7
+        if m >> 16 == MOVE_CASTLE:
+            s = "O-O" if to & 7 == 6 else "O-O-O"
+        else:
+            piece = self.board[frm] % 6
+            capture = self.board[to] >= 0 or m >> 16 == MOVE_EP
+            if piece == PAWN:
+                s = ("abcdefgh"[frm & 7] + "x" if capture else "") + chess_sq_name(to)
+                if promo:
+                    s += "=" + "NBRQ"[promo - 1]
+            else:
+                s = "NBRQK"[piece - 1]
+                if legal is None:
+                    legal = self.legal_moves()
+                rivals = [o & 63 for o in legal
+                          if (o >> 6) & 63 == to and o & 63 != frm and self.board[o & 63] % 6 == piece]
+                if rivals:
+                    if all(o & 7 != frm & 7 for o in rivals):
+                        s += "abcdefgh"[frm & 7]
+                    elif all(o >> 3 != frm >> 3 for o in rivals):
+                        s += str((frm >> 3) + 1)
+                    else:
+                        s += chess_sq_name(frm)
+                s += ("x" if capture else "") + chess_sq_name(to)
+        self.make(m)
+        if self.in_check():
+            s += "+" if self.legal_moves() else "#"
+        self.unmake()
+        return s
+
+    def played_moves(self):
+        """Coups joués depuis le dernier set_fen (pour enregistrer la partie)."""
+        return [u[0] for u in self._undo]
+
+    def status(self):
+        """None si la partie continue, sinon 'mat' ou 'pat'."""
+        if self.legal_moves():
+            return None
+        return "mat" if self.in_check() else "pat"
+
+    def perft(self, depth):
+        """Nombre de feuilles de l’arbre des coups légaux à la profondeur donnée."""
+        moves = self.legal_moves()
+        if depth <= 1:
+            return len(moves) if depth == 1 else 1
+        n = 0
+        make, unmake, perft = self.make, self.unmake, self.perft
+        for m in moves:
+            make(m)
+            n += perft(depth - 1)
+            unmake()
+        return n
+
+    def ascii(self):
+        lines = []
+        for r in range(7, -1, -1):
+            row = self.board[8 * r: 8 * r + 8]
+            lines.append(f"{r + 1} " + " ".join(PIECE_CHARS[p] if p >= 0 else "·" for p in row) + " ")
+        lines.append("  a b c d e f g h")
+        return "\n".join(lines)
+
+# ---- Échecs : PGN (lecture au fil de l’eau) ----
+_PGN_TAG_RE = re.compile(r'^\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]\s*$')
+_PGN_TOKEN_RE = re.compile(r"\{[^}]*\}?|;.*|\$\d+|\(|\)|[^\s{}();]+")
+_PGN_RESULTS = {"1-0", "0-1", "1/2-1/2", "*"}
+
+def iter_pgn_games(lines):
+    """
+    Parties d’un flux de lignes PGN : rend (tags, coups SAN, résultat) sans
+    jamais garder plus d’une partie en mémoire. Commentaires, variantes et
+    NAG sont ignorés.
+    """
+    tags, moves, result = {}, [], None
+    depth = 0            # variantes imbriquées ( ... )
+    in_comment = False   # commentaire { ... } sur plusieurs lignes
+    for line in lines:
+        if in_comment:
+            end = line.find("}")
+            if end < 0:
+                continue
+            line = line[end + 1:]
+            in_comment = False
+        s = line.strip()
+        if not s or s.startswith("%"):
+            continue
+        if s.startswith("[") and depth == 0:
+            m = _PGN_TAG_RE.match(s)
+            if m:
+                if moves or result is not None:
+                    yield tags, moves, result
+                    tags, moves, result = {}, [], None
+                tags[m.group(1)] = m.group(2).replace('\\"', '"')
+                continue
+        for tok in _PGN_TOKEN_RE.findall(s):
+            c = tok[0]
+            if c == "{":
+                if not tok.endswith("}"):
+                    in_comment = True
+                continue
+            if c == ";" or c == "$":
+                continue
+            if c == "(":
+                depth += 1
+                continue
+            if c == ")":
+                depth = max(0, depth - 1)
+                continue
+            if depth:
+                continue
+            if tok in _PGN_RESULTS:
+                result = tok
+                yield tags, moves, result
+                tags, moves, result = {}, [], None
+                continue
+            tok = tok.lstrip("0123456789").lstrip(".") if c.isdigit() else tok
+            if tok:
+                moves.append(tok)
+    if moves or tags:
+        yield tags, moves, result
+
+PGN_ROSTER = (("Event", "?"), ("Site", "?"), ("Date", "????.??.??"), ("Round", "?"),
+              ("White", "?"), ("Black", "?"), ("Result", "*"))
+PGN_LINE_WIDTH = 80
+
+def _pgn_tag(name, value):
+    value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'[{name} "{value}"]'
+
+def pgn_game_text(tags, sans, result=None):
+    """
+    Texte PGN d’une partie : les sept tags obligatoires d’abord, puis les
+    autres (FEN/SetUp si la partie ne part pas du début), coups numérotés,
+    lignes de 80 colonnes au plus, ligne vide finale.
+    """
+    tags = dict(tags)
+    tags["Result"] = result = result or tags.get("Result") or "*"
+    fen = tags.get("FEN")
+    if fen and fen != CHESS_START_FEN:
+        tags["SetUp"] = "1"
+    else:
+        tags.pop("FEN", None)
+        tags.pop("SetUp", None)
+    lines = [_pgn_tag(name, tags.get(name, default)) for name, default in PGN_ROSTER]
+    lines += [_pgn_tag(name, value) for name, value in tags.items() if name not in dict(PGN_ROSTER)]
+    lines.append("")
+    parts = (fen or CHESS_START_FEN).split()
+    black = len(parts) > 1 and parts[1] == "b"
+    number = int(parts[5]) if len(parts) > 5 and parts[5].isdigit() else 1
+    words = []
+    for i, san in enumerate(sans):
+        if not black:
+            words.append(f"{number}. {san}")
+        else:
+            words.append(f"{number}... {san}" if i == 0 else san)
+            number += 1
+        black = not black
+    words.append(result)
+    row = ""
+    for w in words:
+        if row and len(row) + 1 + len(w) > PGN_LINE_WIDTH:
+            lines.append(row)
+            row = w
+        else:
+            row = f"{row} {w}" if row else w
+    lines.append(row)
+    return "\n".join(lines) + "\n\n"
+
+def write_pgn_game(f, tags, sans, result=None):
+    """Ajoute une partie à un fichier PGN ouvert (écriture au fil de l’eau)."""
+    f.write(pgn_game_text(tags, sans, result))
+
+def chess_game_sans(fen, moves):
+    """Coups (entiers) joués depuis fen -> notation algébrique."""
+    pos = ChessPosition(fen)
+    sans = []
+    for m in moves:
+        sans.append(pos.san(m))
+        pos.make(m)
+    return sans
+
+# ---- Échecs : bibliothèque d’ouvertures (mmap) ----
+# Fichier : MAGIC, n (uint64), n clés de Zobrist triées (uint64), n poids
+# (uint32), n coups (uint16 : départ | arrivée << 6 | promotion << 12).
+# Une position a autant d’entrées consécutives que de coups connus.
+BOOK_MAGIC = b"FOSBOOK1"
+BOOK_PATH = FREEOS_HOME / "book.bin"
+BOOK_MAX_PLY = 24          # demi‑coups retenus par partie à la construction
+
+class OpeningBook:
+    """Lecture par mmap + recherche dichotomique : rien n’est chargé en objets Python."""
+    def __init__(self, path=BOOK_PATH):
+        import mmap
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:8] != BOOK_MAGIC:
+            self._mm.close()
+            raise ValueError(f"{self.path.name} : pas une bibliothèque FreeOS")
+        n = int.from_bytes(self._mm[8:16], "little")
+        view = memoryview(self._mm)
+        off = 16
+        self._keys = view[off: off + 8 * n].cast("Q"); off += 8 * n
+        self._weights = view[off: off + 4 * n].cast("I"); off += 4 * n
+        self._moves = view[off: off + 2 * n].cast("H")
+        self.count = n
+
+    def close(self):
+        for v in (self._keys, self._weights, self._moves):
+            v.release()
+        self._mm.close()
+
+    def entries(self, key):
+        """[(coup 16 bits, poids)] pour une clé de position."""
+        keys = self._keys
+        i = bisect_left(keys, key)
+        out = []
+        while i < self.count and keys[i] == key:
+            out.append((self._moves[i], self._weights[i]))
+            i += 1
+        return out
+
+    def moves(self, pos):
+        """[(coup légal, poids)] connus pour la position, du plus joué au moins joué."""
+        legal = {m & 0xFFFF: m for m in pos.legal_moves()}
+        found = [(legal[m], w) for m, w in self.entries(pos.key) if m in legal]
+        return sorted(found, key=lambda e: -e[1])
+
+    def choose(self, pos, rng=_random):
+        """Coup tiré au hasard selon les poids, ou None hors bibliothèque."""
+        found = self.moves(pos)
+        if not found:
+            return None
+        return rng.choices([m for m, _w in found], weights=[w for _m, w in found])[0]
+
+    @staticmethod
+    def build(games, out_path, max_ply=BOOK_MAX_PLY, check=None):
+        """
+        Construit la bibliothèque depuis un flux de parties (iter_pgn_games) ;
+        poids = nombre de parties (x2 pour le camp gagnant). Rend (parties, entrées).
+        """
+        counts = {}
+        n_games = 0
+        for tags, sans, result in games:
+            if check is not None and not n_games & 255:
+                check()
+            try:
+                pos = ChessPosition(tags.get("FEN", CHESS_START_FEN))
+            except ValueError:
+                continue
+            n_games += 1
+            for ply, san in enumerate(sans[:max_ply]):
+                try:
+                    m = pos.parse_san(san)
+                except ValueError:
+                    break
+                winner = (result == "1-0" and pos.side == WHITE) or (result == "0-1" and pos.side == BLACK)
+                k = (pos.key, m & 0xFFFF)
+                counts[k] = counts.get(k, 0) + (2 if winner else 1)
+                pos.make(m)
+        items = sorted(counts.items())
+        n = len(items)
+        keys = array("Q", (k for (k, _m), _w in items))
+        weights = array("I", (min(w, 0xFFFFFFFF) for _k, w in items))
+        moves = array("H", (m for (_k, m), _w in items))
+        out_path = Path(out_path)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out_path.with_suffix(out_path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(BOOK_MAGIC)
+            f.write(n.to_bytes(8, "little"))
+            keys.tofile(f); weights.tofile(f); moves.tofile(f)
+        os.replace(tmp, out_path)
+        return n_games, n
+
+_BOOKS = {}
+
+def opening_book(path=BOOK_PATH):
+    """Bibliothèque ouverte au 1er usage (None si absente) ; rouverte si le fichier change."""
+    path = Path(path)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    cached = _BOOKS.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    try:
+        book = OpeningBook(path)
+    except (OSError, ValueError):
+        return None
+    _BOOKS[path] = (mtime, book)
+    return book
+
+# ---- Échecs : recherche (IA) ----
+CHESS_AI_TIME_S = 2.0     # temps de réflexion par coup de l’ordinateur
+CHESS_TT_BITS = 18        # table de transposition : 2**18 entrées (taille fixe)
+CHESS_MATE = 100_000
+PIECE_VALUES = (100, 320, 330, 500, 900, 0)
+
+def _pst(rows):
+    """Table 8x8 écrite rangée 8 en haut -> liste indexée par case (blancs)."""
+    flat = [v for row in rows for v in row]
+    return [flat[(7 - (sq >> 3)) * 8 + (sq & 7)] for sq in range(64)]
+
+# bonus par case (point de vue des blancs), classiques « simplified evaluation »
+_PST = [
+    _pst([[0]*8, [50]*8, [10,10,20,30,30,20,10,10], [5,5,10,25,25,10,5,5],
+          [0,0,0,20,20,0,0,0], [5,-5,-10,0,0,-10,-5,5], [5,10,10,-20,-20,10,10,5], [0]*8]),
+    _pst([[-50,-40,-30,-30,-30,-30,-40,-50], [-40,-20,0,0,0,0,-20,-40], [-30,0,10,15,15,10,0,-30],
+          [-30,5,15,20,20,15,5,-30], [-30,0,15,20,20,15,0,-30], [-30,5,10,15,15,10,5,-30],
+          [-40,-20,0,5,5,0,-20,-40], [-50,-40,-30,-30,-30,-30,-40,-50]]),
+    _pst([[-20,-10,-10,-10,-10,-10,-10,-20], [-10,0,0,0,0,0,0,-10], [-10,0,5,10,10,5,0,-10],
+          [-10,5,5,10,10,5,5,-10], [-10,0,10,10,10,10,0,-10], [-10,10,10,10,10,10,10,-10],
+          [-10,5,0,0,0,0,5,-10], [-20,-10,-10,-10,-10,-10,-10,-20]]),
+    _pst([[0]*8, [5,10,10,10,10,10,10,5]] + [[-5,0,0,0,0,0,0,-5]]*5 + [[0,0,0,5,5,0,0,0]]),
+    _pst([[-20,-10,-10,-5,-5,-10,-10,-20], [-10,0,0,0,0,0,0,-10], [-10,0,5,5,5,5,0,-10],
+          [-5,0,5,5,5,5,0,-5], [0,0,5,5,5,5,0,-5], [-10,5,5,5,5,5,0,-10],
+          [-10,0,5,0,0,0,0,-10], [-20,-10,-10,-5,-5,-10,-10,-20]]),
+    _pst([[-30,-40,-40,-50,-50,-40,-40,-30]]*4 + [[-20,-30,-30,-40,-40,-30,-30,-20],
+          [-10,-20,-20,-20,-20,-20,-20,-10], [20,20,0,0,0,0,20,20], [20,30,10,0,0,10,30,20]]),
+]
+# valeur + bonus de case pour chaque pièce (0..11) ; noirs : case miroir
+_PSQ = [[PIECE_VALUES[p % 6] + _PST[p % 6][sq if p < 6 else sq ^ 56] for sq in range(64)] for p in range(12)]
+
+def chess_evaluate(pos):
+    """Évaluation statique en centipions, du point de vue du camp au trait."""
+    score = 0
+    for sq, p in enumerate(pos.board):
+        if p >= 0:
+            score += _PSQ[p][sq] if p < 6 else -_PSQ[p][sq]
+    return score if pos.side == WHITE else -score
+
+def chess_score_text(score):
+    """'+0.35' (centipions) ou 'mat en 3' / '-mat en 2' (pour le camp au trait)."""
+    if abs(score) >= CHESS_MATE - 200:
+        n = (CHESS_MATE - abs(score) + 1) // 2
+        return f"{'' if score > 0 else '-'}mat en {n}"
+    return f"{score / 100:+.2f}"
+
+def _tt_score_store(score, ply):
+    """Mat compté depuis la racine -> depuis ce nœud (valable à toute profondeur après transposition)."""
+    if score >= CHESS_MATE - 200:
+        return score + ply
+    if score <= 200 - CHESS_MATE:
+        return score - ply
+    return score
+
+def _tt_score_probe(score, ply):
+    """Inverse de _tt_score_store : mat relu de la table, recompté depuis la racine."""
+    if score >= CHESS_MATE - 200:
+        return score - ply
+    if score <= 200 - CHESS_MATE:
+        return score + ply
+    return score
+
+class SearchTimeout(Exception):
+    """Temps écoulé (ou arrêt demandé) : la recherche remonte sans résultat."""
+
+class ChessSearch:
+    """
+    Alpha‑bêta à approfondissement itératif : table de transposition de taille
+    fixe (indexée par la clé de Zobrist), ordre des coups TT > prises (MVV‑LVA)
+    > coups « killer », recherche de calme sur les prises.
+    """
+    def __init__(self, tt_bits=CHESS_TT_BITS, tt=None):
+        # tt : table fournie (SharedTT entre processus), sinon une liste locale
+        self.tt = [None] * (1 << tt_bits) if tt is None else tt   # (clé, profondeur, score, borne, coup)
+        self.tt_mask = len(self.tt) - 1
+        self.nodes = 0
+
+    def search(self, pos, time_limit=CHESS_AI_TIME_S, max_depth=64, on_info=None, stop=None):
+        """
+        Meilleur coup pour pos (copie conseillée : la position est parcourue).
+        on_info(profondeur, score, nœuds, nps, pv) après chaque itération ;
+        stop : threading.Event pour abandonner. Rend (coup, score, profondeur).
+        """
+        self.nodes = 0
+        self.killers = [[0, 0] for _ in range(128)]
+        self.stop = stop
+        t0 = time.perf_counter()
+        self.deadline = t0 + time_limit
+        moves = pos.legal_moves()
+        if not moves:
+            return None, 0, 0
+        m = tablebase_best_move(pos)
+        if m is not None:  # finale couverte : le coup parfait, sans chercher
+            score = tablebase_score(pos)
+            if on_info is not None:
+                on_info(1, score, 0, 0.0, [m])
+            return m, score, 1
+        best, best_score, done = moves[0], 0, 0
+        for depth in range(1, max_depth + 1):
+            try:
+                score = self._negamax(pos, depth, -CHESS_MATE - 1, CHESS_MATE + 1, 0)
+            except SearchTimeout:
+                while len(pos._undo) > self._root_undo:
+                    pos.unmake()
+                break
+            entry = self.tt[pos.key & self.tt_mask]
+            if entry is not None and entry[0] == pos.key and entry[4]:
+                best = entry[4]
+            best_score, done = score, depth
+            if on_info is not None:
+                dt = time.perf_counter() - t0
+                on_info(depth, score, self.nodes, self.nodes / dt if dt > 0 else 0.0, self.principal_variation(pos, depth))
+            if abs(score) >= CHESS_MATE - 200 or len(moves) == 1:
+                break
+            # une nouvelle itération coûte ~ plusieurs fois la précédente
+            if time.perf_counter() - t0 > time_limit * 0.5:
+                break
+        return best, best_score, done
+
+    def principal_variation(self, pos, depth):
+        pv = []
+        seen = 0
+        for _ in range(depth):
+            entry = self.tt[pos.key & self.tt_mask]
+            if entry is None or entry[0] != pos.key or not entry[4] or entry[4] not in pos.legal_moves():
+                break
+            pv.append(entry[4])
+            pos.make(entry[4])
+            seen += 1
+        for _ in range(seen):
+            pos.unmake()
+        return pv
+
+    def search_fixed(self, pos, depth, time_limit=None, alpha=-CHESS_MATE - 1, beta=CHESS_MATE + 1):
+        """
+        Score (camp au trait) et ligne principale à profondeur fixe ; hors de
+        ]alpha, beta[ le score n’est qu’une borne (fail‑soft).
+        """
+        self.killers = [[0, 0] for _ in range(128)]
+        self.stop = None
+        self.deadline = float("inf") if time_limit is None else time.perf_counter() + time_limit
+        try:
+            score = self._negamax(pos, depth, alpha, beta, 0)
+        except SearchTimeout:
+            while len(pos._undo) > self._root_undo:
+                pos.unmake()
+            raise
+        return score, self.principal_variation(pos, depth)
+
+    def _check_time(self):
+        if time.perf_counter() > self.deadline or (self.stop is not None and self.stop.is_set()):
+            raise SearchTimeout()
+
+    def _order(self, pos, moves, tt_move, ply):
+        board = pos.board
+        killers = self.killers[ply] if ply < len(self.killers) else (0, 0)
+        def key(m):
+            if m == tt_move:
+                return -1_000_000
+            victim = board[(m >> 6) & 63]
+            if victim >= 0 or m >> 16 == MOVE_EP:
+                return -100_000 - 10 * PIECE_VALUES[victim % 6 if victim >= 0 else 0] + PIECE_VALUES[board[m & 63] % 6] // 100
+            if (m >> 12) & 7:
+                return -50_000
+            if m in killers:
+                return -10_000
+            return 0
+        moves.sort(key=key)
+        return moves
+
+    def _negamax(self, pos, depth, alpha, beta, ply):
+        if ply == 0:
+            self._root_undo = len(pos._undo)
+        self.nodes += 1
+        if not self.nodes & 1023:
+            self._check_time()
+        if ply and self._is_draw(pos):
+            return 0
+        occ = pos.occ[0] | pos.occ[1]
+        occ &= occ - 1
+        occ &= occ - 1
+        if ply and not occ & (occ - 1):  # trois pièces ou moins : tables de finales
+            score = tablebase_score(pos, ply)
+            if score is not None:
+                return score
+        alpha0 = alpha
+        entry = self.tt[pos.key & self.tt_mask]
+        tt_move = 0
+        if entry is not None and entry[0] == pos.key:
+            tt_move = entry[4]
+            if ply and entry[1] >= depth:
+                score, bound = _tt_score_probe(entry[2], ply), entry[3]
+                if bound == 0 or (bound < 0 and score <= alpha) or (bound > 0 and score >= beta):
+                    return score
+        moves = pos.legal_moves()
+        if not moves:
+            return -CHESS_MATE + ply if pos.in_check() else 0
+        if depth <= 0:
+            return self._quiesce(pos, alpha, beta, ply)
+        best, best_move = -CHESS_MATE - 1, 0
+        make, unmake = pos.make, pos.unmake
+        for m in self._order(pos, moves, tt_move, ply):
+            make(m)
+            score = -self._negamax(pos, depth - 1, -beta, -alpha, ply + 1)
+            unmake()
+            if score > best:
+                best, best_move = score, m
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if pos.board[(m >> 6) & 63] < 0 and ply < len(self.killers):
+                            k = self.killers[ply]
+                            if k[0] != m:
+                                k[1], k[0] = k[0], m
+                        break
+        bound = 1 if best >= beta else (-1 if best <= alpha0 else 0)
+        self.tt[pos.key & self.tt_mask] = (pos.key, depth, _tt_score_store(best, ply), bound, best_move)
+        return best
+
+    def _quiesce(self, pos, alpha, beta, ply):
+        self.nodes += 1
+        if not self.nodes & 1023:
+            self._check_time()
+        stand = chess_evaluate(pos)
+        if stand >= beta:
+            return stand
+        if stand > alpha:
+            alpha = stand
+        board = pos.board
+        caps = [m for m in pos.legal_moves() if board[(m >> 6) & 63] >= 0 or (m >> 12) & 7]
+        for m in self._order(pos, caps, 0, 127):
+            pos.make(m)
+            score = -self._quiesce(pos, -beta, -alpha, ply + 1)
+            pos.unmake()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    @staticmethod
+    def _is_draw(pos):
+        if pos.halfmove >= 100:
+            return True
+        # répétition : même clé depuis le dernier coup irréversible
+        undo = pos._undo
+        key = pos.key
+        for i in range(len(undo) - 2, max(-1, len(undo) - 1 - pos.halfmove), -2):
+            if undo[i][5] == key:
+                return True
+        return False
+
+# ---- Échecs : analyse multi‑cœurs ----
+CHESS_ANALYSE_TIME_S = 10.0
+CHESS_SHARED_TT_BITS = 20   # table commune aux processus d’analyse : 2**20 entrées (16 Mio)
+
+class SharedTT:
+    """
+    Table de transposition en mémoire partagée (RawArray) : deux mots de
+    64 bits par entrée, (clé xor données, données). Sans verrou : une entrée
+    écrite à moitié par un autre processus ne redonne pas la clé, elle est
+    simplement ignorée. S’utilise comme la liste de ChessSearch.tt.
+    """
+    def __init__(self, raw):
+        self.raw = raw
+        self._words = memoryview(raw).cast("B").cast("Q")
+
+    @classmethod
+    def create(cls, bits=CHESS_SHARED_TT_BITS):
+        import multiprocessing
+        return cls(multiprocessing.get_context("spawn").RawArray("Q", 2 << bits))
+
+    def __len__(self):
+        return len(self._words) >> 1
+
+    def __getitem__(self, i):
+        w = self._words
+        data = w[2 * i + 1]
+        if not data:
+            return None
+        # coup (18 bits) | score + 2**19 (20 bits) | borne + 1 (2 bits) | profondeur
+        return (w[2 * i] ^ data, data >> 40, ((data >> 18) & 0xFFFFF) - (1 << 19),
+                ((data >> 38) & 3) - 1, data & 0x3FFFF)
+
+    def __setitem__(self, i, entry):
+        key, depth, score, bound, move = entry
+        data = move | (score + (1 << 19)) << 18 | (bound + 1) << 38 | max(depth, 0) << 40
+        w = self._words
+        w[2 * i] = key ^ data
+        w[2 * i + 1] = data
+
+def chess_workers():
+    return max(1, os.cpu_count() or 1)
+
+def _chess_process_pool(workers, initializer=None, initargs=()):
+    # 'spawn' : pas de fork d’un processus qui a Tk et des threads
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=initializer, initargs=initargs)
+
+def _perft_root_move(fen, move, depth):
+    pos = ChessPosition(fen)
+    pos.make(move)
+    return move, pos.perft(depth - 1)
+
+_ANALYSE_SEARCH = None  # ChessSearch du processus, branchée sur la table partagée
+
+def _analyse_init(raw):
+    global _ANALYSE_SEARCH
+    _ANALYSE_SEARCH = ChessSearch(tt=SharedTT(raw))
+
+def _analyse_root_move(fen, move, depth, time_left, alpha=-CHESS_MATE - 1):
+    search = _ANALYSE_SEARCH
+    search.nodes = 0
+    pos = ChessPosition(fen)
+    pos.make(move)
+    try:
+        score, pv = search.search_fixed(pos, depth - 1, time_left, -CHESS_MATE - 1, -alpha)
+    except SearchTimeout:
+        return move, None, [], search.nodes
+    # le fils compte ses mats depuis sa propre racine : un demi‑coup de plus vu d’ici
+    score = -score
+    if abs(score) >= CHESS_MATE - 200:
+        score -= 1 if score > 0 else -1
+    return move, score, [move] + pv, search.nodes
+
+def chess_perft_parallel(fen, depth, workers=None):
+    """perft réparti par coup racine sur un pool de processus -> (total, {coup: nœuds})."""
+    pos = ChessPosition(fen)
+    moves = pos.legal_moves()
+    if depth <= 1 or not moves:
+        return pos.perft(depth), {}
+    with _chess_process_pool(min(workers or chess_workers(), len(moves))) as pool:
+        per_move = dict(pool.map(_perft_root_move, [fen] * len(moves), moves, [depth] * len(moves)))
+    return sum(per_move.values()), per_move
+
+def chess_analyse(fen, time_limit=CHESS_ANALYSE_TIME_S, max_depth=64, workers=None, stop=None):
+    """
+    Analyse en parallèle : à chaque profondeur, le meilleur coup de
+    l’itération précédente est cherché d’abord, puis les autres coups racine
+    sont répartis sur un pool de processus avec son score comme alpha (un
+    coup qui ne fait pas mieux n’a qu’une borne). Les processus partagent
+    une même table de transposition (SharedTT). Rend (profondeur, score,
+    ligne, nœuds, n/s) dès qu’une profondeur est terminée ; s’arrête au
+    temps imparti ou sur stop.
+    """
+    from concurrent.futures import wait, FIRST_COMPLETED
+    pos = ChessPosition(fen)
+    moves = pos.legal_moves()
+    if not moves:
+        return
+    t0 = time.perf_counter()
+    total_nodes = 0
+    tt = SharedTT.create()
+    pool = _chess_process_pool(min(workers or chess_workers(), len(moves)), _analyse_init, (tt.raw,))
+    try:
+        order = moves
+        for depth in range(1, max_depth + 1):
+            results = {}
+
+            def run(batch, alpha):
+                # False si le temps est écoulé (ou stop) avant la fin du lot
+                nonlocal total_nodes
+                left = time_limit - (time.perf_counter() - t0)
+                if left <= 0 or (stop is not None and stop.is_set()):
+                    return False
+                pending = {pool.submit(_analyse_root_move, fen, m, depth, left, alpha) for m in batch}
+                complete = True
+                while pending:
+                    done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        move, score, pv, nodes = fut.result()
+                        total_nodes += nodes
+                        if score is None:
+                            complete = False
+                        else:
+                            results[move] = (score, pv)
+                    if stop is not None and stop.is_set():
+                        return False
+                return complete
+
+            if not run(order[:1], -CHESS_MATE - 1) or not run(order[1:], results[order[0]][0]):
+                return  # temps écoulé pendant cette profondeur
+            order = sorted(results, key=lambda m: -results[m][0])
+            score, pv = results[order[0]]
+            dt = time.perf_counter() - t0
+            yield depth, score, pv, total_nodes, total_nodes / dt if dt > 0 else 0.0
+            if abs(score) >= CHESS_MATE - 200 or len(moves) == 1:
+                return
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# ---- Échecs : vérification de bases PGN (multi‑cœurs) ----
+PGN_CHUNK_GAMES = 200     # parties par lot envoyé à un processus
+PGNCHECK_MAX_ERRORS = 100 # erreurs détaillées, les suivantes sont seulement comptées
+PGNCHECK_PROGRESS_S = 5.0
+
+def iter_pgn_chunks(lines, games_per_chunk=PGN_CHUNK_GAMES):
+    """
+    Découpe un flux PGN en lots de parties (texte brut, sans les analyser) :
+    rend (numéro de la 1re partie, texte). Seul un lot est en mémoire.
+    """
+    buf, games, first = [], 0, 1
+    in_moves = False     # des coups ont été lus depuis le dernier tag
+    in_comment = False
+    for line in lines:
+        if not in_comment and line.startswith("[") and in_moves:
+            in_moves = False
+            games += 1
+            if games == games_per_chunk:
+                yield first, "".join(buf)
+                buf, first, games = [], first + games, 0
+        buf.append(line)
+        if in_comment or "{" in line:
+            # commentaire sur plusieurs lignes : un '[' en début de ligne n’y compte pas
+            in_comment = line.rfind("{") > line.rfind("}") or (in_comment and "}" not in line)
+        if not in_comment and line.strip() and not line.startswith("["):
+            in_moves = True
+    if buf:
+        yield first, "".join(buf)
+
+def pgn_check_chunk(first, text, export=False):
+    """
+    Rejoue chaque partie d’un lot avec le générateur de coups légaux.
+    Rend (parties, demi‑coups, [(n° de partie, message)], PGN normalisé des
+    parties valides si export).
+    """
+    n_games = n_plies = 0
+    errors, out = [], []
+    for tags, sans, result in iter_pgn_games(text.splitlines()):
+        number = first + n_games
+        n_games += 1
+        try:
+            pos = ChessPosition(tags.get("FEN", CHESS_START_FEN))
+        except ValueError as e:
+            errors.append((number, str(e)))
+            continue
+        error = None
+        played = []
+        for san in sans:
+            try:
+                m = pos.parse_san(san)
+            except ValueError as e:
+                error = f"{pos.fullmove}{'.' if pos.side == WHITE else '...'} {e}"
+                break
+            if export:
+                played.append(pos.san(m))
+            pos.make(m)
+        n_plies += len(pos._undo)
+        if error is None:
+            if result is None:
+                error = "résultat absent (partie tronquée ?)"
+            elif pos.status() == "mat" and result != ("0-1" if pos.side == WHITE else "1-0"):
+                error = f"résultat {result} alors que les {'blancs' if pos.side == WHITE else 'noirs'} sont mat"
+        if error is not None:
+            errors.append((number, error))
+        elif export:
+            out.append(pgn_game_text(tags, played, result))
+    return n_games, n_plies, errors, "".join(out)
+
+def pgn_check(lines, workers=None, export=False, check=None):
+    """
+    Vérifie un flux PGN sur un pool de processus ; rend, dans l’ordre des
+    lots, les résultats de pgn_check_chunk. Le nombre de lots en vol est
+    borné : la mémoire ne dépend pas de la taille du fichier.
+    """
+    chunks = iter_pgn_chunks(lines)
+    workers = workers or chess_workers()
+    if workers <= 1:
+        for first, text in chunks:
+            if check is not None:
+                check()
+            yield pgn_check_chunk(first, text, export)
+        return
+    pool = _chess_process_pool(workers)
+    pending = deque()
+    try:
+        for first, text in chunks:
+            if check is not None:
+                check()
+            pending.append(pool.submit(pgn_check_chunk, first, text, export))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            if check is not None:
+                check()
+            yield pending.popleft().result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# ---- Échecs : tables de finales (KQK, KRK, KPK) ----
+# Le camp fort est ramené aux blancs ; un octet par position (index tb_index) :
+# 0 = nulle, 255 = position impossible, sinon demi‑coups avant le mat + 1
+# (valeur paire : le camp au trait gagne ; impaire : il perd, 1 = il est mat).
+TB_DIR = FREEOS_HOME / "tb"
+TB_MAGIC = b"FOSTB001"
+TB_NAMES = ("KQK", "KRK", "KPK")   # KPK lit KQK et KRK (promotions)
+TB_DRAW, TB_ILLEGAL = 0, 255
+TB_PIECES = {"KQK": QUEEN, "KRK": ROOK, "KPK": PAWN}
+# sans pion : roi fort ramené au triangle a1‑d1‑d4 (8 symétries) ;
+# avec pion : seule la symétrie gauche/droite, pion sur les colonnes a‑d
+_TB_TRIANGLE = [sq for sq in range(64) if (sq & 7) < 4 and (sq >> 3) <= (sq & 7)]
+_TB_TRI_INDEX = {sq: i for i, sq in enumerate(_TB_TRIANGLE)}
+
+def _tb_transpose(sq):
+    return (sq >> 3) | (sq & 7) << 3
+
+def tb_index(name, wk, bk, p, stm):
+    """Index d’une position roi blanc wk + pièce p contre roi noir bk, trait stm."""
+    if name == "KPK":
+        if p & 7 > 3:
+            wk, bk, p = wk ^ 7, bk ^ 7, p ^ 7
+        return ((stm * 24 + ((p >> 3) - 1) * 4 + (p & 7)) * 64 + wk) * 64 + bk
+    if wk & 7 > 3:
+        wk, bk, p = wk ^ 7, bk ^ 7, p ^ 7
+    if wk >> 3 > 3:
+        wk, bk, p = wk ^ 56, bk ^ 56, p ^ 56
+    if wk >> 3 > wk & 7:
+        wk, bk, p = _tb_transpose(wk), _tb_transpose(bk), _tb_transpose(p)
+    return ((stm * 10 + _TB_TRI_INDEX[wk]) * 64 + bk) * 64 + p
+
+def _tb_groups(name):
+    return 24 if name == "KPK" else 10
+
+def tb_size(name):
+    return 2 * _tb_groups(name) * 64 * 64
+
+def _tb_group_squares(name, group):
+    """(wk, bk, p) de toutes les positions canoniques d’un groupe."""
+    if name == "KPK":
+        p = 8 * (group // 4 + 1) + group % 4
+        return ((wk, bk, p) for wk in range(64) for bk in range(64))
+    wk = _TB_TRIANGLE[group]
+    return ((wk, bk, p) for bk in range(64) for p in range(64))
+
+def _tb_attacks(t, piece, p, occ):
+    if piece == QUEEN:
+        return t.slide(t.rook_rays, p, occ) | t.slide(t.bishop_rays, p, occ)
+    if piece == ROOK:
+        return t.slide(t.rook_rays, p, occ)
+    return t.pawn[WHITE][p]
+
+def _tb_moves(name, stm, group, tb_dir):
+    """
+    Coups de toutes les positions légales d’un groupe (processus de travail).
+    Rend (index, nb de coups, décalages, successeurs à plat, résolus) ;
+    résolus = [(index, demi‑coups, gagné)] : mats et promotions gagnantes.
+    """
+    t = chess_tables()
+    king = t.king
+    piece = TB_PIECES[name]
+    promos = [(n, Tablebase(Path(tb_dir) / f"{n}.tb")) for n in ("KQK", "KRK")] if piece == PAWN else []
+    idxs, counts, offs, flat, solved = array("I"), array("B"), array("I", [0]), array("I"), []
+    for wk, bk, p in _tb_group_squares(name, group):
+        if wk == bk or wk == p or bk == p or king[wk] >> bk & 1:
+            continue
+        occ = (1 << wk) | (1 << bk) | (1 << p)
+        i = tb_index(name, wk, bk, p, stm)
+        n = 0
+        if stm == WHITE:
+            if _tb_attacks(t, piece, p, occ) >> bk & 1:
+                continue  # noirs en échec, blancs au trait : impossible
+            targets = king[wk] & ~king[bk] & ~(1 << p)
+            while targets:
+                to = (targets & -targets).bit_length() - 1
+                targets &= targets - 1
+                flat.append(tb_index(name, to, bk, p, BLACK))
+                n += 1
+            if piece != PAWN:
+                targets = _tb_attacks(t, piece, p, occ) & ~occ
+                while targets:
+                    to = (targets & -targets).bit_length() - 1
+                    targets &= targets - 1
+                    flat.append(tb_index(name, wk, bk, to, BLACK))
+                    n += 1
+            elif not occ >> (p + 8) & 1:
+                to = p + 8
+                if to >= 56:
+                    # dame / tour : valeur lue dans KQK / KRK ; fou, cavalier : nulle
+                    n += 4
+                    for promo, tb in promos:
+                        v = tb.value(tb_index(promo, wk, bk, to, BLACK))
+                        if v not in (TB_DRAW, TB_ILLEGAL):
+                            solved.append((i, v, True))
+                else:
+                    flat.append(tb_index(name, wk, bk, to, BLACK))
+                    n += 1
+                    if p < 16 and not occ >> (to + 8) & 1:
+                        flat.append(tb_index(name, wk, bk, to + 8, BLACK))
+                        n += 1
+        else:
+            # rayons calculés sans le roi noir : il ne peut pas reculer sur la ligne
+            attacked = king[wk] | _tb_attacks(t, piece, p, occ & ~(1 << bk))
+            targets = king[bk] & ~attacked
+            while targets:
+                to = (targets & -targets).bit_length() - 1
+                targets &= targets - 1
+                n += 1
+                if to != p:  # prise de la pièce : roi contre roi, nulle
+                    flat.append(tb_index(name, wk, to, p, WHITE))
+            if not n and attacked >> bk & 1:
+                solved.append((i, 0, False))
+        idxs.append(i)
+        counts.append(n)
+        offs.append(len(flat))
+    return idxs, counts, offs, flat, solved
+
+def tb_generate(name, tb_dir=TB_DIR, workers=None, check=None):
+    """
+    Génère une table par analyse rétrograde : les coups de chaque groupe
+    (trait x case du roi fort ou du pion) sont calculés sur un pool de
+    processus, puis les résultats remontent des mats vers les positions
+    qui y mènent, par nombre de demi‑coups croissant.
+    Rend (positions légales blancs au trait, dont gagnantes).
+    """
+    tb_dir = Path(tb_dir)
+    tb_dir.mkdir(parents=True, exist_ok=True)
+    if TB_PIECES[name] == PAWN:
+        for dep in ("KQK", "KRK"):
+            if not (tb_dir / f"{dep}.tb").exists():
+                tb_generate(dep, tb_dir, workers, check)
+    size = tb_size(name)
+    groups = [(stm, g) for stm in (WHITE, BLACK) for g in range(_tb_groups(name))]
+    count = bytearray(size)            # coups pas encore réfutés
+    values = bytearray([TB_ILLEGAL]) * size
+    parts = []
+    queue = [[]]                       # queue[d] : (index, gagné) résolus en d demi‑coups
+    with _chess_process_pool(workers or chess_workers()) as pool:
+        for idxs, counts, offs, flat, solved in pool.map(
+                _tb_moves, [name] * len(groups), *zip(*groups), [str(tb_dir)] * len(groups)):
+            if check is not None:
+                check()
+            for k, i in enumerate(idxs):
+                values[i] = TB_DRAW
+                count[i] = counts[k]
+            parts.append((idxs, offs, flat))
+            for i, d, won in solved:
+                while len(queue) <= d:
+                    queue.append([])
+                queue[d].append((i, won))
+    # graphe inverse (prédécesseurs) en tableaux compacts
+    start = array("I", bytes(4 * (size + 1)))
+    for _idxs, _offs, flat in parts:
+        for s in flat:
+            start[s + 1] += 1
+    for i in range(size):
+        start[i + 1] += start[i]
+    pred = array("I", bytes(4 * start[size]))
+    fill = array("I", start)
+    for idxs, offs, flat in parts:
+        for k, i in enumerate(idxs):
+            for s in flat[offs[k]:offs[k + 1]]:
+                pred[fill[s]] = i
+                fill[s] += 1
+    del parts, fill
+    d = 0
+    while d < len(queue):
+        if check is not None:
+            check()
+        nxt = []
+        for i, won in queue[d]:
+            if values[i] != TB_DRAW:
+                continue
+            values[i] = min(d + 1, 254)
+            for k in range(start[i], start[i + 1]):
+                q = pred[k]
+                if values[q] != TB_DRAW:
+                    continue
+                if not won:
+                    nxt.append((q, True))      # un coup mène au mat de l’adversaire
+                else:
+                    count[q] -= 1
+                    if not count[q]:
+                        nxt.append((q, False))  # tous les coups perdent
+        queue[d] = None
+        if nxt:
+            if len(queue) <= d + 1:
+                queue.append([])
+            queue[d + 1].extend(nxt)
+        d += 1
+    path = tb_dir / f"{name}.tb"
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(TB_MAGIC)
+        f.write(size.to_bytes(8, "little"))
+        f.write(values)
+    os.replace(tmp, path)
+    _TABLEBASES.pop(path, None)
+    white = values[:size // 2]
+    legal = len(white) - white.count(TB_ILLEGAL)
+    return legal, legal - white.count(TB_DRAW)
+
+class Tablebase:
+    """Une table de finale : le fichier est projeté (mmap) au premier accès."""
+    def __init__(self, path):
+        self.path = Path(path)
+        self._mm = None
+        self._values = None
+
+    def _open(self):
+        import mmap
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mm[:8] != TB_MAGIC or int.from_bytes(mm[8:16], "little") != len(mm) - 16:
+            mm.close()
+            raise ValueError(f"{self.path.name} : pas une table FreeOS")
+        self._mm = mm
+        self._values = memoryview(mm)[16:]
+
+    def value(self, index):
+        if self._values is None:
+            self._open()
+        return self._values[index]
+
+    def close(self):
+        if self._values is not None:
+            self._values.release()
+            self._mm.close()
+            self._values = self._mm = None
+
+_TABLEBASES = {}
+
+def tablebase(name, tb_dir=TB_DIR):
+    """Table name (None si le fichier manque) ; l’absence est aussi retenue."""
+    path = Path(tb_dir) / f"{name}.tb"
+    if path not in _TABLEBASES:
+        _TABLEBASES[path] = Tablebase(path) if path.exists() else None
+    return _TABLEBASES[path]
+
+def tablebase_probe(pos):
+    """
+    Résultat exact d’une finale couverte, pour le camp au trait :
+    (1 gagne / 0 nulle / -1 perd, demi‑coups avant le mat), ou None si la
+    position n’est pas dans les tables.
+    """
+    occ = pos.occ[WHITE] | pos.occ[BLACK]
+    if bin(occ).count("1") != 3:
+        return None
+    for name, piece in TB_PIECES.items():
+        for strong in (WHITE, BLACK):
+            if pos.bb[piece + 6 * strong]:
+                break
+        else:
+            continue
+        break
+    else:
+        return None
+    tb = tablebase(name)
+    if tb is None:
+        return None
+    wk, bk = pos.king_square(strong), pos.king_square(strong ^ 1)
+    p = pos.bb[piece + 6 * strong].bit_length() - 1
+    if strong == BLACK:  # miroir haut/bas : le camp fort devient les blancs
+        wk, bk, p = wk ^ 56, bk ^ 56, p ^ 56
+    try:
+        v = tb.value(tb_index(name, wk, bk, p, pos.side ^ strong))
+    except (OSError, ValueError):
+        return None
+    if v == TB_ILLEGAL:
+        return None
+    if v == TB_DRAW:
+        return 0, 0
+    return (1 if v % 2 == 0 else -1), v - 1
+
+def tablebase_score(pos, ply=0):
+    """Score de recherche (échelle CHESS_MATE) d’une finale couverte, ou None."""
+    r = tablebase_probe(pos)
+    if r is None:
+        return None
+    result, plies = r
+    return result * (CHESS_MATE - ply - plies) if result else 0
+
+def tablebase_best_move(pos):
+    """Coup parfait d’après les tables (mat le plus court, défense la plus longue), ou None."""
+    if tablebase_probe(pos) is None:
+        return None
+    best, best_key = None, None
+    for m in pos.legal_moves():
+        pos.make(m)
+        r = tablebase_probe(pos)
+        pos.unmake()
+        # sortie des tables : prise (roi contre roi) ou sous‑promotion, nulle
+        result, plies = r if r is not None else (0, 0)
+        # résultat de l’adversaire : son mat au plus vite, le nôtre au plus tard
+        key = (-result, -plies if result < 0 else plies)
+        if best_key is None or key > best_key:
+            best, best_key = m, key
+    return best
 
 # ---- Fenêtres utilitaires ----
+class ThemeRegistry:
+    """
+    Widgets thémés, rangés par fenêtre avec leur rôle (options à recolorer).
+    Un changement de couleurs est une seule passe sur ces widgets, sans
+    parcours de l’arbre ; une fenêtre fermée est oubliée en bloc (forget).
+    """
+    ROLES = {
+        "bg": lambda fg, bg: {"bg": bg},
+        "fg": lambda fg, bg: {"bg": bg, "fg": fg},
+        "entry": lambda fg, bg: {"bg": bg, "fg": fg, "insertbackground": fg},
+        "check": lambda fg, bg: {"bg": bg, "fg": fg, "selectcolor": bg, "activebackground": bg},
+    }
+
+    def __init__(self, fg, bg):
+        self.fg, self.bg = fg, bg
+        self._windows = {}      # fenêtre -> {widget: rôle}
+        self._callbacks = {}    # fenêtre -> [callback(fg, bg)]
+        self._class_roles = {}  # classe Tk -> rôle, déduit une fois des options
+
+    def role_of(self, widget):
+        cls = widget.winfo_class()
+        role = self._class_roles.get(cls, "")
+        if role == "":
+            keys = set(widget.keys())
+            if cls in ("Checkbutton", "Radiobutton"):
+                role = "check"
+            elif "foreground" in keys:
+                role = "entry" if "insertbackground" in keys else "fg"
+            else:
+                role = "bg" if "background" in keys else None
+            self._class_roles[cls] = role
+        return role
+
+    def register(self, widget, role=None):
+        """Applique les couleurs courantes à widget et le garde pour les suivantes."""
+        role = role or self.role_of(widget)
+        if role is None:
+            return
+        widget.configure(**self.ROLES[role](self.fg, self.bg))
+        self._windows.setdefault(widget.winfo_toplevel(), {})[widget] = role
+
+    def register_tree(self, widget):
+        """Enregistre widget et tous ses descendants (une fois, à la création)."""
+        stack = [widget]
+        while stack:
+            w = stack.pop()
+            self.register(w)
+            stack.extend(w.winfo_children())
+
+    def on_change(self, window, callback):
+        """callback(fg, bg) à chaque changement (éléments de Canvas, etc.)."""
+        self._callbacks.setdefault(window, []).append(callback)
+        callback(self.fg, self.bg)
+
+    def forget(self, window):
+        self._windows.pop(window, None)
+        self._callbacks.pop(window, None)
+
+    def apply(self, fg, bg):
+        """Nouvelles couleurs : une passe groupée sur les widgets enregistrés."""
+        self.fg, self.bg = fg, bg
+        options = {role: make(fg, bg) for role, make in self.ROLES.items()}
+        for widgets in self._windows.values():
+            dead = []
+            for w, role in widgets.items():
+                try:
+                    w.configure(**options[role])
+                except tk.TclError:
+                    dead.append(w)  # détruit sans que sa fenêtre le soit
+            for w in dead:
+                del widgets[w]
+        for callbacks in self._callbacks.values():
+            for cb in callbacks:
+                cb(fg, bg)
+
+    def count(self):
+        return sum(len(w) for w in self._windows.values())
+
 class ThemedToplevel(tk.Toplevel):
     def __init__(self, app, title="Fenêtre"):
         super().__init__(app.root)
@@ -202,289 +2579,1037 @@ class ThemedToplevel(tk.Toplevel):
         self.protocol("WM_DELETE_WINDOW", self.on_close)
         self.app.register_window(self)
         self.bind("<Escape>", lambda e: self.destroy())
+        # toute fermeture (croix, Échap, close_all_windows) rend les ressources
+        self.bind("<Destroy>", self._on_destroy, add="+")
     def on_close(self):
-        self.app.unregister_window(self)
         self.destroy()
-    def apply_theme(self):
-        self.configure(bg=self.app.bg)
-        for w in self.winfo_children():
-            self.app.themify(w)
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self.app.unregister_window(self)
+            self.app.resources.release(self)
+            self.app.theme.forget(self)
+    def font(self, size, weight="normal"):
+        """Police partagée (cache de l’application), rendue à la fermeture."""
+        return self.app.resources.font(self, size, weight)
+
+TICK_SLOT_S = 0.05         # résolution de la roue
+TICK_WHEEL_SLOTS = 64      # 64 cases de 50 ms : 3,2 s avant de faire un tour
+
+class _Tick:
+    __slots__ = ("deadline", "period", "callback", "widget", "slot", "cancelled", "paused")
+
+    def __init__(self, deadline, period, callback, widget):
+        self.deadline, self.period, self.callback, self.widget = deadline, period, callback, widget
+        self.slot, self.cancelled, self.paused = 0, False, False
+
+class TickScheduler:
+    """
+    Un seul after() pour tout ce qui bat à l’écran (horloges, chronomètres,
+    comptes à rebours). Chaque abonné a une échéance monotone ; la suivante
+    vaut la précédente + période (pas de dérive). Les échéances sont rangées
+    dans une roue de cases de TICK_SLOT_S et after() vise la prochaine case
+    occupée : rien d’abonné, rien d’armé. Un abonné dont la fenêtre est
+    cachée ou réduite est suspendu jusqu’à ce qu’elle réapparaisse (<Map>).
+    """
+    def __init__(self, root, clock=time.monotonic):
+        self.root = root
+        self.clock = clock
+        self._wheel = [[] for _ in range(TICK_WHEEL_SLOTS)]
+        self._count = 0          # abonnés dans la roue (annulés compris)
+        self._after = None
+        self._armed = None       # case visée par l’after() en cours
+        self._paused = {}        # fenêtre -> [_Tick]
+        self._bound = set()      # fenêtres dont <Map> est déjà lié (une seule fois)
+
+    def every(self, period, callback, widget=None, first=None, align=False):
+        """
+        callback(maintenant) toutes les period secondes (rendre False arrête).
+        widget : suspendu tant qu’il n’est pas visible, oublié s’il est détruit ;
+        first : 1re échéance (horloge monotone) ; align : sur les secondes de l’heure.
+        """
+        now = self.clock()
+        if first is None:
+            first = now + period - (time.time() % period if align else 0.0)
+        t = _Tick(first, period, callback, widget)
+        self._insert(t)
+        return t
+
+    def at(self, deadline, callback):
+        """callback(maintenant) une fois, à l’échéance monotone donnée."""
+        t = _Tick(deadline, None, callback, None)
+        self._insert(t)
+        return t
+
+    def cancel(self, t):
+        """O(1) : l’entrée est ignorée (et retirée) quand sa case passe."""
+        if t is not None:
+            t.cancelled = True
+
+    def _slot_of(self, deadline):
+        return int(-(-deadline // TICK_SLOT_S))  # arrondi supérieur : jamais en avance
+
+    def _insert(self, t):
+        t.slot = self._slot_of(t.deadline)
+        self._wheel[t.slot % TICK_WHEEL_SLOTS].append(t)
+        self._count += 1
+        if self._armed is None or t.slot < self._armed:
+            self._arm(t.slot)
+
+    def _arm(self, slot):
+        if self._after is not None:
+            self.root.after_cancel(self._after)
+        delay = max(0, int((slot * TICK_SLOT_S - self.clock()) * 1000) + 1)
+        self._armed = slot
+        self._after = self.root.after(delay, self._fire)
+
+    def _fire(self):
+        first, self._after, self._armed = self._armed, None, None
+        now = self.clock()
+        cur = int(now // TICK_SLOT_S)  # dernière case échue
+        n = TICK_WHEEL_SLOTS
+        due = []
+        # après un long retard, un seul tour de roue suffit à tout ramasser
+        for s in range(max(first, cur - n + 1), cur + 1):
+            bucket = self._wheel[s % n]
+            if not bucket:
+                continue
+            keep = [t for t in bucket if t.slot > cur and not t.cancelled]
+            due.extend(t for t in bucket if t.slot <= cur and not t.cancelled)
+            self._count -= len(bucket) - len(keep)
+            self._wheel[s % n] = keep
+        due.sort(key=lambda t: t.deadline)
+        for t in due:
+            self._run(t, now)
+        self._rearm(cur)
+
+    def _run(self, t, now):
+        w = t.widget
+        if w is not None:
+            try:
+                if not w.winfo_exists():
+                    return
+                if not w.winfo_viewable():
+                    self._pause(t)
+                    return
+            except tk.TclError:
+                return
+        if t.callback(now) is False or t.period is None or t.cancelled:
+            return
+        t.deadline += t.period
+        if t.deadline <= now:  # retard (machine chargée, fenêtre suspendue) : on saute
+            t.deadline += ((now - t.deadline) // t.period + 1) * t.period
+        self._insert(t)
 
-# ---- Application principale ----
-class TerminalApp:
-    def __init__(self):
-        self.root = tk.Tk()
-        self.root.title("FreeOS 2.0")
-        # Thème
-        self.bg = DEFAULT_BG
-        self.fg = DEFAULT_FG
-        self.font = get_mono_font(self.root)
+    def _rearm(self, cur):
+        if not self._count or self._armed is not None and self._armed <= cur + 1:
+            return
+        n = TICK_WHEEL_SLOTS
+        for s in range(cur + 1, cur + n + 1):
+            if any(t.slot == s and not t.cancelled for t in self._wheel[s % n]):
+                self._arm(s)
+                return
+        live = [t.slot for bucket in self._wheel for t in bucket if not t.cancelled]
+        if live:
+            self._arm(min(live))
+        else:
+            self._wheel = [[] for _ in range(n)]
+            self._count = 0
+            if self._after is not None:
+                self.root.after_cancel(self._after)
+                self._after = self._armed = None
+
+    def _pause(self, t):
+        top = t.widget.winfo_toplevel()
+        waiting = self._paused.get(top)
+        if waiting is None:
+            for old in [w for w in self._paused if not w.winfo_exists()]:
+                del self._paused[old]  # fenêtres fermées pendant qu’elles étaient réduites
+            self._bound = {w for w in self._bound if w.winfo_exists()}
+            waiting = self._paused[top] = []
+        if top not in self._bound:
+            # <Map> des widgets enfants remonte aussi jusqu’à la fenêtre : on les ignore
+            self._bound.add(top)
+            top.bind("<Map>", lambda e, top=top: self._resume(top) if e.widget is top else None, add="+")
+        t.paused = True
+        waiting.append(t)
+
+    def _resume(self, top):
+        now = self.clock()
+        for t in self._paused.pop(top, []):
+            t.paused = False
+            if not t.cancelled:
+                self._run(t, now)
+
+    def pending(self):
+        """Abonnés actifs (roue + suspendus)."""
+        live = sum(1 for bucket in self._wheel for t in bucket if not t.cancelled)
+        return live + sum(len(v) for v in self._paused.values())
+
+# Motif d’alarme : (action, durée avant le pas suivant) ; rejoué en boucle
+ALARM_PATTERN = (("beep", 0.12),) * 3 + (("flash", 0.15), ("normal", 0.15)) * 3 + ((None, 1.5),)
+ALARM_FLASH_FG = "#ffffff"
+ALARM_BELL_GAP_S = 0.05    # plusieurs alarmes au même instant : un seul bip
+
+@dataclass(eq=False)
+class Alarm:
+    label: object            # widget qui clignote
+    fg: object               # fg() -> couleur normale (thème courant)
+    index: int = 0
+    tick: object = None      # pas suivant, dans le TickScheduler
+    done: bool = False
+
+class AlarmEngine:
+    """
+    Alarmes jouées sur la boucle Tk, sans thread : chaque pas du motif (bip,
+    clignotement, pause) est une échéance du TickScheduler. stop() annule le
+    pas en attente ; stop_all() fait de même pour toutes les alarmes en
+    cours, qui se taisent immédiatement (aucun pas déjà programmé ne joue).
+    """
+    def __init__(self, ticks, bell, pattern=ALARM_PATTERN):
+        self.ticks, self.bell, self.pattern = ticks, bell, pattern
+        self._live = set()       # alarmes en cours
+        self._last_bell = float("-inf")
+
+    @property
+    def ringing(self):
+        return len(self._live)
+
+    def start(self, label, fg):
+        alarm = Alarm(label, fg)
+        self._live.add(alarm)
+        self._step(alarm, self.ticks.clock())
+        return alarm
+
+    def stop(self, alarm):
+        if alarm is None or alarm.done:
+            return
+        self.ticks.cancel(alarm.tick)
+        self._finish(alarm)
 
-        # UI principale
-        self._build_ui()
+    def stop_all(self):
+        for alarm in list(self._live):
+            self.stop(alarm)
+
+    def _finish(self, alarm):
+        alarm.done = True
+        self._live.discard(alarm)
+        try:
+            alarm.label.config(fg=alarm.fg())
+        except tk.TclError:
+            pass  # fenêtre déjà fermée
+
+    def _step(self, alarm, deadline):
+        if alarm.done:
+            return
+        if not alarm.label.winfo_exists():
+            self._finish(alarm)
+            return
+        action, pause = self.pattern[alarm.index]
+        if action == "beep":
+            if deadline - self._last_bell >= ALARM_BELL_GAP_S:
+                self._last_bell = deadline
+                self.bell()
+        elif action == "flash":
+            alarm.label.config(fg=ALARM_FLASH_FG)
+        elif action == "normal":
+            alarm.label.config(fg=alarm.fg())
+        alarm.index = (alarm.index + 1) % len(self.pattern)
+        nxt = deadline + pause
+        alarm.tick = self.ticks.at(nxt, lambda _now: self._step(alarm, nxt))
+
+@dataclass(eq=False)
+class Countdown:
+    """Un minuteur ouvert : sa fenêtre, ses abonnements au TickScheduler, son alarme."""
+    win: object
+    ticks: tuple = ()
+    alarm: object = None
+    stopped: bool = False
+
+class TkResourceCache:
+    """
+    Polices et images Tk partagées par les fenêtres outils, comptées par
+    référence : chaque fenêtre (owner) les demande, release(owner) rend tout
+    ce qu’elle détenait et l’objet Tk est supprimé avec sa dernière
+    référence. Les couleurs ne tiennent aucune ressource Tk : simple mémo.
+    """
+    def __init__(self, root, family):
+        self.root = root
+        self.family = family        # famille mono, lue une seule fois
+        self._items = {}            # clé -> [objet Tk, références]
+        self._owners = {}           # fenêtre -> [clés]
+        self._rgb = {}
+
+    def _acquire(self, owner, key, make):
+        entry = self._items.get(key)
+        if entry is None:
+            entry = self._items[key] = [make(), 0]
+        entry[1] += 1
+        self._owners.setdefault(owner, []).append(key)
+        return entry[0]
+
+    def font(self, owner, size, weight="normal"):
+        """Police mono de la taille voulue, partagée."""
+        return self._acquire(owner, ("font", size, weight),
+                             lambda: tkfont.Font(self.root, family=self.family, size=size, weight=weight))
+
+    def image(self, owner, path):
+        """PhotoImage d’un fichier (PNG/GIF), chargée une fois."""
+        path = str(Path(path).resolve())
+        return self._acquire(owner, ("image", path), lambda: tk.PhotoImage(master=self.root, file=path))
+
+    def rgb(self, color):
+        """Couleur Tk (nom ou #rgb) -> '#rrggbb'."""
+        value = self._rgb.get(color)
+        if value is None:
+            r, g, b = self.root.winfo_rgb(color)
+            value = self._rgb[color] = f"#{r >> 8:02x}{g >> 8:02x}{b >> 8:02x}"
+        return value
+
+    def release(self, owner):
+        """Rend toutes les ressources de owner (fenêtre fermée)."""
+        for key in self._owners.pop(owner, ()):
+            entry = self._items[key]
+            entry[1] -= 1
+            if entry[1]:
+                continue
+            del self._items[key]
+            try:
+                self.root.tk.call(key[0], "delete", entry[0].name)
+            except tk.TclError:
+                pass
+
+    def stats(self):
+        """(objets Tk vivants, fenêtres propriétaires)."""
+        return len(self._items), len(self._owners)
+
+CHESS_SQUARE_PX = 56
+CHESS_ANIM_FRAMES = 8      # images par coup animé
+CHESS_ANIM_MS = 15         # intervalle entre deux images
+
+class ChessBoardView:
+    """
+    Plateau d’échecs sur un Canvas : 64 cases, 64 pièces et 64 marques de
+    coups légaux créées une fois ; ensuite seules les cases qui changent sont
+    modifiées (itemconfig / coords), et une animation déplace un seul item.
+    """
+    LIGHT, DARK, LAST_LIGHT, LAST_DARK = "#111111", "#222222", "#263626", "#2f3f2f"
+    MARK = "#00aa00"
+
+    def __init__(self, canvas, font, fg, symbol, size=CHESS_SQUARE_PX):
+        self.canvas, self.size, self.symbol = canvas, size, symbol
+        self.squares, self.pieces, self.dots = [], [], []
+        for sq in range(64):
+            x0, y0 = (sq & 7) * size, (7 - (sq >> 3)) * size
+            self.squares.append(canvas.create_rectangle(x0, y0, x0 + size, y0 + size,
+                                                        fill=self._base(sq), outline="#333333"))
+            r = size // 8
+            self.dots.append(canvas.create_oval(x0 + size / 2 - r, y0 + size / 2 - r, x0 + size / 2 + r,
+                                                y0 + size / 2 + r, fill=self.MARK, outline="", state="hidden"))
+            self.pieces.append(canvas.create_text(x0 + size / 2, y0 + size / 2, text="", fill=fg, font=font))
+        self.selection = canvas.create_rectangle(0, 0, 0, 0, outline=self.MARK, width=2, state="hidden")
+        self.floater = canvas.create_text(0, 0, text="", fill=fg, font=font, state="hidden")
+        self._shown = [""] * 64     # symbole affiché sur chaque case
+        self._marked = []           # cases des marques visibles
+        self._last = ()             # cases du dernier coup (surlignées)
+        self._anim = None           # [after id, position, départ, arrivée, image]
+
+    def _base(self, sq, last=False):
+        light = ((sq >> 3) + (sq & 7)) % 2 == 1
+        if last:
+            return self.LAST_LIGHT if light else self.LAST_DARK
+        return self.LIGHT if light else self.DARK
+
+    def _center(self, sq):
+        return (sq & 7) * self.size + self.size / 2, (7 - (sq >> 3)) * self.size + self.size / 2
+
+    def set_fg(self, fg):
+        for item in self.pieces + [self.floater]:
+            self.canvas.itemconfigure(item, fill=fg)
+
+    def square_at(self, x, y):
+        c, r = int(x // self.size), int(y // self.size)
+        if 0 <= c < 8 and 0 <= r < 8:
+            return (7 - r) * 8 + c
+        return None
+
+    def sync(self, pos):
+        """Met les pièces du Canvas en accord avec pos (seules les cases modifiées)."""
+        shown, board = self._shown, pos.board
+        for sq in range(64):
+            p = board[sq]
+            text = self.symbol(PIECE_CHARS[p]) if p >= 0 else ""
+            if text != shown[sq]:
+                shown[sq] = text
+                self.canvas.itemconfigure(self.pieces[sq], text=text)
+
+    def select(self, sq=None, targets=()):
+        """Encadre la case sq et marque les arrivées de ses coups légaux (None : rien)."""
+        cv = self.canvas
+        for t in self._marked:
+            cv.itemconfigure(self.dots[t], state="hidden")
+        self._marked = list(targets)
+        for t in self._marked:
+            cv.itemconfigure(self.dots[t], state="normal")
+        if sq is None:
+            cv.itemconfigure(self.selection, state="hidden")
+            return
+        x0, y0 = (sq & 7) * self.size, (7 - (sq >> 3)) * self.size
+        cv.coords(self.selection, x0 + 2, y0 + 2, x0 + self.size - 2, y0 + self.size - 2)
+        cv.itemconfigure(self.selection, state="normal")
+        cv.tag_raise(self.selection)
+
+    def set_last(self, m=None):
+        """Surligne le départ et l’arrivée du coup m (None : efface)."""
+        for sq in self._last:
+            self.canvas.itemconfigure(self.squares[sq], fill=self._base(sq))
+        self._last = () if m is None else (m & 63, (m >> 6) & 63)
+        for sq in self._last:
+            self.canvas.itemconfigure(self.squares[sq], fill=self._base(sq, last=True))
+
+    def show_move(self, pos, m, animate=True):
+        """Affiche le coup m, déjà joué dans pos ; animé : la pièce glisse vers sa case."""
+        self.finish()
+        self.set_last(m)
+        self.sync(pos)
+        if not animate:
+            return
+        frm, to = m & 63, (m >> 6) & 63
+        cv = self.canvas
+        # la pièce d’arrivée est cachée pendant que son double glisse
+        cv.itemconfigure(self.floater, text=self._shown[to], state="normal")
+        cv.coords(self.floater, *self._center(frm))
+        cv.tag_raise(self.floater)
+        cv.itemconfigure(self.pieces[to], text="")
+        self._shown[to] = ""
+        self._anim = [None, pos, frm, to, 0]
+        self._step()
+
+    def _step(self):
+        anim = self._anim
+        anim[4] += 1
+        if anim[4] >= CHESS_ANIM_FRAMES:
+            self.finish()
+            return
+        (x0, y0), (x1, y1) = self._center(anim[2]), self._center(anim[3])
+        k = anim[4] / CHESS_ANIM_FRAMES
+        self.canvas.coords(self.floater, x0 + (x1 - x0) * k, y0 + (y1 - y0) * k)
+        anim[0] = self.canvas.after(CHESS_ANIM_MS, self._step)
+
+    @property
+    def animating(self):
+        return self._anim is not None
+
+    def finish(self):
+        """Termine tout de suite l’animation en cours."""
+        anim, self._anim = self._anim, None
+        if anim is None:
+            return
+        if anim[0] is not None:
+            try:
+                self.canvas.after_cancel(anim[0])
+            except tk.TclError:
+                pass
+        self.canvas.itemconfigure(self.floater, state="hidden")
+        self.sync(anim[1])
+
+# ---- Moteur de commandes (sans Tk) ----
+def split_command_list(text):
+    """Découpe « cmd; cmd » sur les ';' hors guillemets (mode -c)."""
+    out, cur, quote = [], [], None
+    for ch in text:
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "\"'":
+            quote = ch
+        elif ch == ";":
+            out.append("".join(cur).strip())
+            cur = []
+            continue
+        cur.append(ch)
+    out.append("".join(cur).strip())
+    return [c for c in out if c]
+
+class CommandEngine:
+    """
+    Registre et exécution des commandes, sans Tk : la sortie est écrite ligne
+    par ligne dans un flux texte (sys.stdout par défaut). TerminalApp en hérite
+    et y ajoute la fenêtre, la console et les commandes graphiques.
+    """
+    def __init__(self, out=None):
+        self.out = out if out is not None else sys.stdout
+        self._out_lock = threading.Lock()
+        self.running = True
+        self.errors = 0
+        # Tâches de fond : pool de threads créé au premier '&'
+        self.jobs: dict[int, Job] = {}
+        self._job_seq = 0
+        self._executor = None
+        self._tls = threading.local()
+        # Index de fichiers (locate/find), chargé au premier usage
+        self.file_index = None
+        self._index_job = None
 
         # État
         self.cwd = Path.cwd()
         self.dir_history = [self.cwd]
         self.last_target_file: Path | None = None
-        self.child_windows = set()  # Toplevel gérés
-        self.active_countdowns = []  # minuteurs actifs (objets avec .stop_event)
-        self.active_timers = []      # chronomètres actifs
         self.pending_selector = None # ex: play (sélection)
+        self.variables = {}          # variables de script (set NOM valeur)
 
         # Registre des commandes
         self.commands: dict[str, CommandSpec] = {}
         self._register_commands()
 
-        # Affichage d’accueil
-        self._banner()
-
-    # ---------- UI construction ----------
-    def _build_ui(self):
-        self.root.configure(bg=self.bg)
-        # Zone console (Text + Scrollbar)
-        self.text = tk.Text(self.root, wrap="word", bg=self.bg, fg=self.fg,
-                            insertbackground=self.fg, font=self.font,
-                            undo=False, autoseparators=False, maxundo=-1, height=24)
-        self.text.pack(side="top", fill="both", expand=True)
-        self.text.config(state="disabled")
-        # Scrollbar
-        sb = tk.Scrollbar(self.root, command=self.text.yview)
-        sb.pack(side="right", fill="y")
-        self.text["yscrollcommand"] = sb.set
-        # Menu contextuel simple (copier tout/copie selection)
-        self._build_context_menu()
-
-        # Entrée de commande
-        frame = tk.Frame(self.root, bg=self.bg)
-        frame.pack(side="bottom", fill="x")
-        self.prompt = tk.Label(frame, text="> ", bg=self.bg, fg=self.fg, font=self.font)
-        self.prompt.pack(side="left")
-        self.entry = tk.Entry(frame, bg=self.bg, fg=self.fg, insertbackground=self.fg, font=self.font)
-        self.entry.pack(side="left", fill="x", expand=True)
-        self.entry.bind("<Return>", self.on_enter)
-        self.entry.bind("<Up>", self.on_history_up)
-        self.entry.bind("<Down>", self.on_history_down)
-        self.entry.bind("<Control-l>", lambda e: (self.clear(), "break"))
-        self.entry.focus_set()
+    # ---------- IO ----------
+    def _count_error(self):
+        """Une erreur de plus : au total (code retour) et pour le thread courant, que suit un script."""
+        self.errors += 1
+        self._tls.errors = getattr(self._tls, "errors", 0) + 1
 
-        self.cmd_history = []
-        self.history_index = None
+    def write(self, text=""):
+        self.check_cancel()
+        if text.startswith(ERROR_PREFIXES):
+            self._count_error()
+        elif self._captured(text):
+            return
+        with self._out_lock:
+            self.out.write(text + "\n")
 
-        # Applique thème
-        self.themify(self.root)
+    def flush(self):
+        with self._out_lock:
+            self.out.flush()
 
-    def _build_context_menu(self):
-        self.menu = tk.Menu(self.root, tearoff=0, bg=self.bg, fg=self.fg, activebackground="#003300", activeforeground=self.fg)
-        self.menu.add_command(label="Copier", command=self.copy_selection)
-        self.menu.add_command(label="Tout sélectionner", command=self.select_all)
-        self.text.bind("<Button-3>", self._show_context_menu)
+    # ---------- Saisie/Parsing ----------
+    def run_line(self, line):
+        """Exécute une ligne saisie ; False si elle a échoué (exception)."""
+        # Gestion d’un éventuel "pending selector" (ex: play multi-match)
+        if self.pending_selector is not None:
+            handler = self.pending_selector
+            self.pending_selector = None
+            handler(line)
+            return True
 
-    def _show_context_menu(self, event):
         try:
-            self.menu.tk_popup(event.x_root, event.y_root)
-        finally:
-            self.menu.grab_release()
+            self.execute_command(line)
+        except Exception as e:
+            self.write(f"[erreur] {e!s}")
+            return False
+        return True
 
-    def copy_selection(self):
+    def _split_cmd(self, line: str):
+        if not any(c in line for c in "\"'\\"):
+            return line.split()  # cas courant : même résultat que shlex, sans son coût
+        import shlex
         try:
-            sel = self.text.selection_get()
+            parts = shlex.split(line)
         except Exception:
-            sel = ""
-        if sel:
-            self.root.clipboard_clear()
-            self.root.clipboard_append(sel)
-
-    def select_all(self):
-        self.text.tag_add("sel", "1.0", "end-1c")
-
-    # ---------- Thème ----------
-    def themify(self, widget):
-        """Appliquer le thème vert/noir à un widget et ses enfants."""
-        try:
-            widget.configure(bg=self.bg, fg=self.fg)
-        except Exception:
-            try:
-                widget.configure(bg=self.bg)
-            except Exception:
-                pass
-        # Curseur insertion (Entry/Text)
-        if isinstance(widget, (tk.Entry, tk.Text)):
-            widget.configure(insertbackground=self.fg)
-        for child in widget.winfo_children():
-            self.themify(child)
-
-    def set_colors(self, fg=None, bg=None):
-        if fg: self.fg = fg
-        if bg: self.bg = bg
-        # Re‑applique thème
-        self.themify(self.root)
-
-    # ---------- IO console ----------
-    def write(self, text=""):
-        self.text.config(state="normal")
-        self.text.insert("end", text + "\n")
-        self.text.see("end")
-        self.text.config(state="disabled")
-
-    def clear(self):
-        self.text.config(state="normal")
-        self.text.delete("1.0", "end")
-        self.text.config(state="disabled")
-
-    # ---------- Bannière ----------
-    def _banner(self):
-        self.write("Welcome to FreeOS'  |  tapez 'help' pour l’aide")
-        self.write(f"Dossier courant: {self.cwd}")
-        self.write("")
-
-    # ---------- Historique ----------
-    def on_history_up(self, event):
-        if not self.cmd_history:
-            return "break"
-        if self.history_index is None:
-            self.history_index = len(self.cmd_history) - 1
-        else:
-            self.history_index = max(0, self.history_index - 1)
-        self.entry.delete(0, "end")
-        self.entry.insert(0, self.cmd_history[self.history_index])
-        return "break"
-
-    def on_history_down(self, event):
-        if self.history_index is None:
-            return "break"
-        self.history_index = min(len(self.cmd_history)-1, self.history_index + 1)
-        self.entry.delete(0, "end")
-        self.entry.insert(0, self.cmd_history[self.history_index])
-        if self.history_index == len(self.cmd_history)-1:
-            self.history_index = None
-        return "break"
-
-    # ---------- Saisie/Parsing ----------
-    def on_enter(self, event):
-        line = self.entry.get().strip()
-        self.entry.delete(0, "end")
-        if not line:
-            return
-        self.write("> " + line)
-        self.cmd_history.append(line)
-        self.history_index = None
-
-        # Gestion d’un éventuel "pending selector" (ex: play multi-match)
-        if self.pending_selector is not None:
-            handler = self.pending_selector
-            self.pending_selector = None
-            handler(line)
-            return
-
-        try:
-            self.execute_command(line)
-        except Exception as e:
-            self.write(f"[erreur] {e!s}")
-
-    def _split_cmd(self, line: str):
-        try:
-            parts = shlex.split(line)
-        except Exception:
-            # fallback très tolérant
-            parts = line.strip().split()
-        return parts
+            # fallback très tolérant
+            parts = line.strip().split()
+        return parts
 
     def execute_command(self, line: str):
+        if line.rstrip().endswith("&"):
+            return self.start_job(line.rstrip()[:-1].strip())
+        if "|" in line or ">" in line:
+            stages, redirect = self._split_pipeline(line)
+            if len(stages) > 1 or redirect is not None:
+                return self._run_pipeline(stages, redirect)
         parts = self._split_cmd(line)
         if not parts:
             return
         cmd_raw = parts[0]
         args = parts[1:]
 
+        spec = self._find_command(cmd_raw)
+        if spec is not None:
+            if spec.gui and self.current_job() is not None:
+                # ex: script lancé avec 'run x &' : pas de widgets hors du thread Tk
+                self.write(f"[jobs] '{cmd_raw}' est graphique : ignorée en tâche de fond.")
+                return
+            return spec.func(args)
+
+        self.write(f"[commande inconnue] '{cmd_raw}'. Essayez 'help'.")
+
+    def _find_command(self, cmd_raw):
         cmd = cmd_raw.lower()
+        spec = self.commands.get(cmd)
+        if spec is not None:
+            return spec
         # aliases → canon
         for name, spec in self.commands.items():
             if cmd == name or cmd in spec.aliases:
-                return spec.func(args)
+                return spec
+        return None
+
+    # ---------- Tâches de fond ----------
+    def current_job(self):
+        """Tâche exécutée par le thread courant (None sur le thread Tk)."""
+        return getattr(self._tls, "job", None)
+
+    def check_cancel(self):
+        """Point d’annulation coopérative : lève JobCancelled si la tâche courante est tuée."""
+        job = getattr(self._tls, "job", None)
+        if job is not None and job.cancel.is_set():
+            raise JobCancelled()
+
+    def _offload(self, argv):
+        """
+        Commande longue (build, pgncheck...) : TerminalApp la relance en tâche de
+        fond quand l’interface attend ; renvoie alors la tâche, sinon None et
+        la commande s’exécute ici, en séquence (console, script, pipe, tâche).
+        """
+        return None
+
+    def start_job(self, line):
+        parts = self._split_cmd(line)
+        if not parts:
+            self.write("[usage] <commande> &")
+            return
+        spec = self._find_command(parts[0])
+        if spec is None:
+            self.write(f"[commande inconnue] '{parts[0]}'. Essayez 'help'.")
+            return
+        if "|" in line or ">" in line:
+            # pipe / redirection : toute la ligne tourne dans la tâche
+            spec, parts = CommandSpec(func=lambda _args: self.execute_command(line), desc=""), [line]
+        elif spec.gui:
+            # les widgets Tk restent sur le thread principal
+            self.write(f"[jobs] '{parts[0]}' est graphique : exécution directe.")
+            return spec.func(parts[1:])
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=JOBS_MAX_WORKERS, thread_name_prefix="freeos-job")
+        self._job_seq += 1
+        job = Job(id=self._job_seq, line=line)
+        self.jobs[job.id] = job
+        job.future = self._executor.submit(self._run_job, job, spec, parts[1:])
+        self.write(f"[{job.id}] {line}")
+        return job
+
+    def _run_job(self, job, spec, args):
+        job.status = "en cours"
+        job.started = time.monotonic()
+        self._tls.job = job
+        try:
+            self.check_cancel()
+            spec.func(args)
+            job.status = "terminé"
+        except JobCancelled:
+            job.status = "annulé"
+        except Exception as e:
+            self._count_error()
+            job.status = f"erreur: {e!s}"
+        finally:
+            self._tls.job = None
+            job.ended = time.monotonic()
+        self.write(f"[{job.id}]+ {job.status}  {job.line}")
 
-        self.write(f"[commande inconnue] '{cmd_raw}'. Essayez 'help'.")
+    def _parse_job_ids(self, args):
+        if not args:
+            return [j for j in self.jobs.values() if not j.future.done()]
+        out = []
+        for a in args:
+            try:
+                out.append(self.jobs[int(a.lstrip("%"))])
+            except (ValueError, KeyError):
+                self.write(f"[jobs] tâche inconnue : {a}")
+        return out
+
+    def cmd_jobs(self, args):
+        if not self.jobs:
+            self.write("[jobs] aucune tâche.")
+            return
+        now = time.monotonic()
+        for job in self.jobs.values():
+            dur = (job.ended or now) - job.started
+            self.write(f"[{job.id}] {job.status:<12} {dur:7.1f}s  {job.line}")
+        # on oublie les tâches finies une fois affichées
+        for jid in [j.id for j in self.jobs.values() if j.future.done()]:
+            del self.jobs[jid]
+
+    def cmd_kill(self, args):
+        if not args:
+            self.write("[usage] kill <id> [id...]")
+            return
+        for job in self._parse_job_ids(args):
+            if job.future.done():
+                self.write(f"[{job.id}] déjà {job.status}.")
+                continue
+            job.cancel.set()
+            if job.future.cancel():  # pas encore démarrée
+                job.status = "annulé"
+                job.ended = time.monotonic()
+                self.write(f"[{job.id}]+ annulé  {job.line}")
+            else:
+                self.write(f"[{job.id}] annulation demandée.")
 
-    # ---------- Gestion fenêtres ----------
-    def register_window(self, win: tk.Toplevel):
-        self.child_windows.add(win)
+    def cmd_wait(self, args):
+        jobs = [j for j in self._parse_job_ids(args) if not j.future.done()]
+        if not jobs:
+            self.write("[jobs] rien à attendre.")
+            return
+        self._wait_jobs(jobs)
+
+    def _wait_jobs(self, jobs):
+        from concurrent.futures import wait
+        wait([j.future for j in jobs])
+
+    def _shutdown_jobs(self):
+        for job in self.jobs.values():
+            job.cancel.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- Flux de lignes ----------
+    def _drive(self, it, script=False):
+        """
+        Fait avancer jusqu’au bout un itérateur de travail (script, écriture
+        d’un pipe dans un fichier) ; chaque pas rend la main (voir TerminalApp).
+        """
+        if getattr(self._tls, "capture", None) is not None:
+            # dans un pipe : le travail avance au rythme du filtre qui lit
+            self._captured(self._drive_captured(it, script))
+            return
+        if script:
+            self._tls.script_depth = getattr(self._tls, "script_depth", 0) + 1
+        try:
+            for _ in it:
+                pass
+        finally:
+            if script:
+                self._tls.script_depth -= 1
+
+    def _drive_captured(self, it, script):
+        """Un pas de travail par lecture ; sa sortie est rendue ligne à ligne."""
+        buf = []
+        done = False
+        while not done:
+            prev = getattr(self._tls, "capture", None)
+            self._tls.capture = buf
+            if script:
+                self._tls.script_depth = getattr(self._tls, "script_depth", 0) + 1
+            try:
+                next(it)
+            except StopIteration:
+                done = True
+            finally:
+                self._tls.capture = prev
+                if script:
+                    self._tls.script_depth -= 1
+            yield from self._capture_iter(buf)
+            buf.clear()
+
+    def stream_lines(self, lines, page=None):
+        """Écrit un flux de lignes au fur et à mesure qu’il est produit."""
+        if self._captured(lines):
+            return
+        for line in lines:
+            self.write(line)
+
+    def _page_lines(self):
+        return None
+
+    # ---------- Pipes et redirections ----------
+    @staticmethod
+    def _pipeline_tokens(line):
+        """
+        Mots de la ligne (règles de shlex.split) + drapeau « opérateur » : seuls
+        |, > et >> isolés entre espaces et hors guillemets en sont ; a->b ou
+        '>' restent du texte. ValueError si un guillemet n’est pas fermé.
+        """
+        out = []
+        word, bare, started = [], True, False
+        quote = None
+        chars = iter(line)
+        for c in chars:
+            if quote == "'":
+                if c == "'":
+                    quote = None
+                else:
+                    word.append(c)
+            elif quote == '"':
+                if c == '"':
+                    quote = None
+                elif c == "\\":
+                    nxt = next(chars, "")
+                    word.append(nxt if nxt in '"\\$`' else c + nxt)
+                else:
+                    word.append(c)
+            elif c.isspace():
+                if started:
+                    text = "".join(word)
+                    out.append((text, bare and text in ("|", ">", ">>")))
+                word, bare, started = [], True, False
+            elif c in "'\"":
+                quote, bare, started = c, False, True
+            elif c == "\\":
+                word.append(next(chars, ""))
+                bare, started = False, True
+            else:
+                word.append(c)
+                started = True
+        if quote is not None:
+            raise ValueError("guillemet non fermé")
+        if started:
+            text = "".join(word)
+            out.append((text, bare and text in ("|", ">", ">>")))
+        return out
+
+    def _split_pipeline(self, line):
+        """
+        'a x | b y > f' -> ([['a', 'x'], ['b', 'y']], ('w', 'f')) ; '>>' ajoute ('a').
+        Les opérateurs doivent être séparés par des espaces (voir _pipeline_tokens).
+        """
+        try:
+            tokens = self._pipeline_tokens(line)
+        except ValueError:
+            return [self._split_cmd(line)], None  # guillemet non fermé : pas de pipe
+        stages, cur, redirect = [], [], None
+        it = iter(tokens)
+        for tok, op in it:
+            if not op:
+                cur.append(tok)
+            elif tok == "|":
+                stages.append(cur)
+                cur = []
+            else:
+                target, target_op = next(it, (None, False))
+                if target is None or target_op or redirect is not None:
+                    raise ValueError("redirection invalide (ex: dir > fichier.txt)")
+                redirect = ("a" if tok == ">>" else "w", target)
+        stages.append(cur)
+        if any(not st for st in stages):
+            raise ValueError("commande vide dans le pipe")
+        return stages, redirect
+
+    def _run_pipeline(self, stages, redirect):
+        """
+        1re commande : sa sortie (write / stream_lines) est capturée ; les
+        générateurs de stream_lines ne sont pas déroulés, les filtres suivants
+        les consomment ligne à ligne. La sortie finale va à la console, ou
+        directement dans un fichier avec > / >>.
+        """
+        specs = []
+        for i, parts in enumerate(stages):
+            spec = self._find_command(parts[0])
+            if spec is None:
+                self.write(f"[commande inconnue] '{parts[0]}'. Essayez 'help'.")
+                return
+            if i == 0 and spec.gui:
+                self.write(f"[erreur] '{parts[0]}' est graphique : pas de sortie à rediriger.")
+                return
+            if i > 0 and spec.pipe is None:
+                self.write(f"[erreur] '{parts[0]}' ne lit pas de flux (après |) : voir grep, head, tail, sort, uniq, wc.")
+                return
+            specs.append(spec)
+        if specs[0].pipe is not None:
+            self.write(f"[usage] <commande> | {stages[0][0]} ...")
+            return
+        # filtres construits avant de lancer quoi que ce soit (erreurs d’arguments)
+        filters = [(spec.pipe, parts[1:]) for spec, parts in zip(specs[1:], stages[1:])]
+        cap = []
+        prev = getattr(self._tls, "capture", None)
+        self._tls.capture = cap
+        try:
+            specs[0].func(stages[0][1:])
+        finally:
+            self._tls.capture = prev
+        lines = self._capture_iter(cap)
+        for pipe, args in filters:
+            lines = pipe(args, lines)
+        if redirect is None:
+            self.stream_lines(lines)
+            return
+        mode, target = redirect
+        path = (self.cwd / target).resolve()
+        f = open(path, mode, encoding="utf-8")  # erreur d’ouverture : signalée tout de suite
+        self._drive(self._write_lines(f, lines))
+
+    @staticmethod
+    def _capture_iter(cap):
+        for item in cap:
+            if isinstance(item, str):
+                yield from item.split("\n")
+            else:
+                yield from item
+
+    def _captured(self, item):
+        """Dans un pipe : garde la sortie (ligne ou flux) pour le filtre suivant."""
+        cap = getattr(self._tls, "capture", None)
+        if cap is None:
+            return False
+        cap.append(item)
+        return True
+
+    def _write_lines(self, f, lines, batch=512):
+        """Écrit le flux dans f par paquets ; rend la main entre deux paquets."""
+        with f:
+            buf = []
+            for line in lines:
+                buf.append(line)
+                if len(buf) >= batch:
+                    self.check_cancel()
+                    buf.append("")
+                    f.write("\n".join(buf))
+                    buf.clear()
+                    yield
+            if buf:
+                buf.append("")
+                f.write("\n".join(buf))
+
+    # filtres (après |)
+    def _pipe_grep(self, args, lines):
+        flags = {a for a in args if a.startswith("-") and len(a) > 1}
+        words = [a for a in args if a not in flags]
+        if len(words) != 1 or flags - {"-i", "-v", "-c", "-e"}:
+            raise ValueError("usage : grep [-i] [-v] [-c] [-e regex] <motif>")
+        invert = "-v" in flags
+        if "-e" in flags or "-i" in flags:
+            rx = re.compile(words[0] if "-e" in flags else re.escape(words[0]),
+                            re.IGNORECASE if "-i" in flags else 0)
+            match = rx.search
+        else:
+            needle = words[0]
+            match = lambda s: needle in s
+        it = (l for l in lines if bool(match(l)) != invert)
+        if "-c" in flags:
+            return self._count_iter(it)
+        return it
+
+    @staticmethod
+    def _count_iter(it):
+        yield str(sum(1 for _ in it))
+
+    @staticmethod
+    def _pipe_count_arg(args, name, default=10):
+        if not args:
+            return default
+        try:
+            if args[0] == "-n" and len(args) == 2:
+                return int(args[1])
+            if len(args) == 1:
+                return int(args[0].lstrip("-"))
+        except ValueError:
+            pass
+        raise ValueError(f"usage : {name} [-n N]")
 
-    def unregister_window(self, win: tk.Toplevel):
-        if win in self.child_windows:
-            self.child_windows.remove(win)
+    def _pipe_head(self, args, lines):
+        from itertools import islice
+        return islice(lines, max(0, self._pipe_count_arg(args, "head")))
 
-    def close_all_windows(self):
-        for w in list(self.child_windows):
-            try:
-                w.destroy()
-            except Exception:
-                pass
-        self.child_windows.clear()
+    def _pipe_tail(self, args, lines):
+        n = max(0, self._pipe_count_arg(args, "tail"))
+        def gen():
+            yield from deque(lines, maxlen=n)
+        return gen()
+
+    def _pipe_sort(self, args, lines):
+        if set(args) - {"-r", "-n", "-u"}:
+            raise ValueError("usage : sort [-r] [-n] [-u]")
+        def num(s):
+            m = re.match(r"\s*(-?\d+(?:[.,]\d+)?)", s)
+            return (0, float(m.group(1).replace(",", ".")), s) if m else (1, 0.0, s)
+        def gen():
+            data = set(lines) if "-u" in args else list(lines)
+            yield from sorted(data, key=num if "-n" in args else None, reverse="-r" in args)
+        return gen()
+
+    def _pipe_uniq(self, args, lines):
+        if set(args) - {"-c"}:
+            raise ValueError("usage : uniq [-c]")
+        from itertools import groupby
+        if "-c" in args:
+            return (f"{sum(1 for _ in grp):7d} {key}" for key, grp in groupby(lines))
+        return (key for key, _grp in groupby(lines))
+
+    def _pipe_wc(self, args, lines):
+        if set(args) - {"-l"}:
+            raise ValueError("usage : wc [-l]")
+        def gen():
+            n = words = chars = 0
+            for line in lines:
+                n += 1
+                if "-l" not in args:
+                    words += len(line.split())
+                    chars += len(line) + 1
+            yield str(n) if "-l" in args else f"{n} lignes, {words} mots, {chars} caractères"
+        return gen()
 
     # ---------- Commandes ----------
     def _register_commands(self):
         self._add_cmd("help", self.cmd_help, desc="Afficher l’aide (colonne alignée, adapte la largeur).")
-        self._add_cmd("cln", self.cmd_clear, desc="Nettoyer l’affichage du terminal.", aliases=["cls"])
 
         # fichiers & navigation
-        self._add_cmd("dir", self.cmd_dir, desc="Lister les fichiers/dossiers du dossier courant.", aliases=["ls"])
+        self._add_cmd("dir", self.cmd_dir, desc="Lister les fichiers/dossiers (flux). Options: -l (taille, date), -s name|size|mtime, -r, -u (ordre disque), -p (pages), motifs *.txt", aliases=["ls"])
         self._add_cmd("cd", self.cmd_cd, desc="Changer/afficher le dossier courant. cd - / -- / --- pour revenir en arrière.")
         self._add_cmd("cds", self.cmd_cds, desc="Créer un dossier (parents si besoin).")
         self._add_cmd("cfile", self.cmd_cfile, desc="Créer/éditer un fichier. Ex: cfile test.txt - \"du texte\"")
-        self._add_cmd("play", self.cmd_play, desc="Ouvrir un fichier/dossier avec l’appli système (sélection si multiples).")
+        self._add_cmd("play", self.cmd_play, desc="Ouvrir un fichier/dossier avec l’appli système (sélection si multiples ; sinon cherche dans l’index).")
+        self._add_cmd("index", self.cmd_index, desc="Index de fichiers : index build <dossier> | index refresh | index (état).")
+        self._add_cmd("find", self.cmd_find, desc="Chercher dans l’index de fichiers : find <motif> [-f flou] [-n max].", aliases=["locate"])
 
         # texte & site
         self._add_cmd("msg", self.cmd_msg, desc="Afficher un message tel quel.")
         self._add_cmd("i", self.cmd_i, desc="Ouvrir https://ffm.bio/myrce/ dans le navigateur.")
 
-        # random & password
-        self._add_cmd("random", self.cmd_random, desc="Menu aléatoire (mot / nombre / dicton).")
-        self._add_cmd("password", self.cmd_password, desc="Générateur de mot de passe / passphrase (fenêtre).")
+        # random
+        self._add_cmd("random", self.cmd_random, desc="Menu aléatoire (mot / nombre / dicton) ; en lot : random wrd|nmbr [min max]|dicton -n N [--seed graine] [-o fichier].")
+        self._add_cmd("words", self.cmd_words, desc="Liste de mots externe (passphrases, pendu, random) : words build <fichier> | words info | words reset.")
+        self._add_cmd("password", self.cmd_password, desc="Mots de passe en masse : password [-n N] [-l longueur] [--symbols] [--no-upper|--no-lower|--no-digits] [-w mots [--sep -]] [-o fichier] (sans option : fenêtre).")
 
-        # outils graphiques
-        self._add_cmd("count", self.cmd_count, desc="Compteur cliquable (+/−).")
-        self._add_cmd("calc", self.cmd_calc, desc="Calculatrice (0–9, + − × ÷, ., =, C).")
-        self._add_cmd("color", self.cmd_color, desc="Changer la couleur texte/fond (fenêtre).")
+        # audio
         self._add_cmd("audio", self.cmd_audio, desc="Infos audio (fallback sans dépendances).")
 
-        # jeux
-        self._add_cmd("game", self.cmd_game, desc="Menu jeux (devine nombre, memory, pendu, morpion, échecs).")
-
         # temps / date / calendriers
-        self._add_cmd("time", self.cmd_time, desc="Affiche HH:MM:SS ou 'time x' pour horloge (fenêtre).")
-        self._add_cmd("timer", self.cmd_timer, desc="Chronomètre (fenêtre).")
-        self._add_cmd("minuteur", self.cmd_minuteur, desc="Compte à rebours (bips à 0, répétés jusqu’à 'Stop m').")
-        self._add_cmd("Stop", self.cmd_stop, desc="Stop m : arrête le minuteur. Syntaxe: 'Stop m'.")
-        self._add_cmd("stop", self.cmd_stop, desc="Alias de 'Stop m'.")
-        self._add_cmd("stop all", self.cmd_stop_all, desc="Arrêter/fermer toutes les sous‑fenêtres & timers.")
-
+        self._add_cmd("time", self.cmd_time, desc="Affiche HH:MM:SS.")
         self._add_cmd("cal", self.cmd_cal, desc="Calendrier du mois courant.")
         self._add_cmd("date", self.cmd_date, desc="Date du jour (jj.mm.aaaa).")
 
-        # audio rec
-        self._add_cmd("rec", self.cmd_rec, desc="Dictaphone (désactivé sans lib externe ; explication en fenêtre).")
+        # filtres (pipes) : ex. dir | grep txt > liste.txt
+        self._add_cmd("grep", None, pipe=self._pipe_grep, desc="Filtre : lignes contenant le motif. ... | grep [-i] [-v] [-c] [-e regex] <motif>")
+        self._add_cmd("head", None, pipe=self._pipe_head, desc="Filtre : premières lignes. ... | head [-n N]")
+        self._add_cmd("tail", None, pipe=self._pipe_tail, desc="Filtre : dernières lignes. ... | tail [-n N]")
+        self._add_cmd("sort", None, pipe=self._pipe_sort, desc="Filtre : trier les lignes. ... | sort [-r] [-n] [-u]")
+        self._add_cmd("uniq", None, pipe=self._pipe_uniq, desc="Filtre : fusionner les lignes identiques voisines. ... | uniq [-c]")
+        self._add_cmd("wc", None, pipe=self._pipe_wc, desc="Filtre : compter lignes, mots, caractères. ... | wc [-l]")
+
+        # échecs
+        self._add_cmd("perft", self.cmd_perft, desc="Générateur de coups d’échecs : perft <profondeur> [-d détail par coup] [-j processus] [FEN] (nœuds/s ; long : perft 5 &).")
+        self._add_cmd("book", self.cmd_book, desc="Bibliothèque d’ouvertures : book build <fichier.pgn> [-o sortie] [-p demi‑coups] | book [FEN] (coups connus) | book info.")
+        self._add_cmd("analyse", self.cmd_analyse, desc="Analyse d’une position sur plusieurs cœurs : analyse [-t secondes] [-j processus] [-p profondeur] [FEN] (meilleure ligne à chaque profondeur).")
+        self._add_cmd("pgncheck", self.cmd_pgncheck, desc="Vérifier une base PGN (toutes les parties rejouées, multi‑cœurs) : pgncheck <fichier.pgn> [-j processus] [-o parties_valides.pgn].")
+        self._add_cmd("tb", self.cmd_tb, desc="Tables de finales KQK, KRK, KPK : tb build [finales...] [-j processus] | tb info | tb <FEN> (résultat exact et meilleur coup).")
+
+        # scripts
+        self._add_cmd("run", self.cmd_run, desc="Exécuter un script de commandes : run [-k continuer après erreur] [-x trace] <fichier> [args...] ($1.., $NOM, # commentaires).")
+        self._add_cmd("set", self.cmd_set, desc="Variables de script : set NOM valeur | set NOM (efface) | set (liste).")
 
         # sorties / arrêt
-        self._add_cmd("exitapp", self.cmd_exitapp, desc="Fermer toutes les sous‑fenêtres/outils (terminal reste ouvert).")
         self._add_cmd("exit", self.cmd_exit, desc="Fermer l’application terminal.")
-        self._add_cmd("shutup", self.cmd_shutup, desc="Affiche 'ok', attend 1s, stop all + ferme.")
 
-    def _add_cmd(self, name, func, desc="", aliases=None):
+        # tâches de fond
+        self._add_cmd("jobs", self.cmd_jobs, desc="Lister les tâches lancées avec '&' (ex: dir &).")
+        self._add_cmd("kill", self.cmd_kill, desc="Annuler une tâche de fond : kill <id>.")
+        self._add_cmd("wait", self.cmd_wait, desc="Attendre la fin de tâches : wait [id...] (Échap pour interrompre).", gui=True)
+
+    def _add_cmd(self, name, func, desc="", aliases=None, gui=False, pipe=None):
         if aliases is None: aliases = []
-        self.commands[name] = CommandSpec(func=func, desc=desc, aliases=aliases)
+        if func is None:
+            # filtre seul sur la ligne : rien à lire
+            func = lambda args, name=name: self.write(f"[usage] <commande> | {name} ... (filtre après |)")
+        self.commands[name] = CommandSpec(func=func, desc=desc, aliases=aliases, gui=gui, pipe=pipe)
 
     # ---------- Implémentations ----------
     # help
+    def _console_columns(self):
+        import shutil
+        return max(60, shutil.get_terminal_size((80, 24)).columns)
+
     def cmd_help(self, args):
-        # Mise en forme selon largeur de la Text
-        # Estimation largeur en caractères
-        # On mesure 80 colonnes par défaut, sinon via font measure
-        try:
-            px_width = self.text.winfo_width()
-            char_w = self.font.measure("M") or 8
-            cols = max(60, int(px_width / max(1, char_w)))
-        except Exception:
-            cols = 80
+        # Mise en forme selon la largeur de la console (colonnes)
+        import textwrap
+        cols = self._console_columns()
 
         left_col_w = max(len(name) for name in self.commands) + 8  # place pour alias
         left_col_w = min(left_col_w, 42)
@@ -505,29 +3630,99 @@ class TerminalApp:
             lines.append(left_txt + wrapped[0])
             for wline in wrapped[1:]:
                 lines.append(" " * left_col_w + wline)
+        lines.append("")
+        lines.extend(textwrap.wrap("Pipes et redirections : |, > et >> isolés par des espaces "
+                                   "(dir | grep txt > liste.txt) ; collés à un mot (a->b) ou entre "
+                                   "guillemets ('>'), ce sont de simples caractères.", width=cols))
         self.write("\n".join(lines))
 
-    def cmd_clear(self, args):
-        self.clear()
-
     # dir / ls
     def cmd_dir(self, args):
-        p = self.cwd
-        try:
-            names = sorted(os.listdir(p))
-        except Exception as e:
-            self.write(f"[erreur] {e}")
+        opts = self._parse_dir_args(args)
+        if opts is None:
+            self.write("[usage] dir [chemin] [-l] [-s name|size|mtime] [-r] [-u] [-p] [motif...]")
             return
-        if not names:
-            self.write("(vide)")
+        path, patterns, long, sort, reverse, paged = opts
+        lines = self._iter_dir(path, patterns, long, sort, reverse)
+        self.stream_lines(lines, page=self._page_lines() if paged else None)
+
+    def _parse_dir_args(self, args):
+        path, patterns = None, []
+        long = reverse = paged = False
+        sort = "name"
+        it = iter(args)
+        for a in it:
+            if a in ("-s", "--sort"):
+                sort = next(it, "").lower()
+                if sort not in DIR_SORT_KEYS:
+                    return None
+            elif a.startswith("-") and len(a) > 1:
+                for flag in a[1:]:
+                    if flag == "l": long = True
+                    elif flag == "r": reverse = True
+                    elif flag == "u": sort = None
+                    elif flag == "p": paged = True
+                    else:
+                        return None
+            elif any(ch in a for ch in "*?["):
+                patterns.append(a)
+            elif path is None:
+                path = a
+            else:
+                return None
+        target = self.cwd if path is None else (self.cwd / path)
+        return target, patterns, long, sort, reverse, paged
+
+    def _iter_dir(self, path, patterns=(), long=False, sort="name", reverse=False):
+        """
+        Génère les lignes de 'dir' à partir de os.scandir : le type vient du
+        d_type de l’entrée (pas de stat), stat seulement pour -l / tri size|mtime.
+        sort=None : aucune mise en mémoire, les lignes sortent dans l’ordre du disque.
+        """
+        from fnmatch import fnmatch
+        try:
+            scan = os.scandir(path)
+        except OSError as e:
+            yield f"[erreur] {e}"
             return
-        # afficher types
-        out = []
-        for n in names:
-            path = p / n
-            tag = "<DIR>" if path.is_dir() else "     "
-            out.append(f"{tag}  {n}")
-        self.write("\n".join(out))
+        n = 0
+        with scan:
+            entries = scan
+            if patterns:
+                entries = (e for e in entries if any(fnmatch(e.name, p) for p in patterns))
+            if sort == "name":
+                entries = sorted(entries, key=lambda e: e.name, reverse=reverse)
+            elif sort == "size":
+                entries = sorted(entries, key=lambda e: self._entry_stat(e)[0], reverse=reverse)
+            elif sort == "mtime":
+                entries = sorted(entries, key=lambda e: self._entry_stat(e)[1], reverse=reverse)
+            for e in entries:
+                n += 1
+                yield self._fmt_dir_entry(e, long)
+        if n == 0:
+            yield "(vide)"
+
+    @staticmethod
+    def _entry_stat(entry):
+        """(taille, mtime) d’une entrée scandir ; (0, 0) si illisible (lien cassé...)."""
+        try:
+            st = entry.stat()
+            return st.st_size, st.st_mtime
+        except OSError:
+            return 0, 0.0
+
+    def _fmt_dir_entry(self, entry, long):
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        tag = "<DIR>" if is_dir else "     "
+        if not long:
+            return f"{tag}  {entry.name}"
+        size, mtime = self._entry_stat(entry)
+        size_txt = "" if is_dir else f"{size:,}".replace(",", " ")
+        date_txt = time.strftime("%Y-%m-%d %H:%M", time.localtime(mtime))
+        return f"{tag}  {size_txt:>15}  {date_txt}  {entry.name}"
 
     # cd
     def cmd_cd(self, args):
@@ -627,49 +3822,1599 @@ class TerminalApp:
         needle = args[0].lower()
         entries = list((self.cwd).iterdir())
         matches = [p for p in entries if needle in p.name.lower()]
+        label = lambda p: p.name
+        if not matches:
+            # rien ici : on interroge l’index de fichiers (voir 'index')
+            idx = self._get_file_index()
+            if idx is not None:
+                matches = [idx.root / rel for rel in idx.search(needle, basename=True)]
+                label = str
         if not matches:
             self.write("[info] aucune correspondance.")
             return
         if len(matches) == 1:
             try:
-                open_system_path(matches[0])
-                self.write(f"[ouvert] {matches[0].name}")
-            except Exception as e:
-                self.write(f"[erreur] {e}")
+                open_system_path(matches[0])
+                self.write(f"[ouvert] {label(matches[0])}")
+            except Exception as e:
+                self.write(f"[erreur] {e}")
+            return
+        # multiples → proposer sélection dans la console
+        self.write("Plusieurs correspondances :")
+        for i, p in enumerate(matches, 1):
+            self.write(f"  {i:>2}: {label(p)}")
+        self.write("Choisissez un numéro puis appuyez Entrée.")
+        def selection_handler(line):
+            try:
+                k = int(line.strip())
+                if 1 <= k <= len(matches):
+                    open_system_path(matches[k-1])
+                    self.write(f"[ouvert] {label(matches[k-1])}")
+                else:
+                    self.write("[info] sélection annulée.")
+            except Exception:
+                self.write("[info] sélection annulée.")
+        self.pending_selector = selection_handler
+
+    # index / find (locate)
+    def _load_file_index(self):
+        if self.file_index is None:
+            try:
+                root = (LOCATE_DIR / "default").read_text(encoding="utf-8").strip()
+                self.file_index = FileIndex.load(FileIndex.path_for(root))
+            except (OSError, ValueError):
+                return None
+        return self.file_index
+
+    def _get_file_index(self):
+        """Index courant (chargé depuis le disque au besoin) ; relance un rafraîchissement s’il est ancien."""
+        idx = self._load_file_index()
+        if idx is None:
+            return None
+        if time.time() - idx.updated > LOCATE_STALE_S and self._index_job is None:
+            # en silence : la sortie de find/play ne doit pas changer
+            self._index_job = threading.Thread(target=self._index_refresh_quiet, name="freeos-index", daemon=True)
+            self._index_job.start()
+        return idx
+
+    def _index_refresh_quiet(self):
+        try:
+            self._index_crawl("refresh", [], quiet=True)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self._index_job = None
+
+    def cmd_index(self, args):
+        sub = (args[0].lower() if args else "")
+        if sub in ("build", "refresh"):
+            job = self._offload(["index", *args])
+            if job is not None:
+                self._index_job = job
+                return
+            try:
+                self._index_crawl(sub, args[1:])
+            finally:
+                self._index_job = None
+        elif sub == "":
+            idx = self._get_file_index()
+            if idx is None:
+                self.write("[index] aucun index. Créez‑le avec : index build <dossier>")
+                return
+            age = time.time() - idx.updated
+            paths, dirs = (f"{n:,}".replace(",", " ") for n in (len(idx), len(idx.dirs)))
+            self.write(f"[index] {idx.root} : {paths} chemins, {dirs} dossiers, mis à jour il y a {age:.0f}s")
+        else:
+            self.write("[usage] index [build <dossier> | refresh]")
+
+    def _index_crawl(self, sub, args, quiet=False):
+        """Parcours + sauvegarde, puis bascule de l’index (quiet : sans compte rendu)."""
+        if sub == "build":
+            root = (self.cwd / args[0]).resolve() if args else self.cwd
+            if not root.is_dir():
+                self.write(f"[erreur] dossier introuvable : {root}")
+                return
+            try:
+                idx = FileIndex.load(FileIndex.path_for(root))
+            except (OSError, ValueError):
+                idx = FileIndex(root)
+        else:
+            current = self._load_file_index()
+            if current is None:
+                self.write("[index] aucun index. Créez‑le avec : index build <dossier>")
+                return
+            idx = FileIndex(current.root)
+            idx.dirs = current.dirs
+        t0 = time.perf_counter()
+        rescanned, reused = idx.refresh(check=self.check_cancel)
+        idx.save()
+        LOCATE_DIR.mkdir(parents=True, exist_ok=True)
+        (LOCATE_DIR / "default").write_text(str(idx.root), encoding="utf-8")
+        idx._text()  # prépare le texte de recherche hors du thread Tk
+        self.file_index = idx
+        if quiet:
+            return
+        paths = f"{len(idx):,}".replace(",", " ")
+        self.write(f"[index] {idx.root} : {paths} chemins ({rescanned} dossiers relus, "
+                   f"{reused} inchangés) en {time.perf_counter() - t0:.1f}s")
+
+    def cmd_find(self, args):
+        fuzzy = "-f" in args
+        rest = [a for a in args if a != "-f"]
+        limit = LOCATE_MAX_RESULTS
+        if "-n" in rest:
+            k = rest.index("-n")
+            try:
+                limit = max(1, int(rest[k + 1]))
+            except (IndexError, ValueError):
+                self.write("[usage] find <motif> [-f] [-n max]")
+                return
+            del rest[k:k + 2]
+        if not rest:
+            self.write("[usage] find <motif> [-f] [-n max]")
+            return
+        idx = self._get_file_index()
+        if idx is None:
+            self.write("[index] aucun index. Créez‑le avec : index build <dossier>")
+            return
+        t0 = time.perf_counter()
+        found = idx.search(" ".join(rest), fuzzy=fuzzy, limit=limit)
+        dt = (time.perf_counter() - t0) * 1000
+        root = idx.root
+        lines = [str(root / rel) for rel in found]
+        lines.append(f"({len(found)} résultat(s), {dt:.1f} ms)")
+        self.stream_lines(lines)
+
+    # msg
+    def cmd_msg(self, args):
+        self.write(" ".join(args))
+
+    # i
+    def cmd_i(self, args):
+        url = "https://ffm.bio/myrce/"
+        self.write(f"[ouvrir] {url}")
+        try:
+            import webbrowser
+            webbrowser.open(url)
+        except Exception:
+            pass
+
+    # random
+    def cmd_random(self, args):
+        usage = "[usage] random wrd|nmbr [min max]|dicton [-n N] [--seed graine] [-o fichier]"
+        opts = {}
+        try:
+            opts, rest = self._parse_opts(args, {"-n": int, "--seed": str, "-o": str})
+        except ValueError:
+            rest = []
+        count = opts.get("-n", 1) if rest else 0
+        # Sous-commandes
+        sub = (rest[0] if rest else "").lower()
+        if sub in ("wrd", "word", "mot") and len(rest) == 1:
+            pool = word_pool()
+            n, pick = len(pool), lambda idx: [pool[i] for i in idx]
+        elif sub in ("nmbr", "nombre", "num", "number") and len(rest) in (1, 3):
+            mn, mx = 0, 100
+            if len(rest) == 3:
+                try:
+                    mn, mx = int(rest[1]), int(rest[2])
+                except ValueError:
+                    self.write(f"[erreur] bornes entières attendues : {rest[1]} {rest[2]}")
+                    return
+            n = mx - mn + 1
+            if 0 < n <= RANDOM_LABELS_MAX:
+                labels = [str(x) for x in range(mn, mx + 1)]
+                pick = lambda idx: map(labels.__getitem__, idx)
+            else:
+                pick = lambda idx: map(str, map(mn.__add__, idx) if mn else idx)
+        elif sub in ("dicton", "prov", "proverbe") and len(rest) == 1:
+            pool = dictons()
+            n, pick = len(pool), lambda idx: [pool[i] for i in idx]
+        else:
+            n = 0
+        if count < 1 or n < 1:
+            self.write(usage)
+            return
+        # --seed : même graine, même suite (Mersenne Twister, pas pour des secrets)
+        randbytes = _random.Random(opts["--seed"]).randbytes if "--seed" in opts else os.urandom
+        blocks = iter_random_lines(n, count, pick, randbytes)
+        if "-o" not in opts:
+            self.stream_lines(line for block in blocks for line in block.splitlines())
+            return
+        written = self._write_blocks(blocks, opts["-o"])
+        if written is not None:
+            dst, dt = written
+            self.write(f"[random] {count:,} valeurs".replace(",", " ") + f" écrites dans {dst} en {dt:.2f} s")
+
+    def _rand_wrd(self, win):
+        word = _random.choice(word_pool())
+        self.write(word)
+        if win: win.destroy()
+
+    def _rand_nmbr(self, win):
+        n = _random.randint(0, 100)
+        self.write(str(n))
+        if win: win.destroy()
+
+    def _rand_dicton(self, win):
+        d = _random.choice(dictons())
+        self.write(d)
+        if win: win.destroy()
+
+    # words
+    def cmd_words(self, args):
+        sub = (args[0].lower() if args else "")
+        if sub == "build" and len(args) == 2:
+            if self._offload(["words", *args]) is not None:
+                return
+            src = (self.cwd / args[1]).resolve()
+            t0 = time.perf_counter()
+            try:
+                count = word_store_build(src)
+            except (OSError, ValueError) as e:
+                self.write(f"[erreur] {e}")
+                return
+            dt = time.perf_counter() - t0
+            self.write(f"[words] {count:,} mots installés depuis {src.name} en {dt:.2f} s".replace(",", " "))
+        elif sub == "info" and len(args) == 1:
+            pool = word_pool()
+            source = str(WORDS_PATH) if isinstance(pool, WordStore) else "pool intégré"
+            count = f"{len(pool):,}".replace(",", " ")
+            self.write(f"[words] {count} mots ({source}), {password_entropy(len(pool), 1):.1f} bits par mot")
+        elif sub == "reset" and len(args) == 1:
+            store = word_store()
+            if store is None:
+                self.write("[words] aucune liste installée (pool intégré).")
+                return
+            store.close()
+            _WORD_STORES.pop(WORDS_PATH, None)
+            try:
+                WORDS_PATH.unlink()
+            except OSError as e:
+                self.write(f"[erreur] {e}")
+                return
+            self.write("[words] liste supprimée : retour au pool intégré.")
+        else:
+            self.write("[usage] words build <fichier> | words info | words reset")
+
+    # password
+    def cmd_password(self, args):
+        flags = {"-n": int, "-l": int, "-w": int, "-o": str, "--sep": str,
+                 "--symbols": bool, "--no-upper": bool, "--no-lower": bool, "--no-digits": bool}
+        opts = {}
+        try:
+            opts, rest = self._parse_opts(args, flags)
+        except ValueError:
+            rest = ["?"]
+        count, length, n_words = opts.get("-n", 1), opts.get("-l", 16), opts.get("-w", 0)
+        if rest or count < 1 or not 4 <= length <= 1024 or not 0 <= n_words <= 64:
+            self.write("[usage] password [-n N] [-l 4..1024] [--symbols] [--no-upper] [--no-lower] [--no-digits] "
+                       "[-w mots [--sep -]] [-o fichier]")
+            return
+        if n_words:
+            words = word_pool()
+            blocks = iter_passphrases(count, n_words, words, opts.get("--sep", "-"))
+            choices, picks, policy = len(words), n_words, f"{n_words} mots parmi {len(words)}"
+        else:
+            alphabet = password_alphabet(
+                "--no-upper" not in opts, "--no-lower" not in opts, "--no-digits" not in opts, "--symbols" in opts)
+            blocks = (b.decode("ascii") for b in iter_passwords(count, length, alphabet))
+            choices, picks, policy = len(alphabet), length, f"{length} caractères parmi {len(alphabet)}"
+        report = f"[password] {policy} : {password_entropy(choices, picks):.1f} bits d’entropie chacun"
+        if "-o" not in opts:
+            if getattr(self._tls, "capture", None) is None:
+                self.write(report)
+            self.stream_lines(line for block in blocks for line in block.splitlines())
+            return
+        written = self._write_blocks(blocks, opts["-o"])
+        if written is None:
+            return
+        dst, dt = written
+        count, rate = (f"{n:,.0f}".replace(",", " ") for n in (count, count / dt * 60 if dt > 0 else 0))
+        self.write(report)
+        self.write(f"[password] {count} écrits dans {dst} en {dt:.2f} s ({rate}/min)")
+
+    def _write_blocks(self, blocks, name):
+        """Écrit des blocs de texte dans name (relatif au dossier courant) : (chemin, secondes), ou None après [erreur]."""
+        dst = (self.cwd / name).resolve()
+        t0 = time.perf_counter()
+        try:
+            with open(dst, "w", encoding="utf-8", newline="\n") as f:
+                for block in blocks:
+                    self.check_cancel()
+                    f.write(block)
+        except OSError as e:
+            self.write(f"[erreur] {e}")
+            return None
+        return dst, time.perf_counter() - t0
+
+    # audio
+    def cmd_audio(self, args):
+        # Sans dépendances externes, on ne peut pas interroger proprement les périphériques.
+        # Fallback : tenter des commandes système si disponibles, sinon message clair.
+        sub = (args[0].lower() if args else "")
+        if sub in ("list","liste"):
+            self._audio_list()
+            return
+        count_in, count_out = self._audio_counts_attempt()
+        if count_in is None and count_out is None:
+            self.write("Audio : non disponible sans dépendance externe.")
+        else:
+            self.write(f"Entrées audio détectées (approx) : {count_in}")
+            self.write(f"Sorties audio détectées (approx) : {count_out}")
+            self.write("(Détection via commandes système si présentes ; résultats non garantis.)")
+
+    def _audio_counts_attempt(self):
+        # Tentatives approximatives :
+        import subprocess
+        try:
+            if sys.platform == "darwin":
+                # macOS : system_profiler
+                out = subprocess.check_output(["system_profiler", "SPAudioDataType"], text=True, timeout=3)
+                ei = out.count("Input:")
+                eo = out.count("Output:")
+                return ei or 0, eo or 0
+            elif sys.platform.startswith("linux"):
+                # Linux : pactl (si présent)
+                try:
+                    src = subprocess.check_output(["pactl", "list", "short", "sources"], text=True, timeout=2)
+                    snk = subprocess.check_output(["pactl", "list", "short", "sinks"], text=True, timeout=2)
+                    ci = len([l for l in src.splitlines() if l.strip()])
+                    co = len([l for l in snk.splitlines() if l.strip()])
+                    return ci, co
+                except Exception:
+                    return None, None
+            elif sys.platform.startswith("win"):
+                # Windows : sans lib externe, pas d’API simple ; abandon propre
+                return None, None
+        except Exception:
+            pass
+        return None, None
+
+    def _audio_list(self):
+        import subprocess
+        if sys.platform == "darwin":
+            try:
+                out = subprocess.check_output(["system_profiler", "SPAudioDataType"], text=True, timeout=3)
+                self.write(out.strip() or "(vide)")
+                return
+            except Exception:
+                pass
+        if sys.platform.startswith("linux"):
+            try:
+                out1 = subprocess.check_output(["pactl", "list", "short", "sources"], text=True, timeout=3)
+                out2 = subprocess.check_output(["pactl", "list", "short", "sinks"], text=True, timeout=3)
+                self.write("=== Sources ==="); self.write(out1.strip() or "(vide)")
+                self.write("=== Sinks ==="); self.write(out2.strip() or "(vide)")
+                return
+            except Exception:
+                pass
+        self.write("audio list : non disponible sans dépendance externe.")
+
+    # time
+    def cmd_time(self, args):
+        now = time.strftime("%H:%M:%S")
+        self.write(now)
+
+    # cal / date
+    def cmd_cal(self, args):
+        import datetime, calendar
+        now = datetime.date.today()
+        cal = calendar.month(now.year, now.month)
+        self.write(cal.rstrip())
+
+    def cmd_date(self, args):
+        import datetime
+        d = datetime.date.today()
+        self.write(d.strftime("%d.%m.%Y"))
+
+    # options communes
+    def _parse_opts(self, args, flags):
+        """Options '-x valeur' / '-x' (flags : nom -> bool ou type), le reste à part (ValueError si mal formé)."""
+        opts, rest = {}, []
+        args = list(args)
+        while args:
+            a = args.pop(0)
+            if a in flags:
+                if flags[a] is bool:
+                    opts[a] = True
+                    continue
+                try:
+                    opts[a] = flags[a](args.pop(0))
+                except (IndexError, ValueError):
+                    raise ValueError(f"option {a} : valeur attendue") from None
+            else:
+                rest.append(a)
+        return opts, rest
+
+    # perft
+    def cmd_perft(self, args):
+        opts = {}
+        try:
+            opts, rest = self._parse_opts(args, {"-d": bool, "-j": int})
+        except ValueError:
+            rest = []
+        if not rest or not rest[0].isdigit():
+            self.write("[usage] perft <profondeur> [-d] [-j processus] [FEN]")
+            return
+        depth, divide = int(rest[0]), "-d" in opts
+        try:
+            pos = ChessPosition(" ".join(rest[1:]) if len(rest) > 1 else CHESS_START_FEN)
+        except ValueError as e:
+            self.write(f"[erreur] {e}")
+            return
+        t0 = time.perf_counter()
+        total = 0
+        moves = pos.legal_moves() if depth > 1 else []
+        if moves and opts.get("-j", 1) > 1:
+            total, per_move = chess_perft_parallel(pos.fen(), depth, opts["-j"])
+            if divide:
+                for m in moves:
+                    self.write(f"{chess_move_uci(m)}: {per_move[m]}")
+        elif moves:
+            # racine coup par coup : 'kill' peut interrompre entre deux coups
+            for m in moves:
+                self.check_cancel()
+                pos.make(m)
+                n = pos.perft(depth - 1)
+                pos.unmake()
+                total += n
+                if divide:
+                    self.write(f"{chess_move_uci(m)}: {n}")
+        else:
+            total = pos.perft(depth)
+        dt = time.perf_counter() - t0
+        nps = total / dt if dt > 0 else float("inf")
+        self.write(f"perft {depth} : {total:,} nœuds en {dt:.2f} s ({nps:,.0f} nœuds/s)".replace(",", " "))
+
+    # book
+    def cmd_book(self, args):
+        sub = (args[0].lower() if args else "")
+        if sub == "build":
+            if self._offload(["book", *args]) is not None:
+                return
+            opts = {}
+            try:
+                opts, rest = self._parse_opts(args[1:], {"-o": str, "-p": int})
+            except ValueError:
+                rest = []
+            if len(rest) != 1:
+                self.write("[usage] book build <fichier.pgn> [-o sortie] [-p demi‑coups]")
+                return
+            src = (self.cwd / rest[0]).resolve()
+            out = (self.cwd / opts["-o"]).resolve() if "-o" in opts else BOOK_PATH
+            t0 = time.perf_counter()
+            try:
+                with open(src, encoding="utf-8", errors="replace") as f:
+                    games, entries = OpeningBook.build(iter_pgn_games(f), out, opts.get("-p", BOOK_MAX_PLY),
+                                                       check=self.check_cancel)
+            except OSError as e:
+                self.write(f"[erreur] {e}")
+                return
+            dt = time.perf_counter() - t0
+            self.write(f"[book] {out} : {entries:,} entrées depuis {games:,} parties en {dt:.1f} s".replace(",", " "))
+        elif sub == "info":
+            book = opening_book()
+            if book is None:
+                self.write(f"[book] aucune bibliothèque ({BOOK_PATH}). Créez‑la avec : book build <fichier.pgn>")
+                return
+            self.write(f"[book] {book.path} : {book.count:,} entrées".replace(",", " "))
+        else:
+            book = opening_book()
+            if book is None:
+                self.write(f"[book] aucune bibliothèque ({BOOK_PATH}). Créez‑la avec : book build <fichier.pgn>")
+                return
+            try:
+                pos = ChessPosition(" ".join(args) if args else CHESS_START_FEN)
+            except ValueError as e:
+                self.write(f"[erreur] {e}")
+                return
+            found = book.moves(pos)
+            if not found:
+                self.write("[book] position inconnue.")
+                return
+            total = sum(w for _m, w in found)
+            for m, w in found:
+                self.write(f"{chess_move_uci(m):6} {w:8d}  {100 * w / total:5.1f} %")
+
+    # pgncheck
+    def cmd_pgncheck(self, args):
+        if self._offload(["pgncheck", *args]) is not None:
+            return
+        opts = {}
+        try:
+            opts, rest = self._parse_opts(args, {"-j": int, "-o": str})
+        except ValueError:
+            rest = []
+        if len(rest) != 1:
+            self.write("[usage] pgncheck <fichier.pgn> [-j processus] [-o parties_valides.pgn]")
+            return
+        src = (self.cwd / rest[0]).resolve()
+        dst = (self.cwd / opts["-o"]).resolve() if "-o" in opts else None
+        workers = opts.get("-j") or chess_workers()
+        games = plies = bad = 0
+        t0 = last = time.perf_counter()
+        out = None
+        try:
+            with open(src, encoding="utf-8", errors="replace") as f:
+                if dst is not None:
+                    out = open(dst, "w", encoding="utf-8")
+                self.write(f"[pgncheck] {src} : {workers} processus")
+                for n, p, errors, text in pgn_check(f, workers, dst is not None, self.check_cancel):
+                    games += n
+                    plies += p
+                    for number, msg in errors:
+                        bad += 1
+                        if bad <= PGNCHECK_MAX_ERRORS:
+                            self.write(f"[invalide] partie {number} : {msg}")
+                    if out is not None and text:
+                        out.write(text)
+                    now = time.perf_counter()
+                    if now - last >= PGNCHECK_PROGRESS_S:
+                        last = now
+                        self.write(f"[pgncheck] {games:,} parties ({games / (now - t0):,.0f}/s)…".replace(",", " "))
+        except OSError as e:
+            self.write(f"[erreur] {e}")
+            return
+        finally:
+            if out is not None:
+                out.close()
+        dt = time.perf_counter() - t0
+        rate = games / dt if dt > 0 else 0.0
+        if bad > PGNCHECK_MAX_ERRORS:
+            self.write(f"[pgncheck] … {bad - PGNCHECK_MAX_ERRORS} autres erreurs non affichées")
+        games, plies, rate = (f"{n:,.0f}".replace(",", " ") for n in (games, plies, rate))
+        self.write(f"[pgncheck] {games} parties, {plies} demi‑coups, {bad} invalides en {dt:.1f} s ({rate} parties/s)")
+        if dst is not None:
+            self.write(f"[pgncheck] parties valides écrites dans {dst}")
+
+    # tables de finales
+    def cmd_tb(self, args):
+        sub = (args[0].lower() if args else "")
+        if sub == "build":
+            if self._offload(["tb", *args]) is not None:
+                return
+            opts = {}
+            try:
+                opts, rest = self._parse_opts(args[1:], {"-j": int})
+            except ValueError:
+                rest = ["?"]
+            names = [n.upper() for n in rest] or list(TB_NAMES)
+            if any(n not in TB_NAMES for n in names):
+                self.write(f"[usage] tb build [{'|'.join(TB_NAMES)}...] [-j processus]")
+                return
+            for name in names:
+                t0 = time.perf_counter()
+                try:
+                    legal, won = tb_generate(name, workers=opts.get("-j"), check=self.check_cancel)
+                except OSError as e:
+                    self.write(f"[erreur] {e}")
+                    return
+                dt = time.perf_counter() - t0
+                legal, won = (f"{n:,}".replace(",", " ") for n in (legal, won))
+                self.write(f"[tb] {name} : {legal} positions (blancs au trait), {won} gagnantes, en {dt:.1f} s")
+        elif sub == "info":
+            for name in TB_NAMES:
+                path = TB_DIR / f"{name}.tb"
+                state = f"{path.stat().st_size:,} octets".replace(",", " ") if path.exists() else "absente"
+                self.write(f"[tb] {name} : {state} ({path})")
+        elif not args:
+            self.write("[usage] tb build [finales...] [-j processus] | tb info | tb <FEN>")
+        else:
+            try:
+                pos = ChessPosition(" ".join(args))
+            except ValueError as e:
+                self.write(f"[erreur] {e}")
+                return
+            r = tablebase_probe(pos)
+            if r is None:
+                self.write("[tb] position hors tables (KQK, KRK, KPK ; tb info).")
+                return
+            camp = "blancs" if pos.side == WHITE else "noirs"
+            if r[0] > 0:
+                text = f"les {camp} matent en {(r[1] + 1) // 2}"
+            elif r[0] < 0:
+                text = "échec et mat" if r[1] == 0 else f"les {camp} sont matés en {r[1] // 2}"
+            else:
+                text = "nulle"
+            m = tablebase_best_move(pos)
+            self.write(f"[tb] {text}" + (f" ; meilleur coup {chess_move_uci(m)}" if m else ""))
+
+    # analyse
+    def cmd_analyse(self, args):
+        try:
+            opts, rest = self._parse_opts(args, {"-t": float, "-j": int, "-p": int})
+            fen = " ".join(rest) if rest else CHESS_START_FEN
+            ChessPosition(fen)
+        except ValueError as e:
+            self.write(f"[erreur] {e}")
+            return
+        workers = opts.get("-j") or chess_workers()
+        self.write(f"[analyse] {workers} processus, {opts.get('-t', CHESS_ANALYSE_TIME_S):g} s")
+        self.stream_lines(self._analyse_lines(fen, opts, workers))
+
+    def _analyse_lines(self, fen, opts, workers):
+        stop = threading.Event()
+        job = self.current_job()
+        it = chess_analyse(fen, opts.get("-t", CHESS_ANALYSE_TIME_S), opts.get("-p", 64), workers,
+                           job.cancel if job is not None else stop)
+        try:
+            for depth, score, pv, nodes, nps in it:
+                yield (f"prof {depth:2d}  éval {chess_score_text(score):>9}  {nodes:>11,} nœuds  "
+                       f"{nps:>9,.0f} n/s  {' '.join(chess_move_uci(m) for m in pv)}").replace(",", " ")
+        finally:
+            stop.set()
+            it.close()
+
+    # run / set
+    def cmd_run(self, args):
+        keep_going = trace = False
+        while args and args[0].startswith("-") and len(args[0]) > 1:
+            flag = args.pop(0)
+            if flag == "-k":
+                keep_going = True
+            elif flag == "-x":
+                trace = True
+            else:
+                self.write(f"[usage] run [-k] [-x] <fichier> [args...] (option inconnue : {flag})")
+                return
+        if not args:
+            self.write("[usage] run [-k] [-x] <fichier> [args...]")
+            return
+        path = (self.cwd / args[0]).resolve()
+        if not path.is_file():
+            self.write(f"[erreur] script introuvable : {args[0]}")
+            return
+        if getattr(self._tls, "script_depth", 0) >= SCRIPT_MAX_DEPTH:
+            self.write(f"[erreur] trop de 'run' imbriqués (max {SCRIPT_MAX_DEPTH}).")
+            return
+        self._drive(self._script_iter(path, args, keep_going, trace), script=True)
+
+    def _script_iter(self, path, argv, keep_going=False, trace=False):
+        """
+        Lit le script ligne à ligne (sans le charger en entier) et exécute une
+        commande par pas ; rend le n° de ligne après chaque commande.
+        Lignes vides et '# ...' ignorées ; $1.., $0, $NOM, ${NOM}, $$ développés
+        au moment de l’exécution ; arrêt à la 1re erreur sauf avec -k.
+        """
+        argv = [str(path)] + list(argv[1:])
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for n, raw in enumerate(f, 1):
+                line = raw.strip()
+                if not line or line.startswith("#"):
+                    continue
+                self.check_cancel()
+                line = self._expand_vars(line, argv)
+                if trace:
+                    self.write("+ " + line)
+                # erreurs de ce thread seulement : pas celles d’une tâche de fond voisine
+                before = getattr(self._tls, "errors", 0)
+                if not self.run_line(line) or getattr(self._tls, "errors", 0) != before:
+                    if not keep_going:
+                        self.write(f"[erreur] {path.name}:{n} : échec de « {line} », arrêt du script.")
+                        return
+                if not self.running:
+                    return
+                yield n
+
+    def _expand_vars(self, line, argv=()):
+        def sub(m):
+            if m.group(3):
+                return "$"
+            name = m.group(1) or m.group(2)
+            if name.isdigit():
+                i = int(name)
+                return argv[i] if i < len(argv) else ""
+            if name in self.variables:
+                return self.variables[name]
+            return os.environ.get(name, m.group(0))
+        return _VAR_RE.sub(sub, line) if "$" in line else line
+
+    def cmd_set(self, args):
+        if not args:
+            for name, value in sorted(self.variables.items()):
+                self.write(f"{name}={value}")
+            return
+        name, sep, value = args[0].partition("=")
+        if not name.isidentifier():
+            self.write(f"[usage] set NOM valeur (nom invalide : {name})")
+            return
+        if not sep and len(args) == 1:
+            self.variables.pop(name, None)
+            return
+        self.variables[name] = " ".join(([value] if sep else []) + args[1:])
+
+    # exit
+    def cmd_exit(self, args):
+        self._shutdown_jobs()
+        self.running = False
+
+# ---- Application principale ----
+class TerminalApp(CommandEngine):
+    def __init__(self, profile=None):
+        # Profil de démarrage (--startup-profile) : [(phase, secondes), ...]
+        self._profile = [] if profile else None
+        self._profile_dest = profile
+        self._t_phase = time.perf_counter()
+        self._mark("import")
+        self.root = tk.Tk()
+        self.root.title(f"FreeOS {FREEOS_VERSION}")
+        self._mark("tk.Tk()")
+        # Thème
+        self.bg = DEFAULT_BG
+        self.fg = DEFAULT_FG
+        self.font = get_mono_font(self.root)
+        self.resources = TkResourceCache(self.root, self.font.actual("family"))
+        self.theme = ThemeRegistry(self.fg, self.bg)
+        self.ticks = TickScheduler(self.root)   # horloges, chronos, minuteurs
+        self.alarms = AlarmEngine(self.ticks, self.root.bell)
+        self._mark("police")
+
+        # Sortie console : file mémoire vidée une fois par frame (voir write/flush)
+        self._out_queue = deque()
+        self._flush_job = None
+        self._main_thread = threading.get_ident()
+        # Historique sur disque ; le widget n’affiche qu’une fenêtre de lignes
+        self.scrollback = ScrollbackStore()
+        self._view_start = 0   # index (dans l’historique) de la 1re ligne du widget
+        self._view_len = 0     # nb de lignes présentes dans le widget
+        self._edge_job = None
+        # Recherche (Ctrl‑F) : index alimenté par flush
+        self.search_index = ScrollbackIndex()
+        self._search_job = None
+        self._search_gen = None
+        self._search_matcher = None
+        self._search_matches = []
+        self._search_live = None
+        self._search_cur = -1
+        # Tâches de fond (pool : voir CommandEngine)
+        self._waiting = None  # tâches attendues par 'wait' (saisie bloquée)
+        self._wait_var = None # 'wait' dans un script : la boucle Tk tourne jusqu’à ce qu’elle change
+        self._streams = set()  # flux de lignes en cours sur le thread Tk
+        # Complétion Tab
+        self._dir_cache = DirListingCache()
+        self._last_tab = None
+
+        self._mark("état console")
+
+        # UI principale
+        self._build_ui()
+        self._mark("_build_ui")
+
+        # État
+        self.child_windows = set()  # Toplevel gérés
+        self.active_countdowns = set()  # minuteurs ouverts (Countdown)
+
+        # Moteur : état, tâches de fond et registre des commandes
+        CommandEngine.__init__(self)
+        self._mark("_register_commands")
+
+        # Affichage d’accueil
+        self._banner()
+        self._mark("_banner")
+        if self._profile is not None:
+            # 1re boucle d’attente = fenêtre affichée, prompt utilisable
+            self.root.after_idle(self._first_prompt)
+
+    # ---------- Profil de démarrage ----------
+    def _mark(self, phase):
+        if self._profile is None:
+            return
+        now = time.perf_counter()
+        if phase == "import":
+            self._profile.append((phase, now - _T_IMPORT))
+        else:
+            self._profile.append((phase, now - self._t_phase))
+        self._t_phase = now
+
+    def _first_prompt(self):
+        self.flush()
+        self.root.update_idletasks()
+        self._mark("1er prompt")
+        self._report_profile()
+
+    def _report_profile(self):
+        total = sum(dt for _, dt in self._profile)
+        if self._profile_dest == "-":
+            print(f"FreeOS {FREEOS_VERSION} — profil de démarrage", file=sys.stderr)
+            for phase, dt in self._profile:
+                print(f"  {phase:<20} {dt*1000:8.1f} ms", file=sys.stderr)
+            print(f"  {'total':<20} {total*1000:8.1f} ms", file=sys.stderr)
+        else:
+            # une ligne JSON par lancement : suivi d’une version à l’autre
+            import json
+            rec = {"version": FREEOS_VERSION, "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "python": sys.version.split()[0], "total_ms": round(total * 1000, 2),
+                   "phases_ms": {p: round(dt * 1000, 2) for p, dt in self._profile}}
+            with open(self._profile_dest, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self.write(f"[startup] 1er prompt en {total*1000:.1f} ms")
+
+    # ---------- UI construction ----------
+    def _build_ui(self):
+        self.root.configure(bg=self.bg)
+        # Zone console (Text + Scrollbar)
+        self.text = tk.Text(self.root, wrap="word", bg=self.bg, fg=self.fg,
+                            insertbackground=self.fg, font=self.font,
+                            undo=False, autoseparators=False, maxundo=-1, height=24)
+        self.text.pack(side="top", fill="both", expand=True)
+        self.text.config(state="disabled")
+        # Scrollbar : reflète tout l’historique, pas seulement la fenêtre chargée
+        self.scrollbar = tk.Scrollbar(self.root, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.text["yscrollcommand"] = self._on_text_yscroll
+        # Menu contextuel simple (copier tout/copie selection)
+        self._build_context_menu()
+
+        # Entrée de commande
+        frame = tk.Frame(self.root, bg=self.bg)
+        frame.pack(side="bottom", fill="x")
+        self.prompt = tk.Label(frame, text="> ", bg=self.bg, fg=self.fg, font=self.font)
+        self.prompt.pack(side="left")
+        self.entry = tk.Entry(frame, bg=self.bg, fg=self.fg, insertbackground=self.fg, font=self.font)
+        self.entry.pack(side="left", fill="x", expand=True)
+        self.entry.bind("<Return>", self.on_enter)
+        self.entry.bind("<Up>", self.on_history_up)
+        self.entry.bind("<Down>", self.on_history_down)
+        self.entry.bind("<Control-l>", lambda e: (self.clear(), "break"))
+        self.entry.bind("<Escape>", self._on_escape)
+        self.entry.bind("<Tab>", self.on_tab)
+        self.entry.focus_set()
+
+        # Barre de recherche (masquée tant qu’on n’appuie pas sur Ctrl‑F)
+        self._build_search_bar()
+        for w in (self.root, self.entry, self.text):
+            w.bind("<Control-f>", lambda e: (self.show_search(), "break")[1])
+
+        self.cmd_history = []
+        self.history_index = None
+
+        # Applique thème
+        self.themify(self.root)
+
+        # Relève périodique de la file de sortie (écritures venant de threads)
+        self.root.after(OUTPUT_POLL_MS, self._poll_output)
+
+    def _build_search_bar(self):
+        bar = tk.Frame(self.root, bg=self.bg)
+        tk.Label(bar, text="Rechercher :", bg=self.bg, fg=self.fg, font=self.font).pack(side="left")
+        self.search_var = tk.StringVar()
+        ent = tk.Entry(bar, textvariable=self.search_var, bg=self.bg, fg=self.fg,
+                       insertbackground=self.fg, font=self.font)
+        ent.pack(side="left", fill="x", expand=True)
+        self.search_regex = tk.BooleanVar(value=False)
+        tk.Checkbutton(bar, text="Regex", variable=self.search_regex, command=self._search_schedule,
+                       bg=self.bg, fg=self.fg, selectcolor=self.bg).pack(side="left", padx=4)
+        tk.Button(bar, text="▲", command=self.search_prev).pack(side="left")
+        tk.Button(bar, text="▼", command=self.search_next).pack(side="left")
+        self.search_status = tk.Label(bar, text="", bg=self.bg, fg=self.fg, font=self.font, width=16)
+        self.search_status.pack(side="left", padx=4)
+        tk.Button(bar, text="✕", command=self.hide_search).pack(side="left")
+        ent.bind("<Return>", lambda e: (self.search_next(), "break")[1])
+        ent.bind("<Shift-Return>", lambda e: (self.search_prev(), "break")[1])
+        ent.bind("<Escape>", lambda e: (self.hide_search(), "break")[1])
+        self.search_var.trace_add("write", lambda *a: self._search_schedule())
+        self.text.tag_configure("search", background="#665500")
+        self.text.tag_configure("search_cur", background="#ffbf00", foreground="#000000")
+        self.search_bar = bar
+        self.search_entry = ent
+
+    def _build_context_menu(self):
+        self.menu = tk.Menu(self.root, tearoff=0, bg=self.bg, fg=self.fg, activebackground="#003300", activeforeground=self.fg)
+        self.menu.add_command(label="Copier", command=self.copy_selection)
+        self.menu.add_command(label="Tout sélectionner", command=self.select_all)
+        self.text.bind("<Button-3>", self._show_context_menu)
+
+    def _show_context_menu(self, event):
+        try:
+            self.menu.tk_popup(event.x_root, event.y_root)
+        finally:
+            self.menu.grab_release()
+
+    def copy_selection(self):
+        try:
+            sel = self.text.selection_get()
+        except Exception:
+            sel = ""
+        if sel:
+            self.root.clipboard_clear()
+            self.root.clipboard_append(sel)
+
+    def select_all(self):
+        self.text.tag_add("sel", "1.0", "end-1c")
+
+    # ---------- Thème ----------
+    def themify(self, widget):
+        """Thème courant appliqué à un widget et ses enfants, inscrits au registre."""
+        self.theme.register_tree(widget)
+
+    def set_colors(self, fg=None, bg=None):
+        if fg: self.fg = fg
+        if bg: self.bg = bg
+        # une passe sur les widgets inscrits (toutes fenêtres comprises)
+        self.theme.apply(self.fg, self.bg)
+
+    # ---------- IO console ----------
+    def write(self, text=""):
+        """
+        Ajoute une ligne à la file de sortie. L’insertion réelle dans le widget
+        est groupée par frame (flush) : appelable depuis n’importe quel thread.
+        """
+        self.check_cancel()
+        if text.startswith(ERROR_PREFIXES):
+            self._count_error()
+        elif self._captured(text):
+            return
+        self._out_queue.append(text)
+        if self._flush_job is None and threading.get_ident() == self._main_thread:
+            self._flush_job = self.root.after(OUTPUT_FRAME_MS, self.flush)
+
+    def flush(self):
+        """Insère d’un seul coup tout ce qui est en attente (thread Tk uniquement)."""
+        if threading.get_ident() != self._main_thread:
+            return  # le poller du thread Tk s’en charge
+        if self._flush_job is not None:
+            try:
+                self.root.after_cancel(self._flush_job)
+            except tk.TclError:
+                pass
+            self._flush_job = None
+        queue = self._out_queue
+        if not queue:
+            return
+        chunk = []
+        pop = queue.popleft
+        try:
+            while True:
+                chunk.append(pop())
+        except IndexError:
+            pass
+        lines = "\n".join(chunk).split("\n")
+        at_tail = self._view_start + self._view_len >= self.scrollback.count
+        first_line = self.scrollback.count
+        self.scrollback.append(lines)
+        self.search_index.add(lines)
+        if self._search_matcher is not None:
+            self._search_check_new(first_line, lines)
+        if at_tail:
+            self._view_append(lines)
+        else:
+            # l’utilisateur lit l’historique : on ne le déplace pas
+            self._update_scrollbar()
+
+    def _view_append(self, lines):
+        txt = self.text
+        txt.config(state="normal")
+        if len(lines) >= SCROLLBACK_VIEW:
+            lines = lines[-SCROLLBACK_VIEW:]
+            txt.delete("1.0", "end")
+            self._view_start = self.scrollback.count - len(lines)
+            self._view_len = 0
+        txt.insert("end", "\n".join(lines) + "\n")
+        self._view_len += len(lines)
+        if self._view_len > SCROLLBACK_VIEW:
+            # on décharge par blocs pour ne pas retoucher le haut à chaque frame
+            excess = self._view_len - (SCROLLBACK_VIEW - SCROLLBACK_CHUNK)
+            txt.delete("1.0", f"{excess + 1}.0")
+            self._view_start += excess
+            self._view_len -= excess
+        txt.see("end")
+        txt.config(state="disabled")
+        if self._search_matcher is not None:
+            self._search_highlight()
+
+    def _load_window(self, start):
+        """Remplace le contenu du widget par les lignes à partir de start."""
+        count = self.scrollback.count
+        start = max(0, min(start, count - SCROLLBACK_VIEW))
+        lines = self.scrollback.get_lines(start, start + SCROLLBACK_VIEW)
+        txt = self.text
+        txt.config(state="normal")
+        txt.delete("1.0", "end")
+        if lines:
+            txt.insert("end", "\n".join(lines) + "\n")
+        txt.config(state="disabled")
+        self._view_start = start
+        self._view_len = len(lines)
+        if self._search_matcher is not None:
+            self._search_highlight()
+
+    def _scroll_to_end(self):
+        if self._view_start + self._view_len < self.scrollback.count:
+            self._load_window(self.scrollback.count)
+        self.text.see("end")
+
+    def _top_line(self):
+        return int(self.text.index("@0,0").split(".")[0])
+
+    def _load_before(self):
+        self._edge_job = None
+        n = min(SCROLLBACK_CHUNK, self._view_start)
+        if n <= 0:
+            return
+        top = self._top_line()
+        lines = self.scrollback.get_lines(self._view_start - n, self._view_start)
+        txt = self.text
+        txt.config(state="normal")
+        txt.insert("1.0", "\n".join(lines) + "\n")
+        self._view_start -= n
+        self._view_len += n
+        if self._view_len > SCROLLBACK_VIEW:
+            txt.delete(f"{SCROLLBACK_VIEW + 1}.0", "end-1c")
+            self._view_len = SCROLLBACK_VIEW
+        txt.config(state="disabled")
+        txt.yview(f"{top + n}.0")
+        if self._search_matcher is not None:
+            self._search_highlight()
+
+    def _load_after(self):
+        self._edge_job = None
+        view_end = self._view_start + self._view_len
+        n = min(SCROLLBACK_CHUNK, self.scrollback.count - view_end)
+        if n <= 0:
+            return
+        top = self._top_line()
+        lines = self.scrollback.get_lines(view_end, view_end + n)
+        txt = self.text
+        txt.config(state="normal")
+        txt.insert("end", "\n".join(lines) + "\n")
+        self._view_len += n
+        excess = self._view_len - SCROLLBACK_VIEW
+        if excess > 0:
+            txt.delete("1.0", f"{excess + 1}.0")
+            self._view_start += excess
+            self._view_len -= excess
+            top -= excess
+        txt.config(state="disabled")
+        txt.yview(f"{max(1, top)}.0")
+        if self._search_matcher is not None:
+            self._search_highlight()
+
+    def _on_text_yscroll(self, first, last):
+        first, last = float(first), float(last)
+        total = self.scrollback.count
+        if total and self._view_len:
+            n = self._view_len
+            self.scrollbar.set((self._view_start + first * n) / total,
+                               (self._view_start + last * n) / total)
+        else:
+            self.scrollbar.set(first, last)
+        # Aux bords de la fenêtre chargée : charger la suite depuis le disque
+        if self._edge_job is None:
+            if first <= 0.0 and self._view_start > 0:
+                self._edge_job = self.root.after_idle(self._load_before)
+            elif last >= 1.0 and self._view_start + self._view_len < total:
+                self._edge_job = self.root.after_idle(self._load_after)
+
+    def _update_scrollbar(self):
+        self._on_text_yscroll(*self.text.yview())
+
+    def _on_scrollbar(self, *args):
+        if args and args[0] == "moveto":
+            target = int(float(args[1]) * self.scrollback.count)
+            rel = target - self._view_start
+            if not 0 <= rel < self._view_len:
+                # saut lointain : on recharge une fenêtre centrée sur la cible
+                self._load_window(target - SCROLLBACK_VIEW // 2)
+                rel = target - self._view_start
+            self.text.yview_moveto(rel / max(1, self._view_len))
+        else:
+            self.text.yview(*args)
+
+    # ---------- Recherche (Ctrl‑F) ----------
+    def show_search(self):
+        if not self.search_bar.winfo_ismapped():
+            self.search_bar.pack(side="bottom", fill="x")
+        self.search_entry.focus_set()
+        self.search_entry.select_range(0, "end")
+        if self.search_var.get():
+            self._search_schedule()
+
+    def hide_search(self):
+        self._search_cancel()
+        self._search_matcher = None
+        self._search_matches = []
+        self._search_live = None
+        self.text.tag_remove("search", "1.0", "end")
+        self.text.tag_remove("search_cur", "1.0", "end")
+        self.search_bar.pack_forget()
+        self.entry.focus_set()
+
+    def _search_cancel(self):
+        if self._search_job is not None:
+            try:
+                self.root.after_cancel(self._search_job)
+            except tk.TclError:
+                pass
+            self._search_job = None
+        self._search_gen = None
+
+    def _search_schedule(self):
+        """Relance la recherche après une courte pause de frappe."""
+        self._search_cancel()
+        self._search_job = self.root.after(SEARCH_DEBOUNCE_MS, self._search_start)
+
+    def _search_start(self):
+        self._search_job = None
+        self.flush()
+        query = self.search_var.get()
+        regex = self.search_regex.get()
+        self._search_matches = []
+        self._search_cur = -1
+        self._search_matcher = None
+        self._search_live = None
+        self.text.tag_remove("search", "1.0", "end")
+        self.text.tag_remove("search_cur", "1.0", "end")
+        if not query:
+            self.search_status.config(text="")
+            return
+        try:
+            self._search_matcher = _line_matcher(query, regex)
+        except re.error:
+            self.search_status.config(text="regex invalide")
+            return
+        # les lignes écrites pendant la recherche sont vérifiées au fil de l’eau (_search_live) :
+        # le parcours des blocs s’arrête aux lignes présentes maintenant, sans doublon
+        self._search_live = []
+        self._search_gen = scrollback_search(self.scrollback, self.search_index, query, regex,
+                                             stop=self.scrollback.count)
+        self._search_step()
+
+    def _search_step(self):
+        """Une tranche de recherche, puis rend la main à la boucle Tk."""
+        self._search_job = None
+        gen = self._search_gen
+        if gen is None:
+            return
+        matches = self._search_matches
+        deadline = time.perf_counter() + SEARCH_SLICE_S
+        done = False
+        while time.perf_counter() < deadline:
+            try:
+                matches.extend(next(gen))
+            except StopIteration:
+                done = True
+                break
+            if len(matches) >= SEARCH_MAX_MATCHES:
+                del matches[SEARCH_MAX_MATCHES:]
+                done = True
+                break
+        self._search_highlight()
+        if not done:
+            self.search_status.config(text=f"{len(matches)}…")
+            self._search_job = self.root.after(1, self._search_step)
+            return
+        self._search_gen = None
+        matches.extend(self._search_live)
+        self._search_live = None
+        if matches:
+            # 1re correspondance visible, sinon la plus récente
+            k = bisect_left(matches, (self._view_start,))
+            self._search_goto(k if k < len(matches) else len(matches) - 1)
+        else:
+            self.search_status.config(text="0/0")
+
+    def _search_check_new(self, first_line, lines):
+        match_line = self._search_matcher
+        dest = self._search_live if self._search_live is not None else self._search_matches
+        for i, line in enumerate(lines):
+            for col, n in match_line(line):
+                dest.append((first_line + i, col, n))
+        if dest is self._search_matches:
+            cur = self._search_cur + 1 if self._search_cur >= 0 else 0
+            self.search_status.config(text=f"{cur}/{len(dest)}")
+
+    def _search_highlight(self):
+        txt = self.text
+        txt.tag_remove("search", "1.0", "end")
+        txt.tag_remove("search_cur", "1.0", "end")
+        lo = self._view_start
+        hi = lo + self._view_len
+        for matches in (self._search_matches, self._search_live or ()):
+            for line, col, n in matches[bisect_left(matches, (lo,)):]:
+                if line >= hi:
+                    break
+                idx = f"{line - lo + 1}.{col}"
+                txt.tag_add("search", idx, f"{idx}+{n}c")
+        if 0 <= self._search_cur < len(self._search_matches):
+            line, col, n = self._search_matches[self._search_cur]
+            if lo <= line < hi:
+                idx = f"{line - lo + 1}.{col}"
+                txt.tag_add("search_cur", idx, f"{idx}+{n}c")
+
+    def _search_goto(self, k):
+        matches = self._search_matches
+        if not matches:
+            return
+        self._search_cur = k % len(matches)
+        line = matches[self._search_cur][0]
+        if not self._view_start <= line < self._view_start + self._view_len:
+            self._load_window(line - SCROLLBACK_VIEW // 2)
+        self._search_highlight()
+        self.text.see(f"{line - self._view_start + 1}.0")
+        self.search_status.config(text=f"{self._search_cur + 1}/{len(matches)}")
+
+    def search_next(self):
+        if self._search_gen is None:
+            self._search_goto(self._search_cur + 1)
+
+    def search_prev(self):
+        if self._search_gen is None:
+            self._search_goto(self._search_cur - 1)
+
+    def _poll_output(self):
+        if self._out_queue and self._flush_job is None:
+            self.flush()
+        self.root.after(OUTPUT_POLL_MS, self._poll_output)
+
+    def clear(self):
+        self._out_queue.clear()
+        self.scrollback.clear()
+        self.search_index.clear()
+        self._view_start = self._view_len = 0
+        if self._search_matcher is not None:
+            self._search_schedule()
+        self.text.config(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.config(state="disabled")
+
+    # ---------- Bannière ----------
+    def _banner(self):
+        self.write("Welcome to FreeOS'  |  tapez 'help' pour l’aide")
+        self.write(f"Dossier courant: {self.cwd}")
+        self.write("")
+
+    # ---------- Historique ----------
+    def on_history_up(self, event):
+        if not self.cmd_history:
+            return "break"
+        if self.history_index is None:
+            self.history_index = len(self.cmd_history) - 1
+        else:
+            self.history_index = max(0, self.history_index - 1)
+        self.entry.delete(0, "end")
+        self.entry.insert(0, self.cmd_history[self.history_index])
+        return "break"
+
+    def on_history_down(self, event):
+        if self.history_index is None:
+            return "break"
+        self.history_index = min(len(self.cmd_history)-1, self.history_index + 1)
+        self.entry.delete(0, "end")
+        self.entry.insert(0, self.cmd_history[self.history_index])
+        if self.history_index == len(self.cmd_history)-1:
+            self.history_index = None
+        return "break"
+
+    # ---------- Complétion ----------
+    def on_tab(self, event):
+        text = self.entry.get()
+        cursor = self.entry.index("insert")
+        head, tail = text[:cursor], text[cursor:]
+        # début du mot courant (guillemet ouvrant non refermé = mot avec espaces)
+        if head.count('"') % 2:
+            start = head.rfind('"') + 1
+            quoted = True
+        else:
+            start = max(head.rfind(" "), head.rfind("\t")) + 1
+            quoted = False
+        token = head[start:]
+        first_word = not head[:start].strip()
+        if first_word and not quoted:
+            candidates = self._complete_command(token)
+            is_final = lambda c: True
+        else:
+            candidates = self._complete_path(token)
+            is_final = lambda c: not c.endswith(os.sep)
+        if not candidates:
+            self.root.bell()
+            return "break"
+        repeat = self._last_tab == text
+        self._last_tab = None
+        if len(candidates) == 1:
+            done = candidates[0]
+            if (" " in done) and not quoted:
+                done = '"' + done
+                quoted = True
+            if is_final(done):
+                done += ('" ' if quoted else " ")
+        else:
+            done = os.path.commonprefix(candidates)
+            if len(done) <= len(token):
+                done = token
+                if repeat:
+                    self._show_candidates(candidates)
+                else:
+                    self._last_tab = text
+                    self.root.bell()
+        new_head = head[:start] + done
+        self.entry.delete(0, "end")
+        self.entry.insert(0, new_head + tail)
+        self.entry.icursor(len(new_head))
+        return "break"
+
+    def _complete_command(self, token):
+        tok = token.lower()
+        names = set()
+        for name, spec in self.commands.items():
+            for n in [name] + list(spec.aliases):
+                if " " not in n and n.lower().startswith(tok):
+                    names.add(n.lower())
+        return sorted(names)
+
+    def _complete_path(self, token):
+        dirpart, base = os.path.split(token)
+        if dirpart:
+            d = Path(os.path.expanduser(dirpart))
+            folder = d if d.is_absolute() else self.cwd / d
+        else:
+            folder = self.cwd
+        entries = self._dir_cache.list(folder)
+        show_hidden = base.startswith(".")
+        def pick(match):
+            return [(n, is_dir) for n, is_dir in entries
+                    if match(n) and (show_hidden or not n.startswith("."))]
+        found = pick(lambda n: n.startswith(base))
+        if not found:
+            low = base.lower()
+            found = pick(lambda n: n.lower().startswith(low))
+        prefix = dirpart + os.sep if dirpart and not dirpart.endswith(("/", os.sep)) else dirpart
+        return [prefix + n + (os.sep if is_dir else "") for n, is_dir in found]
+
+    def _show_candidates(self, candidates):
+        shown = [os.path.basename(c.rstrip(os.sep)) + (os.sep if c.endswith(os.sep) else "")
+                 for c in candidates[:COMPLETE_MAX_SHOWN]]
+        line = "  ".join(shown)
+        if len(candidates) > COMPLETE_MAX_SHOWN:
+            line += f"  … (+{len(candidates) - COMPLETE_MAX_SHOWN})"
+        self._scroll_to_end()
+        self.write(line)
+
+    # ---------- Saisie/Parsing ----------
+    def on_enter(self, event):
+        line = self.entry.get().strip()
+        self.entry.delete(0, "end")
+        if not line and self.pending_selector is None:
+            return
+        self._scroll_to_end()
+        self.write("> " + line)
+        if line:
+            self.cmd_history.append(line)
+        self.history_index = None
+        self.run_line(line)
+
+    def _wait_jobs(self, jobs):
+        if threading.get_ident() != self._main_thread:
+            # 'wait' dans une tâche de fond : bloquer ce thread ne gêne personne
+            return super()._wait_jobs(jobs)
+        # On n’occupe pas le thread Tk : la saisie est bloquée et on sonde.
+        self._waiting = jobs
+        self.entry.config(state="disabled")
+        ids = " ".join(str(j.id) for j in jobs)
+        self.write(f"[jobs] attente de {ids} (Échap pour ne plus attendre)")
+        self.root.after(JOBS_WAIT_POLL_MS, self._poll_wait)
+        if getattr(self._tls, "script_depth", 0):
+            # 'wait' dans un script : la suite du script dépend de ces tâches ;
+            # wait_variable fait tourner la boucle Tk (affichage, Échap) en attendant
+            self._wait_var = tk.BooleanVar(master=self.root, value=False)
+            # les rappels Tk traités entre‑temps ne font pas partie du script
+            depth, self._tls.script_depth = self._tls.script_depth, 0
+            errors = getattr(self._tls, "errors", 0)
+            try:
+                self.root.wait_variable(self._wait_var)
+            except tk.TclError:  # fenêtre fermée pendant l’attente
+                pass
+            finally:
+                self._wait_var = None
+                self._tls.script_depth, self._tls.errors = depth, errors
+
+    def _poll_wait(self):
+        if self._waiting is None:
+            return
+        if all(j.future.done() for j in self._waiting):
+            self._end_wait()
+            return
+        self.root.after(JOBS_WAIT_POLL_MS, self._poll_wait)
+
+    def _end_wait(self):
+        self._waiting = None
+        self.entry.config(state="normal")
+        self.entry.focus_set()
+        if self._wait_var is not None:
+            self._wait_var.set(True)
+
+    def _on_escape(self, event=None):
+        """Échap : interrompt une attente 'wait' et les flux en cours."""
+        handled = False
+        if self._waiting is not None:
+            self._end_wait()
+            self.write("[jobs] attente interrompue.")
+            handled = True
+        if self._streams:
+            for st in list(self._streams):
+                self._stream_stop(st)
+            self.write("[interrompu]")
+            handled = True
+        if handled:
+            return "break"
+
+    # ---------- Flux de lignes ----------
+    def stream_lines(self, lines, page=None):
+        """
+        Écrit un flux de lignes au fur et à mesure qu’il est produit.
+        Sur le thread Tk, la production est découpée en tranches (after) pour
+        que l’affichage suive ; page=N fait une pause toutes les N lignes.
+        Dans une tâche de fond, on écrit simplement (write est thread‑safe).
+        """
+        if (threading.get_ident() != self._main_thread or getattr(self._tls, "script_depth", 0)
+                or getattr(self._tls, "capture", None) is not None):
+            # tâche de fond, script ou pipe : la suite attend (ou consomme) le flux
+            return super().stream_lines(lines)
+        it = iter(lines)
+        st = LineStream(it, page)
+        self._streams.add(st)
+        self._stream_step(st)
+
+    def _stream_step(self, st):
+        st.job = None
+        if st not in self._streams:
+            return
+        deadline = time.perf_counter() + STREAM_SLICE_S
+        page = st.page
+        n = 0
+        for line in st.it:
+            self.write(line)
+            n += 1
+            if page and n >= page:
+                self.write("-- suite : Entrée, q pour arrêter --")
+                st.selector = lambda ans: (self._stream_stop(st)
+                                              if ans.strip().lower().startswith("q")
+                                              else self._stream_step(st))
+                self.pending_selector = st.selector
+                return
+            if time.perf_counter() >= deadline:
+                st.job = self.root.after(1, self._stream_step, st)
+                return
+        self._streams.discard(st)
+
+    def _stream_stop(self, st):
+        self._streams.discard(st)
+        if st.selector is not None and self.pending_selector is st.selector:
+            self.pending_selector = None
+        if st.job is not None:
+            try:
+                self.root.after_cancel(st.job)
+            except tk.TclError:
+                pass
+        close = getattr(st.it, "close", None)
+        if close is not None:
+            close()
+
+    # ---------- Scripts / pipes ----------
+    def _drive(self, it, script=False):
+        """
+        Sur le thread Tk, l’itérateur avance par tranches (after) : la sortie est
+        insérée une fois par frame et Échap l’interrompt comme un flux.
+        """
+        if (threading.get_ident() != self._main_thread or getattr(self._tls, "script_depth", 0)
+                or getattr(self._tls, "capture", None) is not None):
+            return super()._drive(it, script)
+        st = LineStream(it)
+        self._streams.add(st)
+        self._drive_step(st, script)
+
+    def _drive_step(self, st, script):
+        st.job = None
+        if st not in self._streams:
             return
-        # multiples → proposer sélection dans la console
-        self.write("Plusieurs correspondances :")
-        for i, p in enumerate(matches, 1):
-            self.write(f"  {i:>2}: {p.name}")
-        self.write("Choisissez un numéro puis appuyez Entrée.")
-        def selection_handler(line):
+        deadline = time.perf_counter() + SCRIPT_SLICE_S
+        self._tls.script_depth = int(script)
+        try:
+            for _ in st.it:
+                if st not in self._streams:
+                    return  # arrêté (Échap/exit) par une commande du script
+                if time.perf_counter() >= deadline:
+                    st.job = self.root.after(1, self._drive_step, st, script)
+                    return
+            self._streams.discard(st)
+        except Exception as e:  # lecture/écriture de fichier
+            self._streams.discard(st)
+            self.write(f"[erreur] {e!s}")
+        finally:
+            self._tls.script_depth = 0
+
+    def _page_lines(self):
+        """Nombre de lignes visibles dans la console (taille d’une page)."""
+        try:
+            return max(5, self.text.winfo_height() // max(1, self.font.metrics("linespace")) - 1)
+        except Exception:
+            return 24
+
+    # ---------- Gestion fenêtres ----------
+    def register_window(self, win: tk.Toplevel):
+        self.child_windows.add(win)
+
+    def unregister_window(self, win: tk.Toplevel):
+        if win in self.child_windows:
+            self.child_windows.remove(win)
+
+    def close_all_windows(self):
+        for w in list(self.child_windows):
             try:
-                k = int(line.strip())
-                if 1 <= k <= len(matches):
-                    open_system_path(matches[k-1])
-                    self.write(f"[ouvert] {matches[k-1].name}")
-                else:
-                    self.write("[info] sélection annulée.")
+                w.destroy()
             except Exception:
-                self.write("[info] sélection annulée.")
-        self.pending_selector = selection_handler
+                pass
+        self.child_windows.clear()
 
-    # msg
-    def cmd_msg(self, args):
-        self.write(" ".join(args))
+    # ---------- Commandes ----------
+    def _register_commands(self):
+        super()._register_commands()
+        self._add_cmd("cln", self.cmd_clear, desc="Nettoyer l’affichage du terminal.", aliases=["cls"], gui=True)
 
-    # i
-    def cmd_i(self, args):
-        url = "https://ffm.bio/myrce/"
-        self.write(f"[ouvrir] {url}")
+
+        # outils graphiques
+        self._add_cmd("count", self.cmd_count, desc="Compteur cliquable (+/−).", gui=True)
+        self._add_cmd("calc", self.cmd_calc, desc="Calculatrice (0–9, + − × ÷, ., =, C).", gui=True)
+        self._add_cmd("color", self.cmd_color, desc="Changer la couleur texte/fond (fenêtre).", gui=True)
+
+        # jeux
+        self._add_cmd("game", self.cmd_game, desc="Menu jeux (devine nombre, memory, pendu, morpion, échecs).", gui=True)
+
+        # temps / date / calendriers
+        # pas gui : « time » seul s’utilise dans un pipe, un script ou en tâche de fond
+        self._add_cmd("time", self.cmd_time, desc="Affiche HH:MM:SS ou 'time x' pour horloge (fenêtre).")
+        self._add_cmd("timer", self.cmd_timer, desc="Chronomètre (fenêtre).", gui=True)
+        self._add_cmd("minuteur", self.cmd_minuteur, desc="Compte à rebours (bips à 0, répétés jusqu’à 'Stop m').", gui=True)
+        self._add_cmd("Stop", self.cmd_stop, desc="Stop m : arrête le minuteur. Syntaxe: 'Stop m'.", gui=True)
+        self._add_cmd("stop", self.cmd_stop, desc="Alias de 'Stop m'.", gui=True)
+        self._add_cmd("stop all", self.cmd_stop_all, desc="Arrêter/fermer toutes les sous‑fenêtres & timers.", gui=True)
+
+        # audio rec
+        self._add_cmd("rec", self.cmd_rec, desc="Dictaphone (désactivé sans lib externe ; explication en fenêtre).", gui=True)
+
+        # sorties / arrêt
+        self._add_cmd("exitapp", self.cmd_exitapp, desc="Fermer toutes les sous‑fenêtres/outils (terminal reste ouvert).", gui=True)
+        self._add_cmd("exit", self.cmd_exit, desc="Fermer l’application terminal.", gui=True)
+        self._add_cmd("shutup", self.cmd_shutup, desc="Affiche 'ok', attend 1s, stop all + ferme.", gui=True)
+
+        # mesures
+        self._add_cmd("bench", self.cmd_bench, desc="Mesures de performance. Ex: bench write [n], bench perft [profondeur]", gui=True)
+
+    # ---------- Implémentations ----------
+    # help
+    def _console_columns(self):
+        # Mise en forme selon largeur de la Text
+        # Estimation largeur en caractères
+        # On mesure 80 colonnes par défaut, sinon via font measure
         try:
-            webbrowser.open(url)
+            px_width = self.text.winfo_width()
+            char_w = self.font.measure("M") or 8
+            return max(60, int(px_width / max(1, char_w)))
         except Exception:
-            pass
+            return 80
+
+    def cmd_clear(self, args):
+        self.clear()
+
+    def _offload(self, argv):
+        """
+        Tâche de fond seulement quand la commande est tapée à l’invite : dans
+        un pipe, un script ou une tâche, la suite attend son résultat.
+        """
+        if (self.current_job() is not None or threading.get_ident() != self._main_thread
+                or getattr(self._tls, "capture", None) is not None or getattr(self._tls, "script_depth", 0)):
+            return None
+        import shlex
+        return self.start_job(shlex.join(argv))
+
+    # analyse : plusieurs secondes de calcul, jamais sur le thread Tk
+    def cmd_analyse(self, args):
+        if self._offload(["analyse", *args]) is None:
+            super().cmd_analyse(args)
 
     # random
     def cmd_random(self, args):
-        if not args:
+        if not args and self.current_job() is None:
             # Ouvre une petite fenêtre avec 3 options
             win = ThemedToplevel(self, title="Random")
             lab = tk.Label(win, text="Choisissez :", bg=self.bg, fg=self.fg, font=self.font)
@@ -680,40 +5425,13 @@ class TerminalApp:
             tk.Button(btns, text="Dicton", command=lambda: self._rand_dicton(win)).pack(side="left", padx=6)
             self.themify(win)
             return
-        # Sous-commandes
-        sub = (args[0] or "").lower()
-        if sub in ("wrd", "word", "mot"):
-            self._rand_wrd(None)
-        elif sub in ("nmbr", "nombre", "num", "number"):
-            mn, mx = 0, 100
-            if len(args) >= 3:
-                try:
-                    mn, mx = int(args[1]), int(args[2])
-                except Exception:
-                    pass
-            self.write(str(_random.randint(mn, mx)))
-        elif sub in ("dicton", "prov", "proverbe"):
-            self._rand_dicton(None)
-        else:
-            self.write("[usage] random [wrd|nmbr [min max]|dicton]")
-
-    def _rand_wrd(self, win):
-        word = _random.choice(RANDOM_WORDS)
-        self.write(word)
-        if win: win.destroy()
-
-    def _rand_nmbr(self, win):
-        n = _random.randint(0, 100)
-        self.write(str(n))
-        if win: win.destroy()
-
-    def _rand_dicton(self, win):
-        d = _random.choice(DICTONS)
-        self.write(d)
-        if win: win.destroy()
+        super().cmd_random(args)
 
     # password
     def cmd_password(self, args):
+        if args or self.current_job() is not None:
+            super().cmd_password(args)
+            return
         win = ThemedToplevel(self, title="Générateur de mots de passe")
         fr = tk.Frame(win, bg=self.bg); fr.pack(padx=10, pady=10)
 
@@ -740,24 +5458,22 @@ class TerminalApp:
         out = tk.Entry(fr, bg=self.bg, fg=self.fg, insertbackground=self.fg, width=50)
         out.grid(row=7, column=0, columnspan=2, pady=8, sticky="we")
 
+        entropy = tk.StringVar(value="")
+        tk.Label(fr, textvariable=entropy, bg=self.bg, fg=self.fg).grid(row=9, column=0, columnspan=2)
+
         def gen():
             if var_passphrase.get():
                 k = max(2, min(6, int(var_words.get() or 4)))
-                words = [_random.choice(RANDOM_WORDS) for _ in range(k)]
-                pwd = "-".join(words)
+                pool = word_pool()
+                pwd = "-".join(pool[i] for i in random_below(len(pool), k))
+                bits = password_entropy(len(pool), k)
             else:
-                import string
-                pools = ""
-                if var_uc.get(): pools += string.ascii_uppercase
-                if var_lc.get(): pools += string.ascii_lowercase
-                if var_dg.get(): pools += string.digits
-                if var_sy.get(): pools += "!@#$%^&*()-_=+[]{};:,.?/"
-                if not pools:
-                    pools = "abcdefghijklmnopqrstuvwxyz0123456789"
+                pools = password_alphabet(var_uc.get(), var_lc.get(), var_dg.get(), var_sy.get())
                 L = max(4, min(256, int(var_len.get() or 16)))
-                rnd = _random.SystemRandom()
-                pwd = "".join(rnd.choice(pools) for _ in range(L))
+                pwd = random_symbols(pools, L).decode("ascii")
+                bits = password_entropy(len(pools), L)
             out.delete(0, "end"); out.insert(0, pwd)
+            entropy.set(f"Entropie : {bits:.1f} bits")
 
         def copy():
             val = out.get()
@@ -778,7 +5494,7 @@ class TerminalApp:
     def cmd_count(self, args):
         win = ThemedToplevel(self, title="Compteur")
         val = tk.IntVar(value=0)
-        lab = tk.Label(win, textvariable=val, bg=self.bg, fg=self.fg, font=tkfont.Font(win, size=36, family=self.font.actual("family")))
+        lab = tk.Label(win, textvariable=val, bg=self.bg, fg=self.fg, font=win.font(36))
         lab.pack(padx=10, pady=10)
         fr = tk.Frame(win, bg=self.bg); fr.pack(pady=6)
         tk.Button(fr, text=" + ", command=lambda: val.set(val.get()+1)).pack(side="left", padx=6)
@@ -856,82 +5572,17 @@ class TerminalApp:
         def apply():
             fg = efg.get().strip() or self.fg
             bg = ebg.get().strip() or self.bg
+            try:
+                fg, bg = self.resources.rgb(fg), self.resources.rgb(bg)
+            except tk.TclError as e:
+                messagebox.showerror("Couleurs", str(e), parent=win)
+                return
             self.set_colors(fg, bg)
-            # Appliquer aux fenêtres ouvertes
-            for w in list(self.child_windows):
-                try:
-                    if hasattr(w, "apply_theme"):
-                        w.apply_theme()
-                    else:
-                        self.themify(w)
-                except Exception:
-                    pass
 
         tk.Button(win, text="Appliquer", command=apply).grid(row=4, column=0, columnspan=2, pady=8)
         win.grid_columnconfigure(1, weight=1)
         self.themify(win)
 
-    # audio
-    def cmd_audio(self, args):
-        # Sans dépendances externes, on ne peut pas interroger proprement les périphériques.
-        # Fallback : tenter des commandes système si disponibles, sinon message clair.
-        sub = (args[0].lower() if args else "")
-        if sub in ("list","liste"):
-            self._audio_list()
-            return
-        count_in, count_out = self._audio_counts_attempt()
-        if count_in is None and count_out is None:
-            self.write("Audio : non disponible sans dépendance externe.")
-        else:
-            self.write(f"Entrées audio détectées (approx) : {count_in}")
-            self.write(f"Sorties audio détectées (approx) : {count_out}")
-            self.write("(Détection via commandes système si présentes ; résultats non garantis.)")
-
-    def _audio_counts_attempt(self):
-        # Tentatives approximatives :
-        try:
-            if sys.platform == "darwin":
-                # macOS : system_profiler
-                out = subprocess.check_output(["system_profiler", "SPAudioDataType"], text=True, timeout=3)
-                ei = out.count("Input:")
-                eo = out.count("Output:")
-                return ei or 0, eo or 0
-            elif sys.platform.startswith("linux"):
-                # Linux : pactl (si présent)
-                try:
-                    src = subprocess.check_output(["pactl", "list", "short", "sources"], text=True, timeout=2)
-                    snk = subprocess.check_output(["pactl", "list", "short", "sinks"], text=True, timeout=2)
-                    ci = len([l for l in src.splitlines() if l.strip()])
-                    co = len([l for l in snk.splitlines() if l.strip()])
-                    return ci, co
-                except Exception:
-                    return None, None
-            elif sys.platform.startswith("win"):
-                # Windows : sans lib externe, pas d’API simple ; abandon propre
-                return None, None
-        except Exception:
-            pass
-        return None, None
-
-    def _audio_list(self):
-        if sys.platform == "darwin":
-            try:
-                out = subprocess.check_output(["system_profiler", "SPAudioDataType"], text=True, timeout=3)
-                self.write(out.strip() or "(vide)")
-                return
-            except Exception:
-                pass
-        if sys.platform.startswith("linux"):
-            try:
-                out1 = subprocess.check_output(["pactl", "list", "short", "sources"], text=True, timeout=3)
-                out2 = subprocess.check_output(["pactl", "list", "short", "sinks"], text=True, timeout=3)
-                self.write("=== Sources ==="); self.write(out1.strip() or "(vide)")
-                self.write("=== Sinks ==="); self.write(out2.strip() or "(vide)")
-                return
-            except Exception:
-                pass
-        self.write("audio list : non disponible sans dépendance externe.")
-
     # game
     def cmd_game(self, args):
         win = ThemedToplevel(self, title="Jeux")
@@ -943,6 +5594,8 @@ class TerminalApp:
         tk.Button(fr, text="Morpion ASCII (2 joueurs)", command=lambda: self._game_morpion()).pack(fill="x", pady=3)
         tk.Button(fr, text="Échecs (texte)", command=lambda: self._game_chess_text()).pack(fill="x", pady=3)
         tk.Button(fr, text="Échecs (fenêtre)", command=lambda: self._game_chess_gui()).pack(fill="x", pady=3)
+        tk.Button(fr, text="Échecs contre l’ordinateur (texte)", command=lambda: self._game_chess_text(vs_ai=True)).pack(fill="x", pady=3)
+        tk.Button(fr, text="Échecs contre l’ordinateur (fenêtre)", command=lambda: self._game_chess_gui(vs_ai=True)).pack(fill="x", pady=3)
         self.themify(win)
 
     # -- Devine un nombre
@@ -1011,7 +5664,7 @@ class TerminalApp:
     # -- Pendu
     def _game_pendu(self):
         win = ThemedToplevel(self, title="Pendu")
-        word = _random.choice(RANDOM_WORDS).lower()
+        word = _random.choice(word_pool()).lower()
         hidden = ["_" if ch.isalpha() else ch for ch in word]
         tries = 8
         tried = set()
@@ -1109,109 +5762,235 @@ class TerminalApp:
         self.themify(win)
 
     # -- Échecs (texte) : validation basique + affichage ASCII
-    def _game_chess_text(self):
-        win = ThemedToplevel(self, title="Échecs (texte)")
-        # Représentation simple
-        board = self._chess_start_board()
-        turn = ["w"]
-        info = tk.StringVar(value="Entrez les coups (ex: e2 e4). Pas de roque/en passant/promo.")
-        lab = tk.Label(win, text=self._chess_board_ascii(board), bg=self.bg, fg=self.fg, font=self.font, justify="left")
+    def _game_chess_text(self, vs_ai=False):
+        win = ThemedToplevel(self, title="Échecs (texte)" + (" contre l’ordinateur" if vs_ai else ""))
+        pos = self._chess_start_board()
+        searcher = ChessSearch() if vs_ai else None
+        thinking = [False]
+        info = tk.StringVar(value="Entrez les coups (ex: e2 e4, promotion : e7 e8 q).")
+        ai_info = tk.StringVar(value="")
+        lab = tk.Label(win, text=pos.ascii(), bg=self.bg, fg=self.fg, font=self.font, justify="left")
         lab.pack(padx=10, pady=10)
         tk.Label(win, textvariable=info, bg=self.bg, fg=self.fg).pack()
+        if vs_ai:
+            tk.Label(win, textvariable=ai_info, bg=self.bg, fg=self.fg).pack()
         e = tk.Entry(win, bg=self.bg, fg=self.fg, insertbackground=self.fg); e.pack(padx=10, pady=6)
         e.focus_set()
 
+        def ai_done(m):
+            thinking[0] = False
+            if m is not None:
+                pos.make(m)
+                info.set(f"Ordinateur : {chess_move_uci(m)}. " + self._chess_status_text(pos))
+            lab.config(text=pos.ascii())
+
         def play(_=None):
-            mv = e.get().strip().lower(); e.delete(0,"end")
-            parts = mv.split()
-            if len(parts)!=2 or not all(len(p)==2 for p in parts):
-                info.set("Format: e2 e4")
-                return
-            src, dst = parts
-            ok, msg = self._chess_try_move(board, turn[0], src, dst)
-            if not ok:
-                info.set(msg)
+            if thinking[0]:
                 return
-            lab.config(text=self._chess_board_ascii(board))
-            turn[0] = "b" if turn[0]=="w" else "w"
-            info.set(f"Au tour de {'blancs' if turn[0]=='w' else 'noirs'}.")
+            mv = e.get().strip(); e.delete(0,"end")
+            ok, msg = self._chess_try_move(pos, mv)
+            info.set(msg)
+            if ok:
+                lab.config(text=pos.ascii())
+                if vs_ai and pos.status() is None:
+                    thinking[0] = True
+                    self._chess_ai_move(win, pos, searcher, ai_info.set, ai_done)
+
+        def loaded(msg):
+            info.set(msg)
+            lab.config(text=pos.ascii())
+            if vs_ai and pos.side == BLACK and pos.status() is None:
+                thinking[0] = True
+                self._chess_ai_move(win, pos, searcher, ai_info.set, ai_done)
 
         e.bind("<Return>", play)
         tk.Button(win, text="Jouer", command=play).pack(pady=6)
+        self._chess_file_buttons(win, pos, vs_ai, loaded, lambda: thinking[0])
         self.themify(win)
 
     # -- Échecs (fenêtre) : graphique minimal
-    def _game_chess_gui(self):
-        win = ThemedToplevel(self, title="Échecs (fenêtre)")
-        size = 56
+    def _game_chess_gui(self, vs_ai=False):
+        win = ThemedToplevel(self, title="Échecs (fenêtre)" + (" contre l’ordinateur" if vs_ai else ""))
+        size = CHESS_SQUARE_PX
         canvas = tk.Canvas(win, width=size*8, height=size*8, highlightthickness=0, bg=self.bg)
         canvas.pack(padx=10, pady=10)
-        board = self._chess_start_board()
-        turn = ["w"]
+        board = ChessBoardView(canvas, win.font(28),
+                               self.fg, self._chess_piece_symbol, size)
+        animate = tk.BooleanVar(value=True)
+        info = tk.StringVar(value="Au tour des blancs.")
+        tk.Label(win, textvariable=info, bg=self.bg, fg=self.fg).pack(pady=(0, 8))
+        ai_info = tk.StringVar(value="")
+        if vs_ai:
+            tk.Label(win, textvariable=ai_info, bg=self.bg, fg=self.fg).pack(pady=(0, 8))
+        ana_info = tk.StringVar(value="")
+        tk.Label(win, textvariable=ana_info, bg=self.bg, fg=self.fg, font=self.font).pack(pady=(0, 4))
+        pos = self._chess_start_board()
+        searcher = ChessSearch() if vs_ai else None
+        thinking = [False]
         selected = [None]
-
-        def draw():
-            canvas.delete("all")
-            for r in range(8):
-                for c in range(8):
-                    x0, y0 = c*size, r*size
-                    color = "#111111" if (r+c)%2==0 else "#222222"
-                    canvas.create_rectangle(x0, y0, x0+size, y0+size, fill=color, outline="#333333")
-                    piece = board[r][c]
-                    if piece != ".":
-                        canvas.create_text(x0+size/2, y0+size/2, text=self._chess_piece_symbol(piece),
-                                           fill=self.fg, font=tkfont.Font(win, size=28, family=self.font.actual("family")))
-            if selected[0]:
-                r,c = selected[0]
-                canvas.create_rectangle(c*size+2, r*size+2, c*size+size-2, r*size+size-2, outline="#00aa00", width=2)
+        analysis = [None]  # Event d’arrêt de l’analyse en cours
+
+        def stop_analysis():
+            if analysis[0] is not None:
+                analysis[0].set()
+                analysis[0] = None
+
+        def toggle_analysis():
+            if analysis[0] is not None:
+                stop_analysis()
+                ana_info.set("Analyse arrêtée.")
+            elif pos.status() is None:
+                analysis[0] = self._chess_analyse_start(win, pos.fen(), ana_info.set)
+
+        opts = tk.Frame(win, bg=self.bg)
+        opts.pack(pady=(0, 8))
+        tk.Button(opts, text="Analyser (multi‑cœurs)", command=toggle_analysis).pack(side="left", padx=4)
+        tk.Checkbutton(opts, text="Animation", variable=animate, bg=self.bg, fg=self.fg,
+                       selectcolor=self.bg, activebackground=self.bg).pack(side="left", padx=4)
+
+        def ai_done(m):
+            thinking[0] = False
+            if m is not None:
+                pos.make(m)
+                info.set(f"Ordinateur : {chess_move_uci(m)}. " + self._chess_status_text(pos))
+                board.show_move(pos, m, animate.get())
 
         def on_click(event):
-            c = event.x // size; r = event.y // size
-            if r<0 or r>7 or c<0 or c>7: return
-            if selected[0] is None:
-                # Sélectionner une pièce du bon camp
-                pc = board[r][c]
-                if pc != "." and ((pc.isupper() and turn[0]=="w") or (pc.islower() and turn[0]=="b")):
-                    selected[0] = (r,c)
-            else:
-                r0,c0 = selected[0]
-                src = self._chess_idx_to_sq(r0,c0); dst = self._chess_idx_to_sq(r,c)
-                ok, msg = self._chess_try_move(board, turn[0], src, dst)
-                if ok:
-                    turn[0] = "b" if turn[0]=="w" else "w"
-                selected[0] = None
-            draw()
+            if thinking[0]:
+                return  # l’ordinateur réfléchit
+            sq = board.square_at(event.x, event.y)
+            if sq is None:
+                return
+            board.finish()
+            pc = pos.board[sq]
+            if pc >= 0 and pc // 6 == pos.side and sq != selected[0]:
+                # Sélectionner (ou changer) une pièce du bon camp : ses coups légaux sont marqués
+                selected[0] = sq
+                board.select(sq, {(m >> 6) & 63 for m in pos.legal_moves() if m & 63 == sq})
+                return
+            frm, selected[0] = selected[0], None
+            board.select(None)
+            if frm is None or frm == sq:
+                return
+            ok, msg = self._chess_try_move(pos, chess_sq_name(frm) + chess_sq_name(sq))
+            info.set(msg)
+            if not ok:
+                return
+            board.show_move(pos, pos.played_moves()[-1], animate.get())
+            if analysis[0] is not None:
+                stop_analysis()  # la position analysée n’est plus celle du plateau
+                ana_info.set("")
+            if vs_ai and pos.status() is None:
+                thinking[0] = True
+                self._chess_ai_move(win, pos, searcher, ai_info.set, ai_done)
+
+        def loaded(msg):
+            selected[0] = None
+            stop_analysis()
+            ana_info.set("")
+            info.set(msg)
+            board.finish()
+            board.select(None)
+            board.set_last(None)
+            board.sync(pos)
+            if vs_ai and pos.side == BLACK and pos.status() is None:
+                thinking[0] = True
+                self._chess_ai_move(win, pos, searcher, ai_info.set, ai_done)
 
         canvas.bind("<Button-1>", on_click)
-        draw()
+        self._chess_file_buttons(win, pos, vs_ai, loaded, lambda: thinking[0])
+        board.sync(pos)
         self.themify(win)
+        self.theme.on_change(win, lambda fg, bg: board.set_fg(fg))
 
     # --- Helpers Échecs ---
     def _chess_start_board(self):
-        # Représentation: lettres blanches MAJ, noires min ; p=pion, r=tour, n=cavalier, b=fou, q=dame, k=roi
-        # Rang 8 → index 0
-        rows = [
-            list("rnbqkbnr"),
-            list("pppppppp"),
-            list("........"),
-            list("........"),
-            list("........"),
-            list("........"),
-            list("PPPPPPPP"),
-            list("RNBQKBNR"),
-        ]
-        return [row[:] for row in rows]
+        # Bitboards (voir ChessPosition) ; les coups sont validés par le générateur légal
+        return ChessPosition()
+
+    def _chess_file_buttons(self, win, pos, vs_ai, loaded, busy):
+        """
+        Boutons FEN / PGN d’une fenêtre d’échecs. La position est modifiée sur
+        place (set_fen puis coups rejoués) ; loaded(message) rafraîchit la fenêtre.
+        """
+        from tkinter import filedialog, simpledialog
+        start = [pos.fen()]   # position de départ de la partie (pour le PGN)
+        bar = tk.Frame(win, bg=self.bg)
+        bar.pack(pady=(0, 8))
+
+        def load_fen():
+            if busy():
+                return
+            fen = simpledialog.askstring("Position FEN", "FEN :", initialvalue=pos.fen(), parent=win)
+            if not fen:
+                return
+            try:
+                pos.set_fen(fen.strip())
+            except ValueError as e:
+                messagebox.showerror("FEN", str(e), parent=win)
+                return
+            start[0] = pos.fen()
+            loaded("Position chargée. " + self._chess_status_text(pos))
 
-    def _chess_board_ascii(self, board):
-        lines = []
-        for i, row in enumerate(board):
-            rank = 8 - i
-            line = f"{rank} "
-            for ch in row:
-                line += (ch if ch != "." else "·") + " "
-            lines.append(line)
-        lines.append("  a b c d e f g h")
-        return "\n".join(lines)
+        def copy_fen():
+            win.clipboard_clear()
+            win.clipboard_append(pos.fen())
+            messagebox.showinfo("FEN", f"Copié dans le presse‑papiers :\n{pos.fen()}", parent=win)
+
+        def open_pgn():
+            if busy():
+                return
+            path = filedialog.askopenfilename(parent=win, filetypes=[("PGN", "*.pgn"), ("Tous", "*")])
+            if not path:
+                return
+            n = simpledialog.askinteger("PGN", "Numéro de la partie :", initialvalue=1, minvalue=1, parent=win)
+            if not n:
+                return
+            try:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    game = next((g for i, g in enumerate(iter_pgn_games(f), 1) if i == n), None)
+            except OSError as e:
+                messagebox.showerror("PGN", str(e), parent=win)
+                return
+            if game is None:
+                messagebox.showerror("PGN", f"Pas de partie n° {n} dans ce fichier.", parent=win)
+                return
+            tags, sans, _result = game
+            try:
+                pos.set_fen(tags.get("FEN", CHESS_START_FEN))
+            except ValueError as e:
+                messagebox.showerror("PGN", str(e), parent=win)
+                return
+            start[0] = pos.fen()
+            msg = f"{tags.get('White', '?')} – {tags.get('Black', '?')} : {len(sans)} demi‑coups. "
+            for san in sans:
+                try:
+                    pos.make(pos.parse_san(san))
+                except ValueError as e:
+                    msg = f"Partie chargée jusqu’à l’erreur ({e}). "
+                    break
+            loaded(msg + self._chess_status_text(pos))
+
+        def save_pgn():
+            path = filedialog.asksaveasfilename(parent=win, defaultextension=".pgn", filetypes=[("PGN", "*.pgn")])
+            if not path:
+                return
+            import datetime
+            st = pos.status()
+            result = "*" if st is None else ("1/2-1/2" if st == "pat" else ("0-1" if pos.side == WHITE else "1-0"))
+            tags = {"Event": "FreeOS", "Site": "FreeOS", "Date": datetime.date.today().strftime("%Y.%m.%d"),
+                    "White": "Joueur", "Black": "Ordinateur" if vs_ai else "Joueur", "FEN": start[0]}
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    write_pgn_game(f, tags, chess_game_sans(start[0], pos.played_moves()), result)
+            except OSError as e:
+                messagebox.showerror("PGN", str(e), parent=win)
+                return
+            messagebox.showinfo("PGN", f"Partie enregistrée : {path}", parent=win)
+
+        for text, cmd in (("Charger FEN…", load_fen), ("Copier FEN", copy_fen),
+                          ("Ouvrir PGN…", open_pgn), ("Enregistrer PGN…", save_pgn)):
+            tk.Button(bar, text=text, command=cmd).pack(side="left", padx=2)
 
     def _chess_piece_symbol(self, p):
         symbols = {
@@ -1220,119 +5999,165 @@ class TerminalApp:
         }
         return symbols.get(p, "?")
 
-    def _chess_sq_to_idx(self, sq):
-        file = "abcdefgh".find(sq[0])
-        rank = int(sq[1])
-        r = 8 - rank
-        c = file
-        return r,c
+    def _chess_try_move(self, pos, text):
+        """Joue le coup saisi s’il est légal ; (ok, message pour l’interface)."""
+        if pos.status() is not None:
+            return False, "Partie terminée."
+        try:
+            m = pos.parse_move(text)
+        except ValueError as e:
+            return False, str(e)
+        if m is None:
+            return False, "Coup illégal."
+        pos.make(m)
+        return True, self._chess_status_text(pos)
+
+    def _chess_ai_move(self, win, pos, searcher, show, done):
+        """
+        L’ordinateur cherche son coup dans un thread (sur une copie de la
+        position) ; la fenêtre sonde l’avancement avec after() : show(texte)
+        pendant la réflexion, puis done(coup) sur le thread Tk.
+        """
+        book = opening_book()
+        m = book.choose(pos) if book is not None else None
+        if m is not None:
+            show("IA : coup de la bibliothèque d’ouvertures.")
+            win.after(300, done, m)
+            return
+        m = tablebase_best_move(pos)
+        if m is not None:
+            show(f"IA : coup des tables de finales, éval {chess_score_text(tablebase_score(pos))}.")
+            win.after(300, done, m)
+            return
+        state = {"info": None, "move": None, "finished": False}
+        stop = threading.Event()
+
+        def on_info(depth, score, nodes, nps, pv):
+            state["info"] = (depth, score, nodes, nps, pv)
 
-    def _chess_idx_to_sq(self, r,c):
-        return "abcdefgh"[c] + str(8-r)
+        def work():
+            try:
+                state["move"] = searcher.search(pos.copy(), CHESS_AI_TIME_S, on_info=on_info, stop=stop)[0]
+            finally:
+                state["finished"] = True
 
-    def _chess_try_move(self, board, turn, src, dst):
-        # Validation basique: respect des mouvements, pas de roque/en passant/promo.
-        try:
-            r0,c0 = self._chess_sq_to_idx(src)
-            r1,c1 = self._chess_sq_to_idx(dst)
-        except Exception:
-            return False, "Coordonnées invalides."
-        pc = board[r0][c0]
-        if pc == ".":
-            return False, "Case source vide."
-        if turn=="w" and not pc.isupper(): return False, "C’est aux blancs."
-        if turn=="b" and not pc.islower(): return False, "C’est aux noirs."
-        target = board[r1][c1]
-        if target != "." and (target.isupper()==pc.isupper()):
-            return False, "Case occupée par une pièce alliée."
-
-        dr = r1 - r0; dc = c1 - c0
-        absdr, absdc = abs(dr), abs(dc)
-        name = pc.upper()
-
-        def path_clear():
-            # pour les pièces glissantes
-            if dr==0 and dc==0: return False
-            stepr = (0 if dr==0 else (1 if dr>0 else -1))
-            stepc = (0 if dc==0 else (1 if dc>0 else -1))
-            r, c = r0+stepr, c0+stepc
-            while (r,c) != (r1,c1):
-                if board[r][c] != ".":
-                    return False
-                r += stepr; c += stepc
-            return True
+        threading.Thread(target=work, name="freeos-chess-ai", daemon=True).start()
 
-        ok=False
-        if name == "P":
-            dir = -1 if pc.isupper() else 1  # blanc vers r-1, noir vers r+1
-            start_row = 6 if pc.isupper() else 1
-            if dc==0 and target==".":
-                if dr == dir:
-                    ok=True
-                elif dr == 2*dir and r0==start_row and board[r0+dir][c0]=="." and board[r1][c1]==".":
-                    ok=True
-            elif absdc==1 and dr==dir and target!="." and (target.isupper()!=pc.isupper()):
-                ok=True
-        elif name == "N":
-            ok = (absdr,absdc) in [(1,2),(2,1)]
-        elif name == "B":
-            ok = absdr==absdc and path_clear()
-        elif name == "R":
-            ok = (dr==0 or dc==0) and path_clear()
-        elif name == "Q":
-            ok = ((dr==0 or dc==0) or (absdr==absdc)) and path_clear()
-        elif name == "K":
-            ok = max(absdr,absdc)==1
-
-        if not ok:
-            return False, "Coup illégal."
-        # effectuer le coup
-        board[r1][c1] = pc
-        board[r0][c0] = "."
-        return True, "ok"
+        def poll():
+            try:
+                alive = win.winfo_exists()
+            except tk.TclError:
+                alive = False
+            if not alive:
+                stop.set()  # fenêtre fermée : on abandonne la recherche
+                return
+            if state["info"] is not None:
+                depth, score, nodes, nps, pv = state["info"]
+                line = " ".join(chess_move_uci(m) for m in pv[:6])
+                show(f"IA : profondeur {depth}, {nodes:,} nœuds, {nps:,.0f} n/s, éval {chess_score_text(score)} — {line}".replace(",", " "))
+            if state["finished"]:
+                done(state["move"])
+            else:
+                win.after(100, poll)
+        show("IA : réflexion…")
+        win.after(100, poll)
+
+    def _chess_analyse_start(self, win, fen, show):
+        """
+        Analyse multi‑processus (chess_analyse) pilotée par un thread ; la
+        meilleure ligne est affichée à chaque profondeur. Rend l’Event d’arrêt.
+        """
+        stop = threading.Event()
+        state = {"line": "Analyse : démarrage des processus…", "finished": False}
+
+        def work():
+            try:
+                for depth, score, pv, nodes, nps in chess_analyse(fen, stop=stop):
+                    line = " ".join(chess_move_uci(m) for m in pv[:8])
+                    state["line"] = (f"Analyse : prof {depth}, éval {chess_score_text(score)}, "
+                                     f"{nps:,.0f} n/s — {line}").replace(",", " ")
+            except Exception as e:
+                state["line"] = f"Analyse : erreur ({e})"
+            finally:
+                state["finished"] = True
+
+        threading.Thread(target=work, name="freeos-chess-analyse", daemon=True).start()
+
+        def poll():
+            try:
+                alive = win.winfo_exists()
+            except tk.TclError:
+                alive = False
+            if not alive:
+                stop.set()
+                return
+            if stop.is_set():
+                return
+            show(state["line"] + (" (terminé)" if state["finished"] else ""))
+            if not state["finished"]:
+                win.after(200, poll)
+        poll()
+        return stop
+
+    def _chess_status_text(self, pos):
+        camp = "blancs" if pos.side == WHITE else "noirs"
+        st = pos.status()
+        if st == "mat":
+            return f"Échec et mat ! Victoire des {'noirs' if pos.side == WHITE else 'blancs'}."
+        if st == "pat":
+            return "Pat : partie nulle."
+        tb = tablebase_probe(pos)
+        if tb is not None and tb[0]:
+            camp_fort = camp if tb[0] > 0 else ("noirs" if pos.side == WHITE else "blancs")
+            camp += f" (finale : les {camp_fort} matent en {(tb[1] + 1) // 2})"
+        elif tb is not None:
+            camp += " (finale nulle)"
+        if pos.in_check():
+            return f"Échec ! Au tour des {camp}."
+        return f"Au tour des {camp}."
 
     # time
     def cmd_time(self, args):
         if args and args[0].lower() in ("x","X"):
+            # seule la forme fenêtre touche aux widgets
+            if threading.get_ident() != self._main_thread:
+                self.write("[jobs] 'time x' est graphique : ignorée en tâche de fond.")
+                return
+            if getattr(self._tls, "capture", None) is not None:
+                self.write("[erreur] 'time x' est graphique : pas de sortie à rediriger.")
+                return
             win = ThemedToplevel(self, title="Horloge")
-            lab = tk.Label(win, text="", bg=self.bg, fg=self.fg, font=tkfont.Font(win, size=24, family=self.font.actual("family")))
+            lab = tk.Label(win, text="", bg=self.bg, fg=self.fg, font=win.font(24))
             lab.pack(padx=10, pady=10)
-            def tick():
-                try:
-                    now = time.strftime("%H:%M:%S")
-                    lab.config(text=now)
-                    if win.winfo_exists():
-                        self.root.after(500, tick)
-                except Exception:
-                    pass
+            def tick(_now=None):
+                lab.config(text=time.strftime("%H:%M:%S"))
             tick()
+            self.ticks.every(1.0, tick, lab, align=True)
             self.themify(win)
         else:
-            now = time.strftime("%H:%M:%S")
-            self.write(now)
+            super().cmd_time(args)
 
     # timer (chronomètre)
     def cmd_timer(self, args):
         win = ThemedToplevel(self, title="Chronomètre (cliquer = start/stop)")
-        lab = tk.Label(win, text="00:00:00.0", bg=self.bg, fg=self.fg, font=tkfont.Font(win, size=24, family=self.font.actual("family")))
+        lab = tk.Label(win, text="00:00:00.0", bg=self.bg, fg=self.fg, font=win.font(24))
         lab.pack(padx=10, pady=10)
-        running = {"on": False, "start": 0.0, "elapsed": 0.0}
-        def update():
-            if running["on"]:
-                elapsed = running["elapsed"] + (time.perf_counter() - running["start"])
-                lab.config(text=self._fmt_hms(elapsed))
-            if win.winfo_exists():
-                self.root.after(100, update)
+        # ne bat que lorsqu’il tourne : l’affichage est recalculé depuis le départ
+        running = {"tick": None, "start": 0.0, "elapsed": 0.0}
+        def update(now):
+            lab.config(text=self._fmt_hms(running["elapsed"] + now - running["start"]))
         def toggle(_=None):
-            if not running["on"]:
-                running["on"] = True; running["start"] = time.perf_counter()
+            now = self.ticks.clock()
+            if running["tick"] is None:
+                running["start"] = now
+                running["tick"] = self.ticks.every(0.1, update, lab)
             else:
-                running["elapsed"] += (time.perf_counter() - running["start"])
-                running["on"] = False
+                self.ticks.cancel(running["tick"])
+                running["tick"] = None
+                running["elapsed"] += now - running["start"]
+                lab.config(text=self._fmt_hms(running["elapsed"]))
         lab.bind("<Button-1>", toggle)
-        update()
         self.themify(win)
-        self.active_timers.append(win)
 
     def _fmt_hms(self, seconds):
         h = int(seconds//3600); m = int((seconds%3600)//60); s = seconds%60
@@ -1350,53 +6175,42 @@ class TerminalApp:
         # Fenêtre
         win = ThemedToplevel(self, title="Minuteur")
         var = tk.StringVar(value=self._fmt_hhmmss(total))
-        lab = tk.Label(win, textvariable=var, bg=self.bg, fg=self.fg, font=tkfont.Font(win, size=28, family=self.font.actual("family")))
+        lab = tk.Label(win, textvariable=var, bg=self.bg, fg=self.fg, font=win.font(28))
         lab.pack(padx=10, pady=10)
-        stop_event = threading.Event()
-
-        class Minuteur:
-            pass
-        tracker = Minuteur()
-        tracker.stop_event = stop_event
-        tracker.win = win
-        self.active_countdowns.append(tracker)
-
-        def countdown():
-            nonlocal total
-            if stop_event.is_set():
+        cd = Countdown(win)
+        self.active_countdowns.add(cd)
+        # affichage et fin calculés depuis l’échéance monotone : pas de dérive
+        start = self.ticks.clock()
+        end = start + total
+
+        def show(now):
+            left = max(0, int(end - now + 0.5))
+            var.set(self._fmt_hhmmss(left))
+            return left > 0 and not cd.stopped
+
+        def expire(now):
+            if cd.stopped:
                 return
-            if total > 0:
-                total -= 1
-                var.set(self._fmt_hhmmss(total))
-                self.root.after(1000, countdown)
-            else:
-                # À 0 : trois bips courts, pause, et répéter jusqu'à Stop m
-                self._minuteur_alarm_loop(stop_event, lab)
-
-        lab.bind("<Button-1>", lambda e: stop_event.set())
-        countdown()
+            var.set(self._fmt_hhmmss(0))
+            # À 0 : trois bips courts, clignotement, pause… jusqu'à Stop m (ou un clic)
+            cd.alarm = self.alarms.start(lab, lambda: self.fg)
+
+        def closed(event):
+            if event.widget is win:
+                self._stop_countdown(cd)
+                self.active_countdowns.discard(cd)
+
+        cd.ticks = (self.ticks.every(1.0, show, lab, first=start + 1.0), self.ticks.at(end, expire))
+        lab.bind("<Button-1>", lambda e: self._stop_countdown(cd))
+        win.bind("<Destroy>", closed, add="+")
         self.themify(win)
 
-    def _minuteur_alarm_loop(self, stop_event, label_widget):
-        def loop():
-            if stop_event.is_set() or not label_widget.winfo_exists():
-                return
-            for _ in range(3):
-                if stop_event.is_set(): return
-                do_beep(root=self.root)
-                time.sleep(0.12)
-            # clignoter
-            for _ in range(3):
-                if stop_event.is_set(): return
-                try:
-                    label_widget.config(fg="#ffffff"); time.sleep(0.15)
-                    label_widget.config(fg=self.fg); time.sleep(0.15)
-                except Exception:
-                    break
-            # pause et recommencer
-            if not stop_event.is_set():
-                self.root.after(1500, loop)
-        threading.Thread(target=loop, daemon=True).start()
+    def _stop_countdown(self, cd):
+        """Arrête le décompte et l’alarme d’un minuteur (O(1))."""
+        cd.stopped = True
+        for t in cd.ticks:
+            self.ticks.cancel(t)
+        self.alarms.stop(cd.alarm)
 
     def _parse_hms(self, s):
         parts = s.split(":")
@@ -1418,15 +6232,16 @@ class TerminalApp:
     def cmd_stop(self, args):
         # Syntaxe attendue : "Stop m" ; tolérons aussi "stop m"
         if args and args[0].lower().startswith("m"):
-            stopped = 0
-            for tr in self.active_countdowns:
+            # toutes les alarmes se taisent tout de suite (pas en attente annulés)
+            self.alarms.stop_all()
+            countdowns, self.active_countdowns = self.active_countdowns, set()
+            stopped = len(countdowns)
+            for cd in countdowns:
+                self._stop_countdown(cd)
                 try:
-                    tr.stop_event.set(); stopped += 1
-                    if tr.win and tr.win.winfo_exists():
-                        tr.win.destroy()
-                except Exception:
+                    cd.win.destroy()
+                except tk.TclError:
                     pass
-            self.active_countdowns.clear()
             self.write(f"[minuteur] arrêté(s) : {stopped}")
         else:
             self.write("Usage: Stop m  (arrête le minuteur)")
@@ -1437,16 +6252,6 @@ class TerminalApp:
         self.close_all_windows()
         self.write("[stop all] toutes les sous‑fenêtres/timers arrêtés.")
 
-    # cal / date
-    def cmd_cal(self, args):
-        now = datetime.date.today()
-        cal = _calendar.month(now.year, now.month)
-        self.write(cal.rstrip())
-
-    def cmd_date(self, args):
-        d = datetime.date.today()
-        self.write(d.strftime("%d.%m.%Y"))
-
     # rec (dictaphone)
     def cmd_rec(self, args):
         # Sans lib externe (pyaudio/sounddevice/winsdk), on ne peut pas enregistrer le micro.
@@ -1468,6 +6273,7 @@ class TerminalApp:
         self.write("[exitapp] fenêtres/outils fermés.")
 
     def cmd_exit(self, args):
+        super().cmd_exit(args)
         self.root.after(10, self.root.destroy)
 
     def cmd_shutup(self, args):
@@ -1477,11 +6283,118 @@ class TerminalApp:
             self.cmd_exit([])
         self.root.after(1000, later)
 
+    # bench
+    def cmd_bench(self, args):
+        sub = (args[0].lower() if args else "")
+        if sub == "write":
+            n = 5000
+            if len(args) >= 2:
+                try:
+                    n = max(1, int(args[1]))
+                except ValueError:
+                    pass
+            self._bench_write(n)
+        elif sub == "perft":
+            self.cmd_perft(args[1:] or ["4"])
+        else:
+            self.write("[usage] bench write [n] | bench perft [profondeur] [FEN]")
+
+    def _bench_write(self, n):
+        self.flush()
+        txt = self.text
+        # Avant : une insertion + see + bascule d’état par ligne (ancien write)
+        start_idx = txt.index("end-1c")
+        t0 = time.perf_counter()
+        for i in range(n):
+            txt.config(state="normal")
+            txt.insert("end", f"bench (direct) {i}\n")
+            txt.see("end")
+            txt.config(state="disabled")
+        txt.update_idletasks()
+        t_direct = time.perf_counter() - t0
+        txt.config(state="normal")
+        txt.delete(start_idx, "end-1c")
+        txt.config(state="disabled")
+        # Après : file mémoire + une seule insertion groupée
+        t0 = time.perf_counter()
+        for i in range(n):
+            self.write(f"bench (bufferisé) {i}")
+        self.flush()
+        txt.update_idletasks()
+        t_buf = time.perf_counter() - t0
+        rate = lambda t: n / t if t > 0 else float("inf")
+        self.write(f"[bench write] {n} lignes")
+        self.write(f"  direct     : {t_direct*1000:8.1f} ms  ({rate(t_direct):,.0f} lignes/s)")
+        self.write(f"  bufferisé  : {t_buf*1000:8.1f} ms  ({rate(t_buf):,.0f} lignes/s)")
+        if t_buf > 0:
+            self.write(f"  gain       : x{t_direct / t_buf:.1f}")
+
     # ---------- Boucle ----------
     def run(self):
         self.root.mainloop()
 
 
-if __name__ == "__main__":
-    app = TerminalApp()
+def run_headless(commands=None, script=None):
+    """
+    Mode sans fenêtre : exécute « cmd; cmd » (-c) ou un script (--script) puis
+    attend les tâches de fond, ou lit les commandes sur stdin (une par ligne)
+    jusqu’à EOF ou 'exit'. Code retour : 1 si une commande a échoué, sinon 0.
+    """
+    engine = CommandEngine()
+    try:
+        if script is not None:
+            engine.cmd_run(list(script))
+            pending = [j for j in engine.jobs.values() if not j.future.done()]
+            if pending:
+                engine._wait_jobs(pending)
+        elif commands is not None:
+            for line in split_command_list(commands):
+                engine.run_line(line)
+                if not engine.running:
+                    break
+            pending = [j for j in engine.jobs.values() if not j.future.done()]
+            if pending:
+                engine._wait_jobs(pending)
+        else:
+            prompt = "> " if sys.stdin.isatty() else ""
+            while engine.running:
+                if prompt:
+                    engine.out.write(prompt)
+                    engine.flush()
+                line = sys.stdin.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if line or engine.pending_selector is not None:
+                    engine.run_line(line)
+                engine.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine._shutdown_jobs()
+        engine.flush()
+    return 1 if engine.errors else 0
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="freeos", description="FreeOS — mini‑terminal Tkinter.")
+    parser.add_argument("--startup-profile", nargs="?", const="-", metavar="FICHIER",
+                        help="temps par phase jusqu’au 1er prompt (stderr, ou ajout JSON dans FICHIER)")
+    parser.add_argument("--headless", action="store_true",
+                        help="sans fenêtre : commandes lues sur stdin, sortie sur stdout")
+    parser.add_argument("-c", dest="commands", metavar="CMDS",
+                        help="exécuter « cmd; cmd » sans fenêtre puis quitter (implique --headless)")
+    parser.add_argument("--script", nargs=argparse.REMAINDER, metavar="FICHIER [ARGS]",
+                        help="exécuter un script FreeOS sans fenêtre puis quitter (implique --headless)")
+    opts = parser.parse_args(argv)
+    if opts.script is not None and not opts.script:
+        parser.error("--script : fichier manquant")
+    if opts.headless or opts.commands is not None or opts.script:
+        sys.exit(run_headless(opts.commands, opts.script))
+    app = TerminalApp(profile=opts.startup_profile)
     app.run()
+
+
+if __name__ == "__main__":
+    main()